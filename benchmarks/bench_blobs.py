@@ -0,0 +1,122 @@
+"""Blob extraction benchmark: contour path vs connected components.
+
+Renders foreground masks with known vehicles, some of them split into
+fragments (as trucks often are after background subtraction), plus noise
+specks. Reports time per frame and how well each path recovers the vehicles.
+
+    python -m benchmarks.bench_blobs [--frames 300] [--width 1280 --height 720]
+"""
+import argparse
+import time
+import numpy as np
+import cv2
+
+from src.core.blobs import BlobExtractor, contour_blobs
+
+
+def render_mask(rng, width, height, vehicles=6, max_fragments=3, gap=8, specks=40):
+    mask = np.zeros((height, width), dtype=np.uint8)
+    truth = []
+    lane_h = height // vehicles
+    for i in range(vehicles):
+        w = int(rng.integers(width // 12, width // 5))
+        h = int(rng.integers(lane_h // 2, lane_h - 10))
+        x = int(rng.integers(0, width - w))
+        y = i * lane_h + 5
+        truth.append((x, y, x + w, y + h))
+
+        # Split into fragments separated by vertical gaps
+        fragments = int(rng.integers(1, max_fragments + 1))
+        cuts = np.linspace(x, x + w, fragments + 1).astype(int)
+        for j in range(fragments):
+            x1 = cuts[j] + (gap // 2 if j > 0 else 0)
+            x2 = cuts[j + 1] - (gap // 2 if j < fragments - 1 else 0)
+            cv2.rectangle(mask, (x1, y), (x2 - 1, y + h - 1), 255, -1)
+
+    for _ in range(specks):
+        cx, cy = int(rng.integers(0, width)), int(rng.integers(0, height))
+        cv2.circle(mask, (cx, cy), int(rng.integers(1, 4)), 255, -1)
+    return mask, truth
+
+
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def score(rects, truth):
+    # Per vehicle: how many detected rects fall on it, and the best IoU
+    rects = rects.tolist()
+    exact, split, missed, ious = 0, 0, 0, []
+    for t in truth:
+        hits = [r for r in rects if iou(r, t) > 0]
+        if not hits:
+            missed += 1
+            continue
+        if len(hits) == 1:
+            exact += 1
+        else:
+            split += 1
+        ious.append(max(iou(r, t) for r in hits))
+    return exact, split, missed, ious
+
+
+def run(frames, width, height, min_area, merge_distance, seed):
+    rng = np.random.default_rng(seed)
+    masks = [render_mask(rng, width, height) for _ in range(frames)]
+    extractor = BlobExtractor(min_area=min_area, merge_distance=merge_distance)
+
+    paths = {
+        "contours": lambda m: contour_blobs(m, min_area),
+        "components": extractor.extract,
+    }
+    results = {}
+    for name, fn in paths.items():
+        # Warm up, then time
+        fn(masks[0][0])
+        t0 = time.perf_counter()
+        outputs = [fn(m) for m, _ in masks]
+        elapsed = time.perf_counter() - t0
+
+        totals = [0, 0, 0]
+        all_ious = []
+        for (rects, _), (_, truth) in zip(outputs, masks):
+            exact, split, missed, ious = score(rects, truth)
+            totals[0] += exact
+            totals[1] += split
+            totals[2] += missed
+            all_ious.extend(ious)
+        vehicles = sum(totals)
+        results[name] = {
+            "ms_per_frame": elapsed / frames * 1000,
+            "one_blob_per_vehicle": totals[0] / vehicles,
+            "split_vehicles": totals[1] / vehicles,
+            "missed_vehicles": totals[2] / vehicles,
+            "mean_iou": float(np.mean(all_ious)) if all_ious else 0.0,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--min-area", type=int, default=5000)
+    parser.add_argument("--merge-distance", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    results = run(args.frames, args.width, args.height, args.min_area, args.merge_distance, args.seed)
+    print(f"{args.frames} masks at {args.width}x{args.height}, min_area={args.min_area}, merge_distance={args.merge_distance}")
+    print(f"{'path':<12}{'ms/frame':>10}{'1 blob/veh':>12}{'split':>8}{'missed':>8}{'mean IoU':>10}")
+    for name, r in results.items():
+        print(f"{name:<12}{r['ms_per_frame']:>10.3f}{r['one_blob_per_vehicle']:>12.1%}"
+              f"{r['split_vehicles']:>8.1%}{r['missed_vehicles']:>8.1%}{r['mean_iou']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Detection offload throughput: local detection vs a worker over a socket.
+
+Starts a DetectionWorker in this process (or uses --address for a worker
+elsewhere) and pushes synthetic frames through an OffloadClient as fast as
+the in-flight window allows. Reports per setup:
+
+  fps          frames with a detection result per second
+  lat p50/p95  submit -> result round trip
+  submit ms    camera-side cost per frame (JPEG encode + socket write)
+  MB/s         bytes sent to the worker
+
+With the worker in the same process (the default) both ends share one
+interpreter and one GIL, so the fps is below local detection; this setup
+measures protocol and encoding overhead only. Run the worker on the LAN
+server (python -m src.app.cli worker) and pass --address to see what the
+camera gains.
+
+    python -m benchmarks.bench_offload [--frames 600] [--width 1280 --height 720]
+    python -m benchmarks.bench_offload --address tcp://192.168.1.10:7070 --windows 1,4,8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from src.core.speed_detector import SpeedDetector
+from src.core.offload import OffloadClient, DetectionWorker
+from benchmarks.synthetic import SyntheticScene
+
+
+def run_local(scene, rendered, frames):
+    detector = SpeedDetector(scene.detector_config())
+    t0 = time.perf_counter()
+    for i in range(frames):
+        detector.process_frame(rendered[i % len(rendered)].copy(), i / scene.fps)
+    return {"fps": frames / (time.perf_counter() - t0)}
+
+
+def run_offload(address, scene, rendered, frames, window, quality):
+    client = OffloadClient(address, detection_config=scene.detector_config(), max_in_flight=window,
+                           jpeg_quality=quality, retry_min=0.05)
+    client.start()
+    if not client.wait_connected(5.0):
+        client.stop()
+        raise RuntimeError(f"No worker at {address}")
+
+    encode = 0.0
+    t0 = time.perf_counter()
+    for i in range(frames):
+        while len(client.in_flight) >= window:
+            time.sleep(0.0002)
+        t_enc = time.perf_counter()
+        client.submit(rendered[i % len(rendered)], i / scene.fps)
+        encode += time.perf_counter() - t_enc
+        client.poll()
+    while client.in_flight:
+        time.sleep(0.0002)
+    elapsed = time.perf_counter() - t0
+    stats = client.stats()
+    with client.lock:
+        latencies = sorted(client.latencies)
+    client.stop()
+
+    return {
+        "fps": stats["completed"] / elapsed,
+        "lat_p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+        "lat_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+        "submit_ms": encode / frames * 1000,
+        "mb_per_s": stats["bytes_sent"] / elapsed / 1e6,
+    }
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--windows", default="1,2,4", help="max_in_flight values, comma separated")
+    parser.add_argument("--quality", type=int, default=85, help="JPEG quality")
+    parser.add_argument("--address", help="Use a running worker instead of local tcp and unix workers")
+    args = parser.parse_args()
+
+    scene = SyntheticScene.random(args.width, args.height, duration=10, vehicles_per_minute=30, seed=0)
+    rendered = [scene.render(i)[0] for i in range(min(args.frames, 120))]
+
+    workers = []
+    tmp = None
+    if args.address:
+        targets = [("remote", args.address)]
+    else:
+        tmp = tempfile.mkdtemp()
+        targets = [("tcp", "tcp://127.0.0.1:0"), ("unix", f"unix://{os.path.join(tmp, 'worker.sock')}")]
+        for i, (name, address) in enumerate(targets):
+            worker = DetectionWorker(address)
+            worker.start()
+            workers.append(worker)
+            targets[i] = (name, worker.bound_address)
+
+    print(f"{args.frames} frames at {args.width}x{args.height}, JPEG quality {args.quality}")
+    print(f"{'setup':<14}{'fps':>8}{'lat p50':>9}{'lat p95':>9}{'submit ms':>11}{'MB/s':>8}")
+    r = run_local(scene, rendered, args.frames)
+    print(f"{'local':<14}{r['fps']:>8.1f}{'-':>9}{'-':>9}{'-':>11}{'-':>8}")
+    try:
+        for name, address in targets:
+            for window in (int(w) for w in args.windows.split(",")):
+                r = run_offload(address, scene, rendered, args.frames, window, args.quality)
+                print(f"{f'{name} w={window}':<14}{r['fps']:>8.1f}{_fmt(r['lat_p50_ms'], '.1f'):>9}"
+                      f"{_fmt(r['lat_p95_ms'], '.1f'):>9}{r['submit_ms']:>11.2f}{r['mb_per_s']:>8.1f}")
+    finally:
+        for worker in workers:
+            worker.stop()
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Detection trace: recording overhead, size, and replay speed.
+
+Runs live detection over a synthetic scene with a TraceWriter attached, then
+replays the trace with the same settings and with a corrected distance.
+Reports live and replay frames per second, bytes per frame on disk, and
+whether the replayed events match the live ones.
+
+Live fps here excludes video decoding, so the real gap to re-processing a
+recording is larger than shown.
+
+    python -m benchmarks.bench_trace [--duration 120] [--width 1280 --height 720] [--density 20]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from src.core.speed_detector import SpeedDetector
+from src.core.trace import TraceWriter, replay, trace_segments
+from benchmarks.synthetic import SyntheticScene, SyntheticCamera
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=120.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--density", type=int, default=20, help="Vehicles per minute")
+    args = parser.parse_args()
+
+    scene = SyntheticScene.random(args.width, args.height, duration=args.duration,
+                                  vehicles_per_minute=args.density, seed=0)
+    directory = tempfile.mkdtemp()
+    try:
+        detector = SpeedDetector(scene.detector_config())
+        detector.trace = TraceWriter(directory)
+        camera = SyntheticCamera(scene)
+        live = []
+        elapsed = 0.0
+        camera.start()
+        while True:
+            frame = camera.get_frame()
+            if frame is None:
+                break
+            t0 = time.perf_counter()
+            live.extend(detector.process_frame(frame, camera.timestamp)[1])
+            elapsed += time.perf_counter() - t0
+        detector.trace.close()
+
+        paths = trace_segments(directory)
+        size = sum(os.path.getsize(p) for p in paths)
+        frames = scene.frame_count
+
+        t0 = time.perf_counter()
+        events, replayed = replay(SpeedDetector(scene.detector_config()), paths)
+        replay_time = time.perf_counter() - t0
+        same = [(e["timestamp"], e["speed"]) for e in events] == [(e["timestamp"], e["speed"]) for e in live]
+
+        t0 = time.perf_counter()
+        corrected, _ = replay(SpeedDetector(scene.detector_config(real_distance_meters=scene.distance_m * 1.05)), paths)
+        corrected_time = time.perf_counter() - t0
+
+        print(f"{frames} frames at {args.width}x{args.height}, {args.density} vehicles/min")
+        print(f"live detection:  {frames / elapsed:10.1f} fps, {len(live)} events")
+        print(f"replay:          {replayed / replay_time:10.1f} fps ({elapsed / replay_time:.0f}x), "
+              f"{len(events)} events, {'identical' if same else 'DIFFERENT'}")
+        print(f"replay +5% dist: {replayed / corrected_time:10.1f} fps, {len(corrected)} events")
+        print(f"trace size:      {size} bytes ({size / frames:.1f} bytes/frame, "
+              f"{size / args.duration * 86400 / 1e6:.1f} MB/day at this traffic)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
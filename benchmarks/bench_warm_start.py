@@ -0,0 +1,121 @@
+"""Time to a stable foreground mask after a restart: cold vs warm start.
+
+Runs a detector over synthetic traffic, snapshots its background model
+(through save_background/load_background, as the service does) and keeps
+running for another 30 seconds. Then restarts mid-traffic, with vehicles in
+view, for each engine with:
+
+  no restart     the model that kept running: the best a restart can do
+  cold           a fresh model (the old behaviour)
+  warm           the fresh model seeded from the 30 s old snapshot
+
+plus a MOG2 restart with a snapshot of another scene (camera moved), which
+must be rejected and behave like a cold start.
+
+A frame is bad when the cleaned mask has a blob that overlaps no vehicle
+(phantom) or a vehicle in view is less than half foreground (missed). The
+time to a stable mask is the number of frames up to and including the last
+bad one.
+
+    python -m benchmarks.bench_warm_start [--width 1280 --height 720] [--frames 300] [--noise 4]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from src.core.speed_detector import SpeedDetector
+from src.core.background import load_background, save_background
+from benchmarks.synthetic import SyntheticScene
+
+LEARN_FRAMES = 600
+RESTART_FRAME = 1500
+MIN_VISIBLE_AREA = 2000
+
+
+def frame_quality(detector, scene, t):
+    # (phantom blobs, missed vehicles) in the mask of the last processed frame
+    mask = detector.scratch.get("mask")
+    rects, _ = detector.blobs.extract(mask)
+    boxes = [b for b in (scene.vehicle_box(v, t) for v in scene.vehicles) if b is not None]
+    phantom = sum(
+        1 for r in rects.tolist()
+        if not any(r[0] < b[2] and r[2] > b[0] and r[1] < b[3] and r[3] > b[1] for b in boxes)
+    )
+    missed = 0
+    for x1, y1, x2, y2 in boxes:
+        x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, scene.width), min(y2, scene.height)
+        if (x2 - x1) * (y2 - y1) < MIN_VISIBLE_AREA:
+            continue
+        if (mask[y1:y2, x1:x2] > 0).mean() < 0.5:
+            missed += 1
+    return phantom, missed
+
+
+def learn(scene, engine, path, until):
+    # Snapshot after LEARN_FRAMES, then keep running up to frame `until`
+    detector = SpeedDetector(scene.detector_config(background_engine=engine))
+    for i in range(until):
+        frame, t = scene.render(i)
+        detector.process_frame(frame, t)
+        if i + 1 == LEARN_FRAMES:
+            save_background(path, detector.background_state())
+    return detector
+
+
+def restart(scene, engine, seed, frames, detector=None):
+    if detector is None:
+        detector = SpeedDetector(scene.detector_config(background_engine=engine))
+        detector.background_seed = seed
+    last_bad, phantom, missed = 0, 0, 0
+    for k in range(frames):
+        frame, t = scene.render(RESTART_FRAME + k)
+        detector.process_frame(frame, t)
+        p, m = frame_quality(detector, scene, t)
+        phantom += p
+        missed += m
+        if p or m:
+            last_bad = k + 1
+    return {"stable_after": last_bad, "phantom": phantom, "missed": missed,
+            "warm": detector.warm_starts, "rejected": detector.rejected_seeds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--frames", type=int, default=300, help="Frames to watch after the restart")
+    parser.add_argument("--noise", type=float, default=4.0, help="Sensor noise sigma")
+    args = parser.parse_args()
+
+    scene = SyntheticScene.random(args.width, args.height, duration=RESTART_FRAME / 30 + args.frames / 30 + 5,
+                                  vehicles_per_minute=40, seed=3, noise_sigma=args.noise)
+    other = SyntheticScene.random(args.width, args.height, duration=LEARN_FRAMES / 30 + 1,
+                                  vehicles_per_minute=40, seed=11, noise_sigma=args.noise)
+    tmp = tempfile.mkdtemp()
+    try:
+        runs = []
+        for engine in ("mog2", "running_average"):
+            path = os.path.join(tmp, f"{engine}.npz")
+            running = learn(scene, engine, path, RESTART_FRAME)
+            runs.append((f"{engine} no restart", engine, None, running))
+            runs.append((f"{engine} cold", engine, None, None))
+            runs.append((f"{engine} warm", engine, load_background(path), None))
+        stale = os.path.join(tmp, "stale.npz")
+        learn(other, "mog2", stale, LEARN_FRAMES)
+        runs.append(("mog2 stale seed", "mog2", load_background(stale), None))
+
+        print(f"Restart at {args.width}x{args.height}, 40 vehicles/min, noise {args.noise}, "
+              f"{args.frames} frames watched")
+        print(f"{'start':<26}{'stable after':>14}{'phantom':>9}{'missed':>8}  seed")
+        for label, engine, seed, detector in runs:
+            r = restart(scene, engine, seed, args.frames, detector)
+            seed_state = "used" if r["warm"] else ("rejected" if r["rejected"] else "-")
+            print(f"{label:<26}{r['stable_after']:>8} fr {r['stable_after'] / scene.fps:4.1f}s"
+                  f"{r['phantom']:>9}{r['missed']:>8}  {seed_state}")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Deterministic synthetic traffic scenes with known ground truth.
+
+A scene is a textured, static road seen from above with vehicles driving
+along the y axis (the direction the detector's default horizontal lines
+measure). Every vehicle has a known speed, size, lane and entry time, so
+detector output can be scored against the truth. Everything is derived from
+the seed: the same scene renders the same frames on every run.
+
+Geometry is defined at a reference size and scaled, so one scene can be
+rendered at several resolutions.
+"""
+import numpy as np
+import cv2
+
+# Detector lines sit at these fractions of the frame height
+LINE1_Y = 0.3
+LINE2_Y = 0.7
+
+
+class Vehicle:
+    def __init__(self, lane, speed_kmh, length_m, width_m, enter_time, direction="approaching", color=(200, 200, 200)):
+        self.lane = lane
+        self.speed_kmh = speed_kmh
+        self.length_m = length_m
+        self.width_m = width_m
+        self.enter_time = enter_time
+        self.direction = direction
+        self.color = color
+
+    def __repr__(self):
+        return f"Vehicle(lane={self.lane}, {self.speed_kmh:.1f} km/h, {self.direction}, t={self.enter_time:.2f})"
+
+
+class SyntheticScene:
+    # distance_m is the real distance between the detector lines, which fixes
+    # the metres-per-pixel scale of the whole scene.
+    def __init__(self, width=1280, height=720, fps=30, duration=20.0, lanes=2,
+                 vehicles=None, distance_m=10.0, noise_sigma=4.0, seed=0):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.duration = duration
+        self.lanes = lanes
+        self.vehicles = vehicles if vehicles is not None else []
+        self.distance_m = distance_m
+        self.noise_sigma = noise_sigma
+        self.seed = seed
+
+        self.px_per_m = (LINE2_Y - LINE1_Y) * height / distance_m
+        self.background = self._render_background()
+        self._noise_bank = self._render_noise_bank()
+
+    @classmethod
+    def random(cls, width=1280, height=720, fps=30, duration=30.0, lanes=2, vehicles_per_minute=20,
+               speed_range=(30, 90), both_directions=True, seed=0, **kwargs):
+        # Poisson arrivals per lane; vehicles in one lane keep a safe gap
+        rng = np.random.default_rng(seed)
+        vehicles = []
+        rate = vehicles_per_minute / 60.0 / lanes
+        for lane in range(lanes):
+            direction = "receding" if both_directions and lane % 2 == 1 else "approaching"
+            t = 1.5 + rng.exponential(1.0 / rate)
+            while t < duration - 4.0:
+                speed = float(rng.uniform(*speed_range))
+                truck = rng.random() < 0.15
+                length = float(rng.uniform(10, 14) if truck else rng.uniform(3.8, 5.0))
+                width_m = float(rng.uniform(2.3, 2.5) if truck else rng.uniform(1.7, 1.9))
+                color = tuple(int(c) for c in rng.integers(120, 256, size=3))
+                vehicles.append(Vehicle(lane, speed, length, width_m, t, direction, color))
+                # Next one no sooner than this one needs to clear the frame
+                t += max(rng.exponential(1.0 / rate), 2.5)
+        return cls(width, height, fps, duration, lanes, vehicles, seed=seed, **kwargs)
+
+    def detector_config(self, **overrides):
+        config = {
+            "line1": [0, int(LINE1_Y * self.height), self.width, int(LINE1_Y * self.height)],
+            "line2": [0, int(LINE2_Y * self.height), self.width, int(LINE2_Y * self.height)],
+            "real_distance_meters": self.distance_m,
+            # A small car is about 4m x 1.8m; accept anything over a third of that
+            "min_area": int(4.0 * 1.8 * self.px_per_m ** 2 / 3),
+            "direction": "both",
+        }
+        config.update(overrides)
+        return config
+
+    def lane_zones(self, directions=None):
+        # One measurement zone per lane (config `zones` entries), ids "lane1", "lane2", ...
+        lane_w = self.width / self.lanes
+        zones = []
+        for lane in range(self.lanes):
+            x1, x2 = int(lane * lane_w), int((lane + 1) * lane_w) - 1
+            zones.append({
+                "id": f"lane{lane + 1}",
+                "line1": [x1, int(LINE1_Y * self.height), x2, int(LINE1_Y * self.height)],
+                "line2": [x1, int(LINE2_Y * self.height), x2, int(LINE2_Y * self.height)],
+                "real_distance_meters": self.distance_m,
+                "direction": directions[lane] if directions else "both",
+            })
+        return zones
+
+    @property
+    def frame_count(self):
+        return int(self.duration * self.fps)
+
+    def _lane_center_x(self, lane):
+        lane_w = self.width / self.lanes
+        return (lane + 0.5) * lane_w
+
+    def _render_background(self):
+        rng = np.random.default_rng(self.seed)
+        # Asphalt: blurred noise at two scales on a mid grey
+        coarse = rng.normal(0, 18, (self.height // 8 + 1, self.width // 8 + 1)).astype(np.float32)
+        coarse = cv2.resize(coarse, (self.width, self.height), interpolation=cv2.INTER_CUBIC)
+        fine = cv2.GaussianBlur(rng.normal(0, 10, (self.height, self.width)).astype(np.float32), (0, 0), 1.0)
+        gray = np.clip(95 + coarse + fine, 0, 255).astype(np.uint8)
+        bg = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+        # Lane markings
+        lane_w = self.width / self.lanes
+        dash = max(int(3 * self.px_per_m), 4)
+        thickness = max(int(0.15 * self.px_per_m), 1)
+        for lane in range(1, self.lanes):
+            x = int(lane * lane_w)
+            for y in range(0, self.height, dash * 2):
+                cv2.line(bg, (x, y), (x, y + dash), (230, 230, 230), thickness)
+        # Verge
+        cv2.rectangle(bg, (0, 0), (thickness * 2, self.height), (60, 110, 60), -1)
+        cv2.rectangle(bg, (self.width - thickness * 2, 0), (self.width, self.height), (60, 110, 60), -1)
+        return bg
+
+    def _render_noise_bank(self, size=8):
+        # Sensor noise: a small bank of precomputed fields, picked per frame
+        # from the seed. Split into positive and negative parts so applying it
+        # is two saturating adds instead of a float round trip.
+        if self.noise_sigma <= 0:
+            return []
+        rng = np.random.default_rng(self.seed + 1)
+        bank = []
+        for _ in range(size):
+            noise = rng.normal(0, self.noise_sigma, (self.height, self.width))
+            pos = np.clip(noise, 0, 255).astype(np.uint8)
+            neg = np.clip(-noise, 0, 255).astype(np.uint8)
+            bank.append((cv2.cvtColor(pos, cv2.COLOR_GRAY2BGR), cv2.cvtColor(neg, cv2.COLOR_GRAY2BGR)))
+        return bank
+
+    def vehicle_box(self, vehicle, t):
+        # Returns (x1, y1, x2, y2) in pixels, or None if not yet/no longer visible
+        dt = t - vehicle.enter_time
+        if dt < 0:
+            return None
+        length = vehicle.length_m * self.px_per_m
+        width = vehicle.width_m * self.px_per_m
+        travelled = dt * vehicle.speed_kmh / 3.6 * self.px_per_m
+        if vehicle.direction == "approaching":
+            front = travelled
+            y1, y2 = front - length, front
+        else:
+            front = self.height - travelled
+            y1, y2 = front, front + length
+        if y2 < 0 or y1 > self.height:
+            return None
+        cx = self._lane_center_x(vehicle.lane)
+        return (int(cx - width / 2), int(y1), int(cx + width / 2), int(y2))
+
+    def render(self, index):
+        t = index / self.fps
+        frame = self.background.copy()
+        for v in self.vehicles:
+            box = self.vehicle_box(v, t)
+            if box is None:
+                continue
+            x1, y1, x2, y2 = box
+            cv2.rectangle(frame, (x1, y1), (x2, y2), v.color, -1)
+            # Dark windscreen and rear window so bodies aren't uniform
+            h = y2 - y1
+            shade = tuple(int(c * 0.3) for c in v.color)
+            cv2.rectangle(frame, (x1 + 3, y1 + int(h * 0.2)), (x2 - 3, y1 + int(h * 0.32)), shade, -1)
+            cv2.rectangle(frame, (x1 + 3, y1 + int(h * 0.75)), (x2 - 3, y1 + int(h * 0.82)), shade, -1)
+
+        if self._noise_bank:
+            # Multiplicative hash of the index: deterministic, not periodic in 8
+            pos, neg = self._noise_bank[(index * 2654435761 >> 7) % len(self._noise_bank)]
+            cv2.add(frame, pos, dst=frame)
+            cv2.subtract(frame, neg, dst=frame)
+        return frame, t
+
+    def ground_truth(self):
+        # Vehicles that fully cross both lines while the scene runs, with the
+        # time their centre crosses the exit line (what the detector measures)
+        truth = []
+        line1 = LINE1_Y * self.height
+        line2 = LINE2_Y * self.height
+        for v in self.vehicles:
+            v_px = v.speed_kmh / 3.6 * self.px_per_m
+            half = v.length_m * self.px_per_m / 2
+            exit_line = line2 if v.direction == "approaching" else self.height - line1
+            exit_time = v.enter_time + (exit_line + half) / v_px
+            if exit_time + 0.5 < self.duration:
+                truth.append({"vehicle": v, "speed": v.speed_kmh, "exit_time": exit_time, "direction": v.direction})
+        return truth
+
+
+class SyntheticCamera:
+    # Same interface as MockCamera (start/get_frame/stop); `timestamp` is the
+    # scene time of the last frame returned.
+    def __init__(self, scene, loop=False, start_time=0.0):
+        self.scene = scene
+        self.loop = loop
+        self.start_time = start_time
+        self.width = scene.width
+        self.height = scene.height
+        self.fps = scene.fps
+        self.index = 0
+        self.timestamp = None
+
+    def start(self):
+        self.index = 0
+
+    def get_frame(self):
+        if self.index >= self.scene.frame_count:
+            if not self.loop:
+                return None
+            self.index = 0
+        frame, t = self.scene.render(self.index)
+        self.timestamp = self.start_time + t
+        self.index += 1
+        return frame
+
+    def stop(self):
+        pass
+
+
+def score_events(events, truth, time_tolerance=1.0):
+    # Greedy matching on direction and exit time. Returns per-truth matches
+    # plus counts of duplicate (second match for one vehicle) and false events.
+    matched = {}
+    duplicates = 0
+    false_events = 0
+    for ev in sorted(events, key=lambda e: e["timestamp"]):
+        best, best_dt = None, time_tolerance
+        for i, t in enumerate(truth):
+            if ev.get("direction") and ev["direction"] != t["direction"]:
+                continue
+            dt = abs(ev["timestamp"] - t["exit_time"])
+            if dt <= best_dt:
+                best, best_dt = i, dt
+        if best is None:
+            false_events += 1
+        elif best in matched:
+            duplicates += 1
+        else:
+            matched[best] = ev
+
+    errors = [matched[i]["speed"] - truth[i]["speed"] for i in matched]
+    rel_errors = [abs(matched[i]["speed"] - truth[i]["speed"]) / truth[i]["speed"] for i in matched]
+    return {
+        "vehicles": len(truth),
+        "detected": len(matched),
+        "missed": len(truth) - len(matched),
+        "duplicates": duplicates,
+        "false": false_events,
+        "errors": errors,
+        "rel_errors": rel_errors,
+    }
@@ -0,0 +1,185 @@
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+
+import yaml
+
+from src.core import StorageManager, SpeedDetector, EventDeduplicator
+from src.core.export import export_csv, export_events, export_images_zip, export_ndjson, parse_time
+from src.core.trace import replay, trace_segments
+from src.core.zones import zones_from_config
+
+REPLAY_COLUMNS = ["timestamp", "speed", "time_diff", "direction", "zone_id", "position", "object_id"]
+
+
+def _write_output(path, body):
+    out = open(path, "wb") if path != "-" else sys.stdout.buffer
+    try:
+        for chunk in body:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+def cmd_export(args):
+    storage = StorageManager(data_dir=args.data_dir)
+    start, end = parse_time(args.start), parse_time(args.end)
+
+    if args.images:
+        body = export_images_zip(storage.iter_event_batches(start, end), storage.images_dir)
+    else:
+        body = export_events(storage, args.format, start, end)
+
+    _write_output(args.output, body)
+    return 0
+
+
+def _detection_settings(args):
+    # detection section of --config with the --set KEY=VALUE overrides applied
+    with open(args.config) as f:
+        detection = (yaml.safe_load(f) or {}).get("detection", {})
+    for item in args.set or []:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"--set expects KEY=VALUE, got {item!r}")
+        detection[key] = yaml.safe_load(value)
+    return detection
+
+
+def cmd_replay(args):
+    detection = _detection_settings(args)
+    trace_dir = args.trace_dir or (detection.get("trace") or {}).get("directory") or os.path.join(args.data_dir, "traces")
+    start, end = parse_time(args.start), parse_time(args.end)
+    paths = trace_segments(trace_dir, start, end)
+    if not paths:
+        raise RuntimeError(f"No trace files in {trace_dir} for this range")
+
+    t0 = time.perf_counter()
+    events, frames = replay(SpeedDetector(detection), paths, start, end)
+    dedup = detection.get("dedup") or {}
+    if events and dedup.get("enabled", True):
+        events = EventDeduplicator(dedup.get("window_seconds", 1.5), dedup.get("position_tolerance", 0.15),
+                                   dedup.get("speed_tolerance", 3.0)).filter(events)
+    elapsed = time.perf_counter() - t0
+    print(f"Replayed {frames} frames from {len(paths)} trace files in {elapsed:.2f}s: {len(events)} events",
+          file=sys.stderr)
+
+    writer = export_csv if args.format == "csv" else export_ndjson
+    _write_output(args.output, writer(REPLAY_COLUMNS, [events]))
+    return 0
+
+
+def cmd_recompute(args):
+    zones = zones_from_config(_detection_settings(args))
+    distances = {zone.id: zone.real_distance for zone in zones}
+    if args.zone is not None:
+        if args.zone not in distances:
+            raise ValueError(f"Unknown zone {args.zone!r} (configured: {', '.join(distances)})")
+        distances = {args.zone: distances[args.zone]}
+
+    storage = StorageManager(data_dir=args.data_dir)
+    # Same version as the service uses for these settings
+    version = storage.register_calibration({"zones": [zone.to_dict() for zone in zones]})
+    result = storage.recompute_speeds(distances, version, parse_time(args.start), parse_time(args.end),
+                                      from_version=args.from_version)
+    summary = ", ".join(f"{zone_id} {distance} m" for zone_id, distance in distances.items())
+    print(f"Recomputed {result['updated']} events with {summary} (calibration version {version}); "
+          f"{result['skipped']} without timing skipped")
+    return 0
+
+
+def cmd_migrate_images(args):
+    storage = StorageManager(data_dir=args.data_dir)
+    result = storage.migrate_flat_images(batch_size=args.batch_size)
+    print(f"Migrated {result['migrated']} images ({result['missing']} missing on disk)")
+    return 0
+
+
+def cmd_worker(args):
+    from src.core.offload import DetectionWorker
+    DetectionWorker(args.listen).serve_forever()
+    return 0
+
+
+def cmd_daemon(args):
+    # Camera and detection for API processes started with daemon.enabled
+    from src.app.daemon import DEFAULT_ADDRESS, ControlServer
+    from src.app.service import SpeedCameraService
+    service = SpeedCameraService(args.config)
+    daemon = service.config.get("daemon") or {}
+    server = ControlServer(service, args.listen or daemon.get("address", DEFAULT_ADDRESS), secret=daemon.get("secret"))
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    service.start()
+    try:
+        server.serve_forever()  # until Ctrl-C or SIGTERM
+    finally:
+        service.stop()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.app.cli", description="Speed camera maintenance tools")
+    parser.add_argument("--data-dir", default="data", help="Data directory (database and images)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="Stream events (or their images) for a time range")
+    p.add_argument("--format", choices=["csv", "ndjson", "parquet"], default="csv")
+    p.add_argument("--start", help="Unix timestamp or ISO 8601 date (inclusive)")
+    p.add_argument("--end", help="Unix timestamp or ISO 8601 date (exclusive)")
+    p.add_argument("--images", action="store_true", help="Export a zip archive of the event images instead")
+    p.add_argument("-o", "--output", default="-", help="Output file, '-' for stdout")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("migrate-images", help="Move flat image files into YYYY/MM/DD directories")
+    p.add_argument("--batch-size", type=int, default=500, help="Rows per transaction")
+    p.set_defaults(func=cmd_migrate_images)
+
+    p = sub.add_parser("replay", help="Re-run tracking and speed measurement over recorded detection traces")
+    p.add_argument("--config", default="config/config.yaml", help="Config file with the detection settings to use")
+    p.add_argument("--set", action="append", metavar="KEY=VALUE",
+                   help="Override a detection setting, e.g. --set real_distance_meters=6.2 (repeatable)")
+    p.add_argument("--trace-dir", help="Trace directory (default: detection.trace.directory)")
+    p.add_argument("--start", help="Unix timestamp or ISO 8601 date (inclusive)")
+    p.add_argument("--end", help="Unix timestamp or ISO 8601 date (exclusive)")
+    p.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    p.add_argument("-o", "--output", default="-", help="Output file, '-' for stdout")
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("recompute", help="Recompute stored speeds after changing real_distance_meters")
+    p.add_argument("--config", default="config/config.yaml", help="Config file with the distances to use")
+    p.add_argument("--set", action="append", metavar="KEY=VALUE",
+                   help="Override a detection setting, e.g. --set real_distance_meters=6.2 (repeatable)")
+    p.add_argument("--zone", help="Only events of this zone")
+    p.add_argument("--start", help="Unix timestamp or ISO 8601 date (inclusive)")
+    p.add_argument("--end", help="Unix timestamp or ISO 8601 date (exclusive)")
+    p.add_argument("--from-version", type=int, help="Only events measured with this calibration version")
+    p.set_defaults(func=cmd_recompute)
+
+    p = sub.add_parser("worker", help="Run speed detection for cameras that offload it (see offload in config.yaml)")
+    p.add_argument("--listen", default="tcp://0.0.0.0:7070", help="tcp://host:port or unix:///path/to.sock")
+    p.set_defaults(func=cmd_worker)
+
+    p = sub.add_parser("daemon", help="Run the camera and detection for API processes (see daemon in config.yaml)")
+    p.add_argument("--config", default="config/config.yaml")
+    p.add_argument("--listen", help="unix:///path/to.sock, or tcp://host:port with daemon.secret set (default: daemon.address)")
+    p.set_defaults(func=cmd_daemon)
+
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
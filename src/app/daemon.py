@@ -0,0 +1,426 @@
+import hmac
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+
+import yaml
+
+from src.core import StorageManager
+from src.core.offload import MessageServer, ProtocolError, parse_address, recv_message, send_message
+from src.core.streaming import RATE_WINDOW, retier, snap_tier
+from src.app.service import SpeedCameraService
+
+# Split deployment: one capture daemon owns the camera and the detection
+# pipeline; any number of API processes (uvicorn --workers N) serve the web
+# interface. API processes read events straight from the shared SQLite
+# database and ask the daemon for everything else, over a local socket with
+# the offload framing (src.core.offload):
+#
+#   api -> daemon:  {"type": "call", "method": m, "args": {...}}
+#   daemon -> api:  {"type": "reply", "result": ...}
+#                   {"type": "error", "error": "...", "value_error": bool}
+#
+#   api -> daemon:  {"type": "subscribe", "width": w, "quality": q}
+#   daemon -> api:  {"type": "frame", "timestamp": t, "etag": "..."} + JPEG,
+#                   for every new frame, until the connection closes
+#
+# Subscriptions share the daemon's stream tiers, so each frame is encoded
+# once per tier however many API processes and browsers watch it.
+#
+# The calls read and change the whole config, passwords and tokens included.
+# A unix socket is protected by its file permissions; a tcp:// address needs
+# a shared secret (daemon.secret), sent as "secret" in every request.
+DEFAULT_ADDRESS = "unix://data/daemon.sock"
+
+METHODS = {
+    "status": lambda service: service.status(),
+    "config": lambda service: service.config,
+    "save_config": lambda service, config: service.save_config(config),
+    "metrics": lambda service: service.get_metrics(),
+    "zones": lambda service: service.get_zones(),
+    "calibration_events": lambda service: service.get_calibration_events(),
+    "calibration_version": lambda service: service.calibration_version,
+    "recompute_speeds": lambda service, **args: service.recompute_speeds(**args),
+}
+
+
+class DaemonUnavailable(RuntimeError):
+    pass
+
+
+class ControlServer(MessageServer):
+    # Daemon side: answers calls and streams encoded frames for a
+    # SpeedCameraService running in this process
+    name = "control-server"
+
+    def __init__(self, service, address=DEFAULT_ADDRESS, secret=None):
+        super().__init__(address)
+        if self.family != socket.AF_UNIX and not secret:
+            raise ValueError(f"Listening on {address} needs daemon.secret; use a unix:// address otherwise")
+        self.service = service
+        self.secret = secret or None
+        self.calls = 0
+        self.subscriptions = 0
+
+    def _serve(self, conn, peer):
+        try:
+            while self.running:
+                header, _ = recv_message(conn, lambda: self.running)
+                if not self._authorized(header):
+                    self.logger.warning(f"Rejected a request without the right secret from {peer or 'local socket'}")
+                    send_message(conn, {"type": "error", "error": "Not authorized", "value_error": False})
+                    return
+                kind = header.get("type")
+                if kind == "call":
+                    send_message(conn, self._call(header.get("method"), header.get("args") or {}))
+                elif kind == "subscribe":
+                    self._stream(conn, header.get("width"), header.get("quality"))
+                    return
+        except (OSError, ConnectionError, ProtocolError, ValueError) as e:
+            if self.running:
+                self.logger.debug(f"API connection closed: {e}")
+
+    def _authorized(self, header):
+        if self.secret is None:
+            return True
+        return hmac.compare_digest(str(header.get("secret") or "").encode(), self.secret.encode())
+
+    def _call(self, method, args):
+        self.calls += 1
+        handler = METHODS.get(method)
+        if handler is None:
+            return {"type": "error", "error": f"Unknown method {method!r}", "value_error": True}
+        try:
+            return {"type": "reply", "result": handler(self.service, **args)}
+        except ValueError as e:
+            return {"type": "error", "error": str(e), "value_error": True}
+        except Exception as e:
+            self.logger.exception(f"Call {method} failed")
+            return {"type": "error", "error": str(e), "value_error": False}
+
+    def _stream(self, conn, width, quality):
+        # Latest frame only: while a send blocks, newer frames replace the
+        # one waiting, so a slow API process gets fewer frames, not old ones
+        frames = self.service.frames
+        tier = frames.get_tier(width, quality)
+        cap = frames.max_quality
+        tier.add_client(1)
+        self.subscriptions += 1
+        seq = 0
+        try:
+            while self.running:
+                if frames.wait_for_frame(seq, timeout=1.0) is None:
+                    continue
+                if frames.max_quality != cap:
+                    cap = frames.max_quality
+                    tier = retier(frames, tier, width, quality)
+                encoded = frames.get_encoded(tier)
+                if encoded is None:
+                    continue
+                seq, timestamp, etag, jpeg = encoded
+                send_message(conn, {"type": "frame", "timestamp": timestamp, "etag": etag}, jpeg)
+                tier.record_sent(len(jpeg))
+        finally:
+            tier.add_client(-1)
+            self.subscriptions -= 1
+
+    def stats(self):
+        return {"address": self.bound_address, "calls": self.calls, "subscriptions": self.subscriptions}
+
+
+def _connect(address, timeout):
+    family, sockaddr = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(sockaddr)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+class RemoteTier:
+    # One subscription's latest frame, with the StreamTier interface
+    # mjpeg_stream and the snapshot endpoint use
+    def __init__(self, width, quality):
+        self.width = width
+        self.quality = quality
+        self.seq = 0  # frames received by this process, not the daemon's numbering
+        self.timestamp = None
+        self.etag = None
+        self.jpeg = None
+        self.last_used = time.monotonic()
+        self.thread = None
+        self.closed = False  # subscription ended; get_tier starts a new one
+
+        # Metrics
+        self.clients = 0
+        self.frames_received = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self._recent = deque()  # (time, bytes_sent)
+        self._stats_lock = threading.Lock()
+
+    def add_client(self, delta):
+        with self._stats_lock:
+            self.clients += delta
+        self.last_used = time.monotonic()
+
+    def record_sent(self, nbytes):
+        now = time.monotonic()
+        with self._stats_lock:
+            self.frames_sent += 1
+            self.bytes_sent += nbytes
+            self._recent.append((now, nbytes))
+            while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+                self._recent.popleft()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._stats_lock:
+            recent = sum(n for t, n in self._recent if t >= now - RATE_WINDOW)
+            return {
+                "width": self.width,
+                "quality": self.quality,
+                "clients": self.clients,
+                "frames_received": self.frames_received,
+                "frames_sent": self.frames_sent,
+                "bytes_sent": self.bytes_sent,
+                "bandwidth_bps": int(recent * 8 / RATE_WINDOW),
+            }
+
+
+class RemoteBroadcaster:
+    # API-process side of the frame stream, with the FrameBroadcaster
+    # interface mjpeg_stream and the snapshot endpoint use. Each tier in use
+    # has a subscription thread receiving the daemon's JPEGs; it reconnects
+    # with backoff while the tier is used and ends after `idle_timeout`
+    # seconds without clients or snapshot requests.
+    def __init__(self, address, secret=None, idle_timeout=30.0, retry_min=0.5, retry_max=5.0):
+        self.address = address
+        self.secret = secret
+        self.idle_timeout = idle_timeout
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self.logger = logging.getLogger("RemoteBroadcaster")
+        self.cond = threading.Condition()
+        self.seq = 0
+        self.tiers = {}
+        self.tiers_lock = threading.Lock()
+        self.running = True
+
+    def get_tier(self, width=None, quality=None):
+        # Snapped without the source width, which only the daemon knows; it
+        # maps the request onto its own tiers
+        key = snap_tier(width, quality)
+        with self.tiers_lock:
+            tier = self.tiers.get(key)
+            if tier is None or tier.closed:
+                tier = self.tiers[key] = RemoteTier(*key)
+                tier.thread = threading.Thread(target=self._subscribe, args=(key, tier), daemon=True,
+                                               name=f"subscribe-{key[0] or 'full'}-q{key[1]}")
+                tier.thread.start()
+            tier.last_used = time.monotonic()
+            return tier
+
+    def _idle(self, tier):
+        return tier.clients <= 0 and time.monotonic() - tier.last_used > self.idle_timeout
+
+    def _subscribe(self, key, tier):
+        try:
+            while True:
+                self._receive(tier)
+                # Idle check and removal in one step under tiers_lock, so
+                # get_tier can't hand out a tier whose thread is ending
+                with self.tiers_lock:
+                    if not self.running or self._idle(tier):
+                        self._remove(key, tier)
+                        return
+        finally:
+            with self.tiers_lock:
+                self._remove(key, tier)
+
+    def _remove(self, key, tier):
+        # Called with tiers_lock held
+        tier.closed = True
+        if self.tiers.get(key) is tier:
+            del self.tiers[key]
+
+    def _receive(self, tier):
+        backoff = self.retry_min
+        active = lambda: self.running and not self._idle(tier)
+        while active():
+            sock = None
+            try:
+                sock = _connect(self.address, timeout=1.0)
+                send_message(sock, {"type": "subscribe", "width": tier.width, "quality": tier.quality,
+                                    "secret": self.secret})
+                backoff = self.retry_min
+                while active():
+                    header, jpeg = recv_message(sock, active)
+                    if header.get("type") != "frame":
+                        raise ProtocolError(header.get("error") or f"Unexpected message {header.get('type')!r}")
+                    with self.cond:
+                        self.seq += 1
+                        tier.seq += 1
+                        tier.frames_received += 1
+                        tier.timestamp = header.get("timestamp")
+                        tier.etag = header.get("etag")
+                        tier.jpeg = jpeg
+                        self.cond.notify_all()
+            except (OSError, ConnectionError, ProtocolError, ValueError) as e:
+                if not active():
+                    break
+                self.logger.warning(f"Frame stream from {self.address} lost ({e}), retrying in {backoff:.1f}s")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.retry_max)
+            finally:
+                if sock is not None:
+                    sock.close()
+
+    def wait_for_frame(self, after_seq, timeout=1.0, tier=None):
+        with self.cond:
+            current = lambda: tier.seq if tier is not None else self.seq
+            if current() <= after_seq:
+                self.cond.wait(timeout)
+            if current() <= after_seq:
+                return None
+            return current()
+
+    def get_jpeg(self, tier):
+        tier.last_used = time.monotonic()
+        with self.cond:
+            return tier.seq, tier.jpeg
+
+    def get_snapshot(self, tier, timeout=2.0):
+        # A new subscription has no frame yet: wait for the first one
+        tier.last_used = time.monotonic()
+        if tier.jpeg is None:
+            self.wait_for_frame(0, timeout, tier)
+        with self.cond:
+            if tier.jpeg is None:
+                return None
+            return tier.etag, tier.timestamp, tier.jpeg
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.tiers_lock:
+            tiers = list(self.tiers.values())
+        return {"seq": self.seq, "tiers": [t.stats() for t in tiers]}
+
+
+class RemoteService:
+    # What an API process uses instead of SpeedCameraService when the capture
+    # daemon runs separately: the same attributes and methods the web app
+    # uses, answered by the daemon at `address`, except stored events, which
+    # are read from the shared database directly. Holds no state of its own
+    # (the config is cached for `config_ttl` seconds), so any number of API
+    # processes can run side by side.
+    #
+    # A call that gets no answer within `timeout` seconds (recompute_speeds:
+    # `recompute_timeout`, it rewrites many rows) raises DaemonUnavailable.
+    def __init__(self, address=DEFAULT_ADDRESS, data_dir="data", timeout=5.0, secret=None, config_ttl=5.0,
+                 recompute_timeout=120.0):
+        self.address = address
+        self.timeout = timeout
+        self.recompute_timeout = recompute_timeout
+        self.secret = secret
+        self.config_ttl = config_ttl
+        self.logger = logging.getLogger("RemoteService")
+        self.frames = RemoteBroadcaster(address, secret=secret)
+        self.storage = StorageManager(data_dir=data_dir)
+        self._config = None
+        self._config_time = 0.0
+
+    def call(self, method, timeout=None, **args):
+        timeout = timeout or self.timeout
+        try:
+            sock = _connect(self.address, timeout)
+        except OSError as e:
+            raise DaemonUnavailable(f"Capture daemon not reachable at {self.address}: {e}")
+        deadline = time.monotonic() + timeout
+        try:
+            send_message(sock, {"type": "call", "method": method, "args": args, "secret": self.secret})
+            reply, _ = recv_message(sock, lambda: time.monotonic() < deadline)
+        except ConnectionError as e:
+            if time.monotonic() >= deadline:
+                raise DaemonUnavailable(f"No answer from the capture daemon within {timeout:g}s")
+            raise DaemonUnavailable(f"No answer from the capture daemon: {e}")
+        except (OSError, ProtocolError) as e:
+            raise DaemonUnavailable(f"No answer from the capture daemon: {e}")
+        finally:
+            sock.close()
+        if reply.get("type") == "error":
+            if reply.get("value_error"):
+                raise ValueError(reply["error"])
+            raise RuntimeError(reply["error"])
+        return reply.get("result")
+
+    def start(self):
+        self.logger.info(f"API process {os.getpid()} using the capture daemon at {self.address}")
+
+    def stop(self):
+        self.frames.stop()
+
+    def status(self):
+        try:
+            return self.call("status")
+        except DaemonUnavailable as e:
+            return {"state": "unreachable", "ready": False, "error": str(e)}
+
+    @property
+    def config(self):
+        # Read on every login and snapshot poll; a save in another API process
+        # shows up here within config_ttl
+        now = time.monotonic()
+        if self._config is None or now - self._config_time > self.config_ttl:
+            self._config = self.call("config")
+            self._config_time = now
+        return self._config
+
+    @property
+    def calibration_version(self):
+        return self.call("calibration_version")
+
+    def save_config(self, config):
+        saved = self.call("save_config", config=config)
+        self._config = None
+        return saved
+
+    def get_metrics(self):
+        metrics = self.call("metrics")
+        metrics["api"] = {"pid": os.getpid(), "stream": self.frames.stats()}
+        return metrics
+
+    def get_zones(self):
+        return self.call("zones")
+
+    def get_calibration_events(self):
+        return self.call("calibration_events")
+
+    def recompute_speeds(self, start=None, end=None, zone_id=None, from_version=None):
+        return self.call("recompute_speeds", timeout=self.recompute_timeout,
+                         start=start, end=end, zone_id=zone_id, from_version=from_version)
+
+
+def create_service(config_path="config/config.yaml"):
+    # The web app's service: a RemoteService when daemon.enabled is set in the
+    # config (the camera runs in `python -m src.app.cli daemon`), otherwise
+    # the whole pipeline in this process, as before
+    try:
+        with open(config_path) as f:
+            config = yaml.safe_load(f) or {}
+    except OSError:
+        config = {}
+    daemon = config.get("daemon") or {}
+    if daemon.get("enabled", False):
+        return RemoteService(daemon.get("address", DEFAULT_ADDRESS), secret=daemon.get("secret"))
+    return SpeedCameraService(config_path)
@@ -4,12 +4,16 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from src.app.service import SpeedCameraService
+from src.app.daemon import DaemonUnavailable, create_service
+from src.core import mjpeg_stream
+from src.core.export import EXPORT_FORMATS, export_events, export_images_zip, parse_time
 import uvicorn
 import os
 import logging
 import cv2
 import subprocess
+import threading
+from email.utils import formatdate, parsedate_to_datetime
 
 # Logging setup
 log_dir = "data/logs"
@@ -44,8 +48,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Service instance
-service = SpeedCameraService()
+# Service instance: the capture pipeline itself, or with daemon.enabled a
+# stateless client of `python -m src.app.cli daemon` (then --workers N works).
+# Handlers that use it beyond storage are plain def: with the daemon those
+# are socket calls, which must not block the event loop.
+service = create_service()
+
+@app.exception_handler(DaemonUnavailable)
+async def daemon_unavailable(request: Request, exc: DaemonUnavailable):
+    return JSONResponse({"detail": str(exc)}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
 
 # Application Version
 APP_VERSION = "1.2.0 (GStreamer)"
@@ -65,8 +76,7 @@ if not os.path.exists("data/images"):
 app.mount("/images", StaticFiles(directory="data/images"), name="images")
 
 
-@app.on_event("startup")
-async def startup_event():
+def log_libcamera_version():
     # Log libcamera version for debugging
     try:
         libcam_ver = subprocess.check_output(
@@ -77,8 +87,13 @@ async def startup_event():
     except Exception as e:
         logger.warning(f"Could not determine libcamera version: {e}")
 
+@app.on_event("startup")
+async def startup_event():
+    # Diagnostics run in the background so they don't delay serving
+    threading.Thread(target=log_libcamera_version, daemon=True).start()
+
     logger.info(f"Starting Speed Camera Service... Version: {APP_VERSION}")
-    # Wait a bit for camera init
+    # Camera init continues in the background, see /ready
     try:
         service.start()
     except Exception as e:
@@ -89,6 +104,17 @@ async def shutdown_event():
     logger.info("Stopping Speed Camera Service...")
     service.stop()
 
+# Health checks (no auth, used by Docker and monitoring)
+@app.get("/health")
+async def health():
+    return {"status": "ok", "version": APP_VERSION}
+
+@app.get("/ready")
+def ready():
+    status_info = service.status()
+    code = status.HTTP_200_OK if status_info["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_info, status_code=code)
+
 # Auth Dependency
 async def check_auth(request: Request):
     user = request.session.get("user")
@@ -102,7 +128,7 @@ async def login_page(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 @app.post("/login")
-async def login(request: Request, username: str = Form(...), password: str = Form(...)):
+def login(request: Request, username: str = Form(...), password: str = Form(...)):
     # Get credentials from config
     config_user = service.config.get("web", {}).get("username", "admin")
     config_pass = service.config.get("web", {}).get("password", "admin")
@@ -125,42 +151,126 @@ async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.get("/stream")
-async def video_feed(request: Request):
+async def video_feed(request: Request, width: int = None, quality: int = None, fps: float = None):
     # Stream might be embedded in page, checking session here
     if not request.session.get("user"):
          raise HTTPException(status_code=401)
-         
-    def generate():
-        while True:
-            frame = service.get_jpeg_frame()
-            if frame:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                import time
-                time.sleep(0.1)
-                
-    return StreamingResponse(generate(), media_type="multipart/x-mixed-replace; boundary=frame")
+
+    # Optional per-client tier: ?width=640&quality=60&fps=10
+    stream = mjpeg_stream(service.frames, width=width, quality=quality, max_fps=fps)
+    return StreamingResponse(stream, media_type="multipart/x-mixed-replace; boundary=frame")
+
+# Plain def: encoding a new frame (resize + JPEG), or waiting for the daemon's
+# first frame of a tier, runs in the threadpool, not on the event loop
+@app.get("/api/snapshot.jpg")
+def snapshot(request: Request, width: int = None, quality: int = None, token: str = None):
+    # Session login, or ?token= for dashboards/home automation (web.snapshot_token)
+    snapshot_token = service.config.get("web", {}).get("snapshot_token")
+    if not request.session.get("user") and not (snapshot_token and token == snapshot_token):
+        raise HTTPException(status_code=401)
+
+    tier = service.frames.get_tier(width or None, quality or None)
+    snap = service.frames.get_snapshot(tier)
+    if snap is None:
+        raise HTTPException(status_code=503, detail="No frame available yet")
+    etag, timestamp, jpeg = snap
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(timestamp, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+    # Conditional GET: If-None-Match wins over If-Modified-Since (RFC 7232)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"]).timestamp()
+            if int(timestamp) <= since:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    tier.record_sent(len(jpeg))
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
 
 @app.get("/api/config")
-async def get_config(user: str = Depends(check_auth)):
+def get_config(user: str = Depends(check_auth)):
     return service.config
 
 @app.post("/api/config")
-async def update_config(config: dict, user: str = Depends(check_auth)):
+def update_config(config: dict, user: str = Depends(check_auth)):
     success = service.save_config(config)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to save config")
     return {"status": "ok", "config": service.config}
 
 @app.get("/api/history")
-async def get_history(limit: int = 50, offset: int = 0, user: str = Depends(check_auth)):
-    events = service.storage.get_events(limit, offset)
+async def get_history(limit: int = 50, offset: int = 0, zone: str = None, user: str = Depends(check_auth)):
+    events = service.storage.get_events(limit, offset, zone_id=zone)
     return {"events": events}
 
+@app.get("/api/zones")
+def get_zones(user: str = Depends(check_auth)):
+    return {"zones": service.get_zones()}
+
+def _export_range(start, end):
+    try:
+        return parse_time(start), parse_time(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be unix timestamps or ISO 8601 dates")
+
+@app.get("/api/export")
+async def export(format: str = "csv", start: str = None, end: str = None, user: str = Depends(check_auth)):
+    start_ts, end_ts = _export_range(start, end)
+    try:
+        body = export_events(service.storage, format, start_ts, end_ts)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, ext = EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="events.{ext}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+@app.get("/api/export/images.zip")
+async def export_images(start: str = None, end: str = None, user: str = Depends(check_auth)):
+    start_ts, end_ts = _export_range(start, end)
+    batches = service.storage.iter_event_batches(start_ts, end_ts)
+    body = export_images_zip(batches, service.storage.images_dir)
+    headers = {"Content-Disposition": 'attachment; filename="images.zip"'}
+    return StreamingResponse(body, media_type="application/zip", headers=headers)
+
+# Plain def: a GROUP BY over all stored events, kept off the event loop
+@app.get("/api/stats")
+def get_stats(start: str = None, end: str = None, user: str = Depends(check_auth)):
+    start_ts, end_ts = _export_range(start, end)
+    return {"zones": service.storage.zone_stats(start_ts, end_ts)}
+
+@app.get("/api/metrics")
+def get_metrics(user: str = Depends(check_auth)):
+    return service.get_metrics()
+
 @app.get("/api/calibration/events")
-async def get_calibration_events(user: str = Depends(check_auth)):
-    return list(service.calibration_events)
+def get_calibration_events(user: str = Depends(check_auth)):
+    return service.get_calibration_events()
+
+@app.get("/api/calibration/versions")
+def get_calibration_versions(user: str = Depends(check_auth)):
+    return {"current": service.calibration_version, "versions": service.storage.get_calibrations()}
+
+@app.post("/api/calibration/recompute")
+def recompute_speeds(start: str = None, end: str = None, zone: str = None, from_version: int = None,
+                     user: str = Depends(check_auth)):
+    # Recomputes stored speeds with the current distances (after changing
+    # real_distance_meters); images and their file names are not changed
+    start_ts, end_ts = _export_range(start, end)
+    try:
+        return service.recompute_speeds(start_ts, end_ts, zone_id=zone, from_version=from_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -2,24 +2,47 @@ import threading
 import time
 import yaml
 import logging
-import cv2
 import os
 from collections import deque
-from src.core import Camera, MockCamera, SpeedDetector, StorageManager, NotificationManager
+from src.core import Camera, MockCamera, SpeedDetector, StorageManager, NotificationManager, EventDeduplicator, FrameBroadcaster, BufferPool
+from src.core.offload import OffloadClient
+from src.core.governor import PerformanceGovernor
+from src.core.trace import TraceWriter
+from src.core.background import load_background, save_background
 
 class SpeedCameraService:
     def __init__(self, config_path="config/config.yaml"):
         self.config_path = config_path
         self.running = False
         self.thread = None
-        self.latest_frame = None
-        self.lock = threading.Lock()
+        self.frames = FrameBroadcaster()
+        # Capture buffers: one being processed, one published, spares for
+        # encoders still holding an older frame
+        self.pool = BufferPool(max_free=4)
         self.logger = logging.getLogger("Service")
         self.camera = None
         self.detector = None
         self.storage = None
         self.notifier = None
+        self.deduplicator = None
+        self.offload = None
+        self.governor = None
+        # Processed frames per second (None = every frame); set by the governor
+        self.detect_fps = None
+        # Background snapshot for warm starts (detection.warm_start)
+        self.warm_start = {}
+        self.last_background_save = None
         self.calibration_events = deque(maxlen=20)
+        # Version of the current measurement settings (see StorageManager.register_calibration)
+        self.calibration_version = None
+
+        # Readiness: "stopped" -> "starting" -> "ready" (or "failed"); status()
+        # also checks that the loop runs and frames keep coming
+        self.state = "stopped"
+        self.state_error = None
+        self.created_at = time.monotonic()
+        self.start_requested_at = None
+        self.ready_at = None
         
         self.load_config()
         self.init_components()
@@ -40,6 +63,10 @@ class SpeedCameraService:
             
             # Reload components if needed
             self.detector.update_config(self.config["detection"])
+            self.calibration_version = self.storage.register_calibration(self.calibration_settings())
+            self.deduplicator.update_config(self.config["detection"].get("dedup", {}))
+            if self.offload is not None:
+                self.offload.update_config(self.config["detection"])
             self.notifier.update_config(self.config["notifications"])
             self.logger.info("Configuration updated.")
             return True
@@ -57,88 +84,327 @@ class SpeedCameraService:
         if isinstance(dev, str) and (dev.endswith(".mp4") or dev.endswith(".avi") or dev.endswith(".mkv")):
              self.camera = MockCamera(dev)
         else:
-             self.camera = Camera(dev, w, h, fps)
+             cache_path = self.config["camera"].get("cache_path", "data/camera_cache.json")
+             self.camera = Camera(dev, w, h, fps, cache_path=cache_path)
              
         # Detector
         self.detector = SpeedDetector(self.config["detection"])
+
+        # Seed the background model from the last run's snapshot
+        self.warm_start = self.config["detection"].get("warm_start") or {}
+        if self.warm_start.get("enabled", False):
+            max_age = self.warm_start.get("max_age_minutes", 120) * 60
+            self.detector.background_seed = load_background(self.warm_start.get("path", "data/background.npz"), max_age)
+        self.last_background_save = time.monotonic()
+
+        # Optional blob trace for replaying detection with new settings
+        trace = self.config["detection"].get("trace") or {}
+        if trace.get("enabled", False):
+            self.detector.trace = TraceWriter(
+                trace.get("directory", "data/traces"),
+                max_bytes=int(trace.get("max_disk_mb", 500) * 1024 * 1024),
+                segment_bytes=int(trace.get("segment_mb", 16) * 1024 * 1024),
+            )
+
+        # Duplicate event suppression (re-registered or split tracks)
+        dedup = self.config["detection"].get("dedup", {})
+        self.deduplicator = EventDeduplicator(
+            window_seconds=dedup.get("window_seconds", 1.5),
+            position_tolerance=dedup.get("position_tolerance", 0.15),
+            speed_tolerance=dedup.get("speed_tolerance", 3.0)
+        )
         
+        # Optional: run detection on a worker node instead of here
+        offload = self.config.get("offload") or {}
+        if offload.get("enabled", False):
+            self.offload = OffloadClient(
+                offload["address"],
+                detection_config=self.config["detection"],
+                max_in_flight=offload.get("max_in_flight", 4),
+                jpeg_quality=offload.get("jpeg_quality", 85),
+                reply_timeout=offload.get("reply_timeout", 5.0),
+            )
+            # Frames waiting for a worker result stay in the pool
+            self.pool.max_free = 4 + self.offload.max_in_flight
+
+        # Steps quality/fps/detection cost down when the Pi runs hot or behind
+        governor = self.config.get("governor") or {}
+        if governor.get("enabled", False):
+            # The ladder starts at the configured engine and only steps to
+            # engines listed after it
+            engine = self.config["detection"].get("background_engine", "mog2")
+            engines = governor.get("engines") or [engine]
+            bounds = dict(governor)
+            bounds.update({
+                "max_fps": self.config["camera"].get("fps", 30),
+                "max_detection_scale": self.config["detection"].get("detection_scale", 1.0),
+                "engines": engines[engines.index(engine):] if engine in engines else [engine],
+            })
+            self.governor = PerformanceGovernor(bounds, self._apply_performance_settings)
+
         # Storage
         limit = self.config["limits"].get("max_disk_usage_percent", 90)
         self.storage = StorageManager(max_disk_usage=limit)
+        self.calibration_version = self.storage.register_calibration(self.calibration_settings())
         
         # Notifications
         self.notifier = NotificationManager(self.config["notifications"])
 
     def start(self):
+        # Non-blocking: camera probing happens on the service thread so the
+        # web server can answer /health and /ready while the camera comes up
         if self.running:
             return
-        
-        self.camera.start()
+
         self.running = True
-        self.thread = threading.Thread(target=self.run_loop, daemon=True)
+        self.state = "starting"
+        self.state_error = None
+        self.start_requested_at = time.monotonic()
+        self.thread = threading.Thread(target=self._start_and_run, daemon=True)
         self.thread.start()
-        self.logger.info("Service started.")
+
+    def _start_and_run(self):
+        try:
+            self.camera.start()
+        except Exception as e:
+            self.logger.error(f"Failed to start camera: {e}")
+            self.state = "failed"
+            self.state_error = str(e)
+            self.running = False
+            return
+
+        if self.offload is not None:
+            self.offload.start()
+        if self.governor is not None:
+            self.governor.start()
+
+        self.ready_at = time.monotonic()
+        self.state = "ready"
+        self.logger.info(f"Service started in {self.ready_at - self.start_requested_at:.2f}s.")
+        try:
+            self.run_loop()
+        except Exception as e:
+            self.logger.exception("Capture loop stopped")
+            self.state = "failed"
+            self.state_error = f"Capture loop stopped: {e}"
+            self.running = False
+
+    def status(self):
+        startup = None
+        if self.ready_at is not None:
+            startup = {
+                "total_seconds": round(self.ready_at - self.created_at, 3),
+                "camera_seconds": self.camera.start_duration,
+                "warm_start": self.camera.cache_hit,
+            }
+        # Started is not enough: the loop has to be alive and publishing frames
+        state, error = self.state, self.state_error
+        frame_age = time.time() - self.frames.timestamp if self.frames.timestamp is not None else None
+        if state == "ready":
+            stale_after = self.config["camera"].get("stale_seconds", 5.0)
+            if self.thread is None or not self.thread.is_alive():
+                state, error = "failed", error or "Capture loop stopped"
+            elif frame_age is None:
+                state = "starting"
+            elif frame_age > stale_after:
+                state, error = "stalled", f"No frame for {frame_age:.1f}s"
+        return {
+            "state": state,
+            "ready": state == "ready",
+            "error": error,
+            "frame_age_seconds": round(frame_age, 3) if frame_age is not None else None,
+            "uptime_seconds": round(time.monotonic() - self.created_at, 3),
+            "startup": startup,
+        }
 
     def stop(self):
         self.running = False
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=2.0)
+        if self.offload is not None:
+            self.offload.stop()
+        if self.detector.trace is not None:
+            self.detector.trace.close()
+        self.save_background()
         self.camera.stop()
+        self.frames.clear()
+        self.state = "stopped"
         self.logger.info("Service stopped.")
 
+    def _apply_performance_settings(self, settings):
+        self.detector.set_detection_scale(settings["detection_scale"])
+        self.detector.set_background_engine(settings["engine"])
+        # At the camera rate every frame is processed, whatever its jitter
+        self.detect_fps = settings["fps"] if settings["fps"] < self.config["camera"].get("fps", 30) else None
+        self.frames.max_quality = settings["stream_quality"]
+
     def run_loop(self):
+        next_detect = 0.0
         while self.running:
-            frame = self.camera.get_frame()
-            if frame is None:
+            buf = self.camera.read_buffer(self.pool)
+            if buf is None:
                 time.sleep(0.01)
                 continue
             
-            # Process frame
-            processed_frame, events = self.detector.process_frame(frame)
-            
-            # Handle events
-            if events:
+            timestamp = time.time()
+            # Below the camera rate, skipped frames are only streamed. Frames
+            # are due on a 1/fps grid, so jitter doesn't lower the rate
+            detect = self.detect_fps is None or timestamp >= next_detect
+            try:
+                if detect:
+                    started = time.perf_counter()
+                    if self.offload is not None:
+                        # The worker gets a JPEG copy; the buffer stays retained
+                        # until its result is back so events can use the original
+                        self.offload.submit(buf.array, timestamp, buffer=buf)
+                        self._handle_offload_results()
+                    else:
+                        # Process frame (annotations are drawn into the buffer in place)
+                        processed_frame, events = self.detector.process_frame(buf.array, timestamp)
+                        self._handle_events(events)
+                    if self.detect_fps is not None:
+                        period = 1.0 / self.detect_fps
+                        next_detect = max(next_detect + period, timestamp - period)
+                    if self.governor is not None:
+                        self.governor.record_frame(time.perf_counter() - started)
+                elif self.offload is not None:
+                    self._handle_offload_results()
+                if self.governor is not None:
+                    self.governor.tick()
+                if (self.warm_start.get("enabled", False) and
+                        time.monotonic() - self.last_background_save >= self.warm_start.get("interval_seconds", 300)):
+                    self.save_background()
+
+                # Event frames reference the buffer too; they were handled above,
+                # so from here on only read-only views are handed out
+                self.frames.publish(buf.view(), buffer=buf)
+            except Exception:
+                # One bad frame or event must not stop capture
+                self.logger.exception("Failed to process frame")
+            finally:
+                buf.release()
+
+    def save_background(self):
+        # Snapshot of the background model for the next start; skipped until
+        # the model has seen enough frames to be worth keeping
+        self.last_background_save = time.monotonic()
+        if not self.warm_start.get("enabled", False):
+            return
+        if self.detector.model_frames < self.warm_start.get("min_frames", 300):
+            return
+        snapshot = self.detector.background_state()
+        if snapshot is None:
+            return
+        try:
+            save_background(self.warm_start.get("path", "data/background.npz"), snapshot)
+        except OSError as e:
+            self.logger.error(f"Failed to save background snapshot: {e}")
+
+    def _handle_offload_results(self):
+        for events, event_buf in self.offload.poll():
+            try:
                 for event in events:
-                    self.handle_event(event)
-            
-            with self.lock:
-                self.latest_frame = processed_frame
+                    event["frame"] = event_buf.array if event_buf is not None else None
+                self._handle_events(events)
+            finally:
+                if event_buf is not None:
+                    event_buf.release()
+
+    def _handle_events(self, events):
+        if events and self.config["detection"].get("dedup", {}).get("enabled", True):
+            events = self.deduplicator.filter(events)
+        for event in events:
+            self.handle_event(event)
 
     def handle_event(self, event):
         speed = event["speed"]
         limit = self.config["limits"]["speed_limit_kmh"]
         
-        self.logger.info(f"Event Detected: {speed} km/h")
+        self.logger.info(f"Event Detected: {speed} km/h (zone {event.get('zone_id')})")
         
         # Save event
-        path = self.storage.save_event(event)
-        
+        event.setdefault("calibration_version", self.calibration_version)
+        try:
+            path = self.storage.save_event(event)
+        except Exception as e:
+            # The row is rolled back and the disk cleanup has run; a
+            # violation is still notified below
+            self.logger.error(f"Failed to save event: {e}")
+            path = None
+
         # Add to calibration buffer
-        cal_event = {
-            "timestamp": event["timestamp"],
-            "speed": event["speed"],
-            "time_diff": event.get("time_diff", 0),
-            "object_id": event["object_id"],
-            "image_path": os.path.basename(path)
-        }
-        self.calibration_events.appendleft(cal_event)
+        if path is not None:
+            cal_event = {
+                "timestamp": event["timestamp"],
+                "speed": event["speed"],
+                "time_diff": event.get("time_diff", 0),
+                "distance_m": event.get("distance_m"),
+                "calibration_version": event["calibration_version"],
+                "object_id": event["object_id"],
+                "zone_id": event.get("zone_id"),
+                "image_path": os.path.relpath(path, self.storage.images_dir)
+            }
+            self.calibration_events.appendleft(cal_event)
 
         # Notify if speeding
         if limit > 0 and speed > limit:
             msg = f"Speed Violation! {speed} km/h (Limit: {limit} km/h)"
-            self.notifier.notify(msg, path)
-            
-    def get_latest_frame(self):
-        with self.lock:
-            if self.latest_frame is None:
-                return None
-            return self.latest_frame.copy()
+            if len(self.detector.zones) > 1:
+                msg += f" - zone {event.get('zone_id')}"
+            self.notifier.notify(msg, frame=event["frame"])
             
-    def get_jpeg_frame(self):
-        frame = self.get_latest_frame()
-        if frame is None:
-            return None
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        if not ret:
-            return None
-        return jpeg.tobytes()
+    def get_zones(self):
+        return [zone.to_dict() for zone in self.detector.zones]
+
+    def get_calibration_events(self):
+        return list(self.calibration_events)
+
+    def calibration_settings(self):
+        # What a measured speed depends on: the zones' lines and distances
+        return {"zones": [zone.to_dict() for zone in self.detector.zones]}
+
+    def recompute_speeds(self, start=None, end=None, zone_id=None, from_version=None):
+        # Applies the current zone distances to stored events (e.g. after
+        # correcting real_distance_meters); history and stats read the
+        # events table, so they show the new speeds right away
+        distances = {zone.id: zone.real_distance for zone in self.detector.zones}
+        if zone_id is not None:
+            if zone_id not in distances:
+                raise ValueError(f"Unknown zone {zone_id!r}")
+            distances = {zone_id: distances[zone_id]}
+        result = self.storage.recompute_speeds(distances, self.calibration_version, start, end,
+                                               from_version=from_version)
+
+        for event in self.calibration_events:
+            distance = distances.get(event["zone_id"])
+            if distance is None or not event["time_diff"]:
+                continue
+            if from_version is not None and event["calibration_version"] != from_version:
+                continue
+            if (start is not None and event["timestamp"] < start) or (end is not None and event["timestamp"] >= end):
+                continue
+            event["distance_m"] = distance
+            event["calibration_version"] = self.calibration_version
+            event["speed"] = round(distance / event["time_diff"] * 3.6, 2)
+        result["calibration_version"] = self.calibration_version
+        return result
+
+    def get_metrics(self):
+        return {
+            "dedup": self.deduplicator.stats(),
+            "stream": self.frames.stats(),
+            "buffers": {
+                "pool": self.pool.stats(),
+                "detector_allocations": self.detector.scratch.allocations,
+            },
+            "offload": self.offload.stats() if self.offload is not None else None,
+            "governor": self.governor.stats() if self.governor is not None else None,
+            "trace": self.detector.trace.stats() if self.detector.trace is not None else None,
+            "evidence": self.detector.evidence.stats() if self.detector.evidence is not None else None,
+            "background": {
+                "engine": self.detector.background_engine,
+                "model_frames": self.detector.model_frames,
+                "warm_starts": self.detector.warm_starts,
+                "rejected_seeds": self.detector.rejected_seeds,
+            },
+        }
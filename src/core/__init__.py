@@ -2,3 +2,6 @@ from .camera import Camera, MockCamera
 from .speed_detector import SpeedDetector
 from .storage_manager import StorageManager
 from .notifications import NotificationManager
+from .dedup import EventDeduplicator
+from .streaming import FrameBroadcaster, mjpeg_stream
+from .buffer_pool import BufferPool, FrameBuffer
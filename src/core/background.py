@@ -0,0 +1,44 @@
+import logging
+import os
+import time
+
+import numpy as np
+
+# Background model snapshots for warm starts (see SpeedDetector.background_state).
+# One .npz file: the background image at detection size, the engine's full
+# state where it has one (running average), the engine name and save time.
+logger = logging.getLogger("Background")
+
+
+def save_background(path, snapshot):
+    # Written to a temporary file and renamed, so a crash mid-write leaves the
+    # previous snapshot intact
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    arrays = {"image": snapshot["image"], "engine": np.array(snapshot["engine"]), "saved_at": np.array(time.time())}
+    if snapshot.get("state") is not None:
+        arrays["state"] = snapshot["state"]
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def load_background(path, max_age=None):
+    # The snapshot dict, or None when there is none, it is older than
+    # max_age seconds, or it can't be read
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            age = time.time() - float(data["saved_at"])
+            if max_age is not None and age > max_age:
+                logger.info(f"Background snapshot is {age / 60:.0f} min old, starting cold")
+                return None
+            snapshot = {"engine": str(data["engine"]), "image": data["image"]}
+            if "state" in data:
+                snapshot["state"] = data["state"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring background snapshot {path}: {e}")
+        return None
+    logger.info(f"Loaded background snapshot ({snapshot['engine']}, {age:.0f}s old)")
+    return snapshot
@@ -0,0 +1,161 @@
+import cv2
+import numpy as np
+from .buffer_pool import ScratchBuffers
+
+EMPTY_RECTS = np.zeros((0, 4), dtype=np.int32)
+EMPTY_CENTROIDS = np.zeros((0, 2), dtype=np.int32)
+
+
+class BlobExtractor:
+    # Turns a foreground mask into vehicle blobs: rects as [x1, y1, x2, y2]
+    # and area-weighted centroids, both as int32 arrays.
+    #
+    # connectedComponentsWithStats gives area, bounding box and centroid for
+    # every blob in one call. Fragments of one vehicle (a truck split by its
+    # windows or a shadow gap) are merged when their boxes, grown by
+    # merge_distance pixels, overlap.
+    #
+    # Labelling every pixel costs more than tracing contours, so by default it
+    # runs on the mask shrunk by label_scale (any set pixel keeps its cell
+    # set, so thin parts survive). Vehicles are thousands of pixels, so the
+    # lost precision is a pixel or two on the box edges.
+    def __init__(self, min_area=5000, merge_distance=20, min_fragment_area=None, dilate_iterations=2, label_scale=0.5,
+                 scratch=None):
+        self.min_area = min_area
+        self.merge_distance = merge_distance
+        self.min_fragment_area = min_fragment_area
+        self.label_scale = label_scale
+        self.dilate_iterations = dilate_iterations
+        # Same 3x3 element cv2.dilate uses for kernel=None, built once
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self.scratch = scratch if scratch is not None else ScratchBuffers()
+
+    def update_config(self, config):
+        self.min_area = config.get("min_area", self.min_area)
+        self.merge_distance = config.get("merge_distance", self.merge_distance)
+        self.min_fragment_area = config.get("min_fragment_area", self.min_fragment_area)
+        self.label_scale = config.get("label_scale", self.label_scale)
+
+    def clean_mask(self, fgmask):
+        # Drop shadows (127) and fill small holes
+        sc = self.scratch
+        _, binary = cv2.threshold(fgmask, 200, 255, cv2.THRESH_BINARY, dst=sc.get("binary"))
+        sc.keep("binary", binary)
+        mask = cv2.dilate(binary, self.kernel, dst=sc.get("mask"), iterations=self.dilate_iterations)
+        return sc.keep("mask", mask)
+
+    def extract(self, mask):
+        sc = self.scratch
+        scale = self.label_scale
+        if scale and scale < 1.0:
+            small = cv2.resize(mask, None, dst=sc.get("small"), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            sc.keep("small", small)
+            cv2.threshold(small, 0, 255, cv2.THRESH_BINARY, dst=small)
+        else:
+            scale = 1.0
+            small = mask
+
+        n, labels, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(
+            small, 8, cv2.CV_32S, cv2.CCL_GRANA, labels=sc.get("labels")
+        )
+        sc.keep("labels", labels)
+        # Label 0 is the background
+        stats = stats[1:]
+        centroids = centroids[1:]
+
+        if scale != 1.0:
+            # Back to full resolution coordinates
+            stats = stats.astype(np.int64)
+            x2 = np.minimum(np.ceil((stats[:, 0] + stats[:, 2]) / scale), mask.shape[1]).astype(np.int64)
+            y2 = np.minimum(np.ceil((stats[:, 1] + stats[:, 3]) / scale), mask.shape[0]).astype(np.int64)
+            stats[:, 0] = np.floor(stats[:, 0] / scale)
+            stats[:, 1] = np.floor(stats[:, 1] / scale)
+            stats[:, 2] = x2 - stats[:, 0]
+            stats[:, 3] = y2 - stats[:, 1]
+            stats[:, 4] = np.rint(stats[:, 4] / (scale * scale))
+            centroids = (centroids + 0.5) / scale - 0.5
+
+        # Tiny specks never become vehicles, even merged; skip them early
+        min_fragment = self.min_fragment_area
+        if min_fragment is None:
+            min_fragment = self.min_area / 20.0
+        keep = stats[:, cv2.CC_STAT_AREA] >= min_fragment
+        stats = stats[keep]
+        centroids = centroids[keep]
+        if len(stats) == 0:
+            return EMPTY_RECTS, EMPTY_CENTROIDS
+
+        x1 = stats[:, cv2.CC_STAT_LEFT]
+        y1 = stats[:, cv2.CC_STAT_TOP]
+        x2 = x1 + stats[:, cv2.CC_STAT_WIDTH]
+        y2 = y1 + stats[:, cv2.CC_STAT_HEIGHT]
+        areas = stats[:, cv2.CC_STAT_AREA].astype(np.float64)
+
+        if self.merge_distance > 0 and len(stats) > 1:
+            groups = self._merge_groups(x1, y1, x2, y2)
+        else:
+            groups = np.arange(len(stats))
+
+        # Reduce each group to one blob
+        count = groups.max() + 1
+        gx1 = np.full(count, np.iinfo(np.int32).max, dtype=np.int64)
+        gy1 = np.full(count, np.iinfo(np.int32).max, dtype=np.int64)
+        gx2 = np.zeros(count, dtype=np.int64)
+        gy2 = np.zeros(count, dtype=np.int64)
+        garea = np.zeros(count, dtype=np.float64)
+        gcx = np.zeros(count, dtype=np.float64)
+        gcy = np.zeros(count, dtype=np.float64)
+        np.minimum.at(gx1, groups, x1)
+        np.minimum.at(gy1, groups, y1)
+        np.maximum.at(gx2, groups, x2)
+        np.maximum.at(gy2, groups, y2)
+        np.add.at(garea, groups, areas)
+        np.add.at(gcx, groups, centroids[:, 0] * areas)
+        np.add.at(gcy, groups, centroids[:, 1] * areas)
+
+        big = (garea >= self.min_area) & (garea > 0)
+        if not big.any():
+            return EMPTY_RECTS, EMPTY_CENTROIDS
+
+        rects = np.stack([gx1[big], gy1[big], gx2[big], gy2[big]], axis=1).astype(np.int32)
+        cents = np.stack([gcx[big] / garea[big], gcy[big] / garea[big]], axis=1)
+        return rects, np.rint(cents).astype(np.int32)
+
+    def _merge_groups(self, x1, y1, x2, y2):
+        # Pairwise test: do the boxes, grown by merge_distance, overlap?
+        d = self.merge_distance
+        adj = (
+            (x1[:, None] - d <= x2[None, :]) & (x1[None, :] - d <= x2[:, None]) &
+            (y1[:, None] - d <= y2[None, :]) & (y1[None, :] - d <= y2[:, None])
+        )
+
+        # Transitive closure by min-label propagation; converges in at most
+        # "chain length" steps, which is tiny for real scenes
+        n = len(x1)
+        labels = np.arange(n)
+        while True:
+            new_labels = np.where(adj, labels[None, :], n).min(axis=1)
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+
+        # Compact to 0..groups-1
+        _, groups = np.unique(labels, return_inverse=True)
+        return groups
+
+
+def contour_blobs(mask, min_area):
+    # Legacy path: findContours + per-contour area/boundingRect in Python.
+    # Centroids are the rect centres, as the tracker used to compute them.
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    rects = []
+    for c in contours:
+        if cv2.contourArea(c) < min_area:
+            continue
+        (x, y, w, h) = cv2.boundingRect(c)
+        rects.append((x, y, x + w, y + h))
+    if not rects:
+        return EMPTY_RECTS, EMPTY_CENTROIDS
+    rects = np.array(rects, dtype=np.int32)
+    centroids = np.stack([(rects[:, 0] + rects[:, 2]) // 2, (rects[:, 1] + rects[:, 3]) // 2], axis=1)
+    return rects, centroids.astype(np.int32)
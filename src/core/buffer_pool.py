@@ -0,0 +1,105 @@
+import threading
+import numpy as np
+
+
+class FrameBuffer:
+    # A pooled frame. Starts with one reference held by whoever acquired it;
+    # retain() for every extra holder, release() when done. At zero references
+    # the array goes back to the pool and may be overwritten by the next read.
+    def __init__(self, pool, array):
+        self.pool = pool
+        self.array = array
+        self.refs = 1
+
+    def retain(self):
+        with self.pool.lock:
+            self.refs += 1
+        return self
+
+    def release(self):
+        with self.pool.lock:
+            self.refs -= 1
+            if self.refs > 0:
+                return
+            if self.refs < 0:
+                raise RuntimeError("FrameBuffer released more often than retained")
+        self.pool._recycle(self)
+
+    def view(self):
+        # Read-only view for consumers; only valid while a reference is held
+        v = self.array.view()
+        v.flags.writeable = False
+        return v
+
+
+class BufferPool:
+    # Recycles frame-sized arrays so capture doesn't allocate per frame.
+    # Buffers of another shape (e.g. after a resolution change) are dropped
+    # instead of recycled.
+    def __init__(self, max_free=4, dtype=np.uint8):
+        self.max_free = max_free
+        self.dtype = dtype
+        self.lock = threading.Lock()
+        self.free = []
+
+        # Counters
+        self.allocated = 0
+        self.reused = 0
+        self.in_use = 0
+
+    def acquire(self, shape):
+        shape = tuple(shape)
+        with self.lock:
+            self.in_use += 1
+            while self.free:
+                array = self.free.pop()
+                if array.shape == shape:
+                    self.reused += 1
+                    return FrameBuffer(self, array)
+            self.allocated += 1
+        return FrameBuffer(self, np.empty(shape, dtype=self.dtype))
+
+    def adopt(self, buf, array):
+        # The producer returned a different array than the one it was given
+        # (e.g. the driver changed size); count it and keep the new one
+        with self.lock:
+            self.allocated += 1
+        buf.array = array
+
+    def _recycle(self, buf):
+        with self.lock:
+            self.in_use -= 1
+            if len(self.free) < self.max_free:
+                self.free.append(buf.array)
+        buf.array = None
+
+    def stats(self):
+        with self.lock:
+            return {
+                "allocated": self.allocated,
+                "reused": self.reused,
+                "in_use": self.in_use,
+                "free": len(self.free),
+            }
+
+
+class ScratchBuffers:
+    # Named per-stage output arrays, passed back to OpenCV as dst= so each
+    # stage writes into the same memory every frame. OpenCV reallocates when
+    # the shape changes; that shows up in `allocations`.
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.buffers = {}
+        self.allocations = 0
+
+    def get(self, name):
+        if not self.enabled:
+            return None
+        return self.buffers.get(name)
+
+    def keep(self, name, array):
+        if array is not self.buffers.get(name):
+            self.allocations += 1
+            if self.enabled:
+                self.buffers[name] = array
+        return array
@@ -1,27 +1,56 @@
 import cv2
+import numpy as np
 import time
 import logging
 import glob
+import json
 import os
 import subprocess
+import threading
 
 class Camera:
-    def __init__(self, source=0, width=1536, height=864, fps=30):
+    def __init__(self, source=0, width=1536, height=864, fps=30, cache_path=None):
         self.source = source
         self.width = width
         self.height = height
         self.fps = fps
         self.cap = None
         self.logger = logging.getLogger("Camera")
-        
+
+        # Last working capture configuration, tried first on the next start
+        # Keyed on the configured values, since probing may change source/size
+        self.cache_path = cache_path
+        self.cache_key = {"source": str(source), "width": width, "height": height, "fps": fps}
+        self.cache_hit = False
+        self.start_duration = None
+        self._opened_with = None
+
     def start(self):
+        t0 = time.monotonic()
+        try:
+            self._start()
+        finally:
+            self.start_duration = time.monotonic() - t0
+        self.logger.info(f"Camera ready in {self.start_duration:.2f}s (warm start: {self.cache_hit})")
+        self._save_cache()
+
+    def _start(self):
         self.logger.info(f"Starting camera from source: {self.source}")
-        
-        # Check for libcamerasrc availability
-        if self._check_gstreamer_plugin("libcamerasrc"):
-             self.logger.info("GStreamer plugin 'libcamerasrc' found.")
-        else:
-             self.logger.warning("GStreamer plugin 'libcamerasrc' NOT found. Ensure gstreamer1.0-libcamera is installed.")
+        self.cache_hit = False
+
+        # Warm start: try the configuration that worked last time before probing
+        cached = self._load_cache()
+        if cached is not None:
+            api = cv2.CAP_GSTREAMER if cached.get("api") == "gstreamer" else None
+            self.logger.info(f"Trying cached capture source: {cached['source']}")
+            if self._try_open(cached["source"], api):
+                self.logger.info("Camera started from cached capture configuration.")
+                self.cache_hit = True
+                return
+            self.logger.warning("Cached capture configuration failed. Probing all sources...")
+
+        # The plugin check is only diagnostic, don't block probing on it
+        threading.Thread(target=self._log_gstreamer_plugin, daemon=True).start()
 
         # Try GStreamer pipeline for Raspberry Pi 5 (Bookworm)
         # This is the preferred method for modern libcamera stack
@@ -76,6 +105,43 @@ class Camera:
         self.logger.error("Auto-discovery failed. No working camera found.")
         raise RuntimeError("Camera source could not be opened and auto-discovery failed.")
 
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "r") as f:
+                cached = json.load(f)
+            # A changed camera config invalidates the cache
+            if cached.get("key") != self.cache_key:
+                return None
+            return cached
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable camera cache {self.cache_path}: {e}")
+            return None
+
+    def _save_cache(self):
+        if not self.cache_path or self._opened_with is None or self.cache_hit:
+            return
+        source, api = self._opened_with
+        cached = {
+            "key": self.cache_key,
+            "source": source,
+            "api": "gstreamer" if api == cv2.CAP_GSTREAMER else None,
+        }
+        try:
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(cached, f)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            self.logger.warning(f"Failed to write camera cache {self.cache_path}: {e}")
+
+    def _log_gstreamer_plugin(self):
+        if self._check_gstreamer_plugin("libcamerasrc"):
+            self.logger.info("GStreamer plugin 'libcamerasrc' found.")
+        else:
+            self.logger.warning("GStreamer plugin 'libcamerasrc' NOT found. Ensure gstreamer1.0-libcamera is installed.")
+
     def _check_gstreamer_plugin(self, plugin_name):
         try:
             # check=True will raise CalledProcessError if return code is non-zero
@@ -106,6 +172,7 @@ class Camera:
             ret, frame = cap.read()
             if ret and frame is not None and frame.size > 0:
                 self.cap = cap
+                self._opened_with = (source, api_preference)
                 # Update actual resolution
                 actual_w = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
                 actual_h = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
@@ -132,6 +199,24 @@ class Camera:
             
         return frame
 
+    def read_buffer(self, pool):
+        # Like get_frame, but decodes into a recycled buffer from the pool.
+        # Returns a FrameBuffer the caller must release, or None.
+        if self.cap is None or not self.cap.isOpened():
+            return None
+
+        buf = pool.acquire((self.height, self.width, 3))
+        ret, frame = self.cap.read(image=buf.array)
+        if not ret or frame is None:
+            buf.release()
+            self.logger.warning("Failed to read frame.")
+            return None
+        if not np.shares_memory(frame, buf.array):
+            # Frame size differs from what we expected; follow the source
+            pool.adopt(buf, frame)
+            self.height, self.width = frame.shape[:2]
+        return buf
+
     def stop(self):
         if self.cap:
             self.cap.release()
@@ -149,3 +234,10 @@ class MockCamera(Camera):
             self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             return super().get_frame()
         return frame
+
+    def read_buffer(self, pool):
+        buf = super().read_buffer(pool)
+        if buf is None and self.loop and self.cap is not None:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            return super().read_buffer(pool)
+        return buf
@@ -0,0 +1,72 @@
+import logging
+
+
+class EventDeduplicator:
+    # Short-lived spatio-temporal index of recent events. Two events are the
+    # same car when they cross in the same direction within `window_seconds`
+    # of each other, at nearly the same position along the exit line
+    # (0.0 = line start, 1.0 = line end) and with speeds within
+    # `speed_tolerance` km/h: fragments and re-registered tracks of one car
+    # measure almost the same speed, two cars close together rarely do.
+    #
+    # Events are bucketed by zone, direction and time slot of `window_seconds`,
+    # so a lookup only scans the current and neighbouring slots, and expiring
+    # old entries is dropping whole slots.
+    def __init__(self, window_seconds=1.5, position_tolerance=0.15, speed_tolerance=3.0):
+        self.window = max(float(window_seconds), 1e-3)
+        self.position_tolerance = position_tolerance
+        self.speed_tolerance = speed_tolerance
+        self.buckets = {}  # (zone_id, direction, slot) -> [(timestamp, position, speed)]
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger("EventDeduplicator")
+
+    def update_config(self, config):
+        self.window = max(float(config.get("window_seconds", self.window)), 1e-3)
+        self.position_tolerance = config.get("position_tolerance", self.position_tolerance)
+        self.speed_tolerance = config.get("speed_tolerance", self.speed_tolerance)
+        self.buckets = {}
+
+    def _expire(self, now_slot):
+        for key in [k for k in self.buckets if k[2] < now_slot - 1]:
+            del self.buckets[key]
+
+    def is_duplicate(self, event):
+        # Registers the event when it is new
+        ts = event["timestamp"]
+        direction = event.get("direction")
+        zone_id = event.get("zone_id")
+        position = event.get("position")
+        speed = event.get("speed")
+        slot = int(ts // self.window)
+        self._expire(slot)
+
+        for s in (slot - 1, slot, slot + 1):
+            for (other_ts, other_pos, other_speed) in self.buckets.get((zone_id, direction, s), ()):
+                if abs(ts - other_ts) > self.window:
+                    continue
+                if speed is not None and other_speed is not None and abs(speed - other_speed) > self.speed_tolerance:
+                    continue
+                if position is None or other_pos is None or abs(position - other_pos) <= self.position_tolerance:
+                    self.hits += 1
+                    return True
+
+        self.buckets.setdefault((zone_id, direction, slot), []).append((ts, position, speed))
+        self.misses += 1
+        return False
+
+    def filter(self, events):
+        unique = []
+        for event in events:
+            if self.is_duplicate(event):
+                self.logger.info(f"Suppressed duplicate event for object {event['object_id']} ({event['speed']} km/h)")
+            else:
+                unique.append(event)
+        return unique
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "indexed": sum(len(v) for v in self.buckets.values()),
+        }
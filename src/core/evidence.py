@@ -0,0 +1,163 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+class EvidenceHistory:
+    # Clean frame copies for tracks that are between the lines of a zone, so
+    # the evidence image can be the best shot of the passage instead of the
+    # frame the exit happened to fall on.
+    #
+    # A copy is taken at most every `interval` seconds and only while some
+    # track is active; all active tracks share it. Each track keeps its last
+    # `per_track` samples (frame + box). Frames no track refers to are freed,
+    # and the oldest frames are dropped while the copies use more than
+    # `max_bytes`. Nothing is scored until select() is called for a track
+    # that produced an event.
+    def __init__(self, max_bytes=64 << 20, per_track=12, interval=0.04, crop_margin=0.1):
+        self.max_bytes = max_bytes
+        self.per_track = per_track
+        self.interval = interval
+        self.crop_margin = crop_margin
+
+        self.frames = {}  # frame id -> array, oldest first
+        self.refs = {}  # frame id -> number of samples using it
+        self.tracks = {}  # object id -> deque of (frame id, rect)
+        self.next_id = 0
+        self.last_sample = None
+        self.bytes = 0
+
+        # Counters
+        self.samples = 0
+        self.evicted = 0
+        self.selections = 0
+        self.scored = 0
+        self.peak_bytes = 0
+
+    def sample(self, frame, timestamp, rects):
+        # rects: {object_id: (x1, y1, x2, y2)} for the active tracks in this
+        # frame. Call before anything is drawn into the frame.
+        if not rects or frame.nbytes > self.max_bytes:
+            return
+        if self.last_sample is not None and 0 <= timestamp - self.last_sample < self.interval:
+            return
+        self.last_sample = timestamp
+
+        while self.frames and self.bytes + frame.nbytes > self.max_bytes:
+            self._evict_oldest()
+        frame_id = self.next_id
+        self.next_id += 1
+        self.frames[frame_id] = frame.copy()
+        self.refs[frame_id] = 0
+        self.bytes += frame.nbytes
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        self.samples += 1
+
+        for object_id, rect in rects.items():
+            samples = self.tracks.setdefault(object_id, deque())
+            if len(samples) >= self.per_track:
+                self._unref(samples.popleft()[0])
+            samples.append((frame_id, tuple(int(v) for v in rect)))
+            self.refs[frame_id] += 1
+
+    def _evict_oldest(self):
+        frame_id = next(iter(self.frames))
+        for samples in self.tracks.values():
+            while samples and samples[0][0] == frame_id:
+                samples.popleft()
+        self.refs[frame_id] = 0
+        self._unref(frame_id)
+        self.evicted += 1
+
+    def _unref(self, frame_id):
+        self.refs[frame_id] -= 1
+        if self.refs[frame_id] <= 0:
+            del self.refs[frame_id]
+            self.bytes -= self.frames.pop(frame_id).nbytes
+
+    def forget(self, object_id):
+        for frame_id, _ in self.tracks.pop(object_id, ()):
+            self._unref(frame_id)
+
+    def clear(self):
+        self.frames.clear()
+        self.refs.clear()
+        self.tracks.clear()
+        self.last_sample = None
+        self.bytes = 0
+
+    def select(self, object_id):
+        # Best sample of the track: (frame, crop, info), or None without
+        # samples. Score = sharpness (variance of the Laplacian of the box)
+        # x box area, both relative to the track's best, halved for boxes cut
+        # off by the frame edge. The frame is the history's own copy; the
+        # crop is a separate copy.
+        samples = self.tracks.get(object_id)
+        if not samples:
+            return None
+        self.selections += 1
+
+        scored = []
+        for frame_id, rect in samples:
+            frame = self.frames[frame_id]
+            x1, y1, x2, y2 = clip_rect(rect, frame.shape)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            gray = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+            sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+            area = (x2 - x1) * (y2 - y1)
+            h, w = frame.shape[:2]
+            cut_off = x1 <= 1 or y1 <= 1 or x2 >= w - 1 or y2 >= h - 1
+            scored.append((frame_id, (x1, y1, x2, y2), sharpness, area, cut_off))
+        self.scored += len(scored)
+        if not scored:
+            return None
+
+        max_sharpness = max(s[2] for s in scored) or 1.0
+        max_area = max(s[3] for s in scored)
+        best, best_score = None, -1.0
+        for candidate in scored:
+            _, _, sharpness, area, cut_off = candidate
+            score = sharpness / max_sharpness * area / max_area * (0.5 if cut_off else 1.0)
+            if score > best_score:
+                best, best_score = candidate, score
+
+        frame_id, rect, sharpness, _, _ = best
+        frame = self.frames[frame_id]
+        crop = frame[crop_slices(rect, frame.shape, self.crop_margin)].copy()
+        info = {
+            "rect": list(rect),
+            "sharpness": round(sharpness, 1),
+            "score": round(best_score, 3),
+            "candidates": len(scored),
+        }
+        return frame, crop, info
+
+    def stats(self):
+        return {
+            "frames": len(self.frames),
+            "bytes": self.bytes,
+            "peak_bytes": self.peak_bytes,
+            "max_bytes": self.max_bytes,
+            "tracks": len(self.tracks),
+            "samples": self.samples,
+            "evicted": self.evicted,
+            "selections": self.selections,
+            "scored": self.scored,
+        }
+
+
+def clip_rect(rect, shape):
+    h, w = shape[:2]
+    x1, y1, x2, y2 = rect
+    return max(x1, 0), max(y1, 0), min(x2, w), min(y2, h)
+
+
+def crop_slices(rect, shape, margin):
+    # The box grown by `margin` of its size on every side, within the frame
+    x1, y1, x2, y2 = rect
+    mx = int((x2 - x1) * margin)
+    my = int((y2 - y1) * margin)
+    x1, y1, x2, y2 = clip_rect((x1 - mx, y1 - my, x2 + mx, y2 + my), shape)
+    return np.s_[y1:y2, x1:x2]
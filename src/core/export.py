@@ -0,0 +1,141 @@
+import csv
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# SQLite declared type -> Arrow type name
+PARQUET_TYPES = {
+    "INTEGER": "int64",
+    "REAL": "float64",
+    "TEXT": "string",
+}
+
+
+class _ChunkBuffer:
+    # Write-only sink that hands out what was written since the last drain.
+    # Deliberately not seekable, so zipfile streams entries with data
+    # descriptors and pyarrow writes row groups sequentially.
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parse_time(value):
+    # Accepts unix timestamps or ISO 8601 dates/datetimes (local time)
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+def export_csv(columns, batches):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for batch in batches:
+        for row in batch:
+            writer.writerow([row[c] for c in columns])
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    # Header only when there were no rows
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+def export_ndjson(columns, batches):
+    for batch in batches:
+        lines = [json.dumps({c: row[c] for c in columns}) for row in batch]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package.")
+    return pyarrow, pyarrow.parquet
+
+
+def export_events(storage, fmt, start=None, end=None, batch_size=500):
+    # Returns a generator of bytes for the given format. Format and optional
+    # dependencies are checked here, before anything is streamed.
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet":
+        _require_pyarrow()
+
+    column_info = storage.event_columns()
+    columns = [name for name, _ in column_info]
+    batches = storage.iter_event_batches(start, end, batch_size)
+
+    if fmt == "csv":
+        return export_csv(columns, batches)
+    if fmt == "ndjson":
+        return export_ndjson(columns, batches)
+    return export_parquet(columns, batches, dict(column_info))
+
+
+def export_parquet(columns, batches, column_types=None):
+    pa, pq = _require_pyarrow()
+
+    column_types = column_types or {}
+    schema = pa.schema([
+        (c, getattr(pa, PARQUET_TYPES.get(column_types.get(c, "").upper(), "string"))())
+        for c in columns
+    ])
+
+    # One row group per batch, flushed to the client as soon as it is written
+    sink = _ChunkBuffer()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        table = pa.Table.from_pydict({c: [row[c] for row in batch] for c in columns}, schema=schema)
+        writer.write_table(table)
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def export_images_zip(batches, images_dir):
+    sink = _ChunkBuffer()
+    # JPEGs don't compress further, so store them as-is
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as zf:
+        for batch in batches:
+            for row in batch:
+                for image_path in (row.get("image_path"), row.get("crop_path")):
+                    if not image_path:
+                        continue
+                    full_path = os.path.join(images_dir, image_path)
+                    if not os.path.exists(full_path):
+                        continue
+                    zf.write(full_path, arcname=image_path)
+                    yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,230 @@
+import logging
+import time
+from collections import deque
+
+try:
+    import psutil
+except ImportError:  # listed in requirements.txt; without it CPU load is unknown
+    psutil = None
+
+SYSFS_THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+
+class ThermalSource:
+    # Where the governor gets the SoC temperature from. read() returns degrees
+    # Celsius, or None when no sensor is readable.
+    def read(self):
+        return None
+
+
+class SysfsThermal(ThermalSource):
+    # The kernel thermal zone; on a Raspberry Pi zone 0 is the SoC
+    def __init__(self, path=SYSFS_THERMAL_ZONE):
+        self.path = path
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip()) / 1000.0
+        except (OSError, ValueError):
+            return None
+
+
+class PsutilThermal(ThermalSource):
+    # Hottest sensor psutil reports (x86 boards, some ARM boards)
+    def read(self):
+        if psutil is None or not hasattr(psutil, "sensors_temperatures"):
+            return None
+        try:
+            sensors = psutil.sensors_temperatures()
+        except OSError:
+            return None
+        readings = [t.current for entries in sensors.values() for t in entries if t.current]
+        return max(readings) if readings else None
+
+
+class FirstAvailableThermal(ThermalSource):
+    # Tries each source in order and uses the first that gives a reading
+    def __init__(self, sources):
+        self.sources = list(sources)
+
+    def read(self):
+        for source in self.sources:
+            value = source.read()
+            if value is not None:
+                return value
+        return None
+
+
+def default_thermal_source():
+    return FirstAvailableThermal([SysfsThermal(), PsutilThermal()])
+
+
+def _cpu_percent():
+    return psutil.cpu_percent(interval=None) if psutil is not None else None
+
+
+def build_levels(config):
+    # The performance ladder, level 0 = full quality. Each level moves one
+    # setting one notch, cheapest-to-lose first: stream quality, processed
+    # fps, background engine, then detection scale. The bounds come from the
+    # governor config.
+    max_quality = config.get("max_stream_quality", 95)
+    min_quality = config.get("min_stream_quality", 50)
+    max_fps = config.get("max_fps", 30)
+    min_fps = config.get("min_fps", 10)
+    max_scale = config.get("max_detection_scale", 1.0)
+    min_scale = config.get("min_detection_scale", 0.5)
+    engines = config.get("engines", ["mog2", "running_average"])
+
+    state = {"stream_quality": max_quality, "fps": max_fps, "engine": engines[0], "detection_scale": max_scale}
+    levels = [dict(state)]
+
+    def step(key, value):
+        state[key] = value
+        levels.append(dict(state))
+
+    quality = max_quality
+    while quality - 15 >= min_quality:
+        quality -= 15
+        step("stream_quality", quality)
+    if quality > min_quality:
+        step("stream_quality", min_quality)
+
+    fps = max_fps
+    while int(fps * 2 / 3) >= min_fps:
+        fps = int(fps * 2 / 3)
+        step("fps", fps)
+    if fps > min_fps:
+        step("fps", min_fps)
+
+    for engine in engines[1:]:
+        step("engine", engine)
+
+    scale = max_scale
+    while scale - 0.25 >= min_scale:
+        scale = round(scale - 0.25, 2)
+        step("detection_scale", scale)
+    if scale > min_scale:
+        step("detection_scale", min_scale)
+
+    return levels
+
+
+class PerformanceGovernor:
+    # Samples CPU load, temperature and pipeline lag every `interval` seconds
+    # and moves one level down the ladder under pressure, one level back up
+    # after `recover_samples` calm samples in a row (hysteresis, so it doesn't
+    # oscillate around a threshold). `apply(settings)` is called with the new
+    # level's settings on every change, and once at start.
+    #
+    # Pipeline lag is how far frame processing overruns its budget
+    # (1 / processed fps), smoothed over frames; 0 means keeping up.
+    def __init__(self, config, apply, thermal=None, cpu=None, clock=time.monotonic):
+        self.config = config
+        self.apply = apply
+        self.thermal = thermal if thermal is not None else default_thermal_source()
+        self.cpu = cpu if cpu is not None else _cpu_percent
+        self.clock = clock
+        self.logger = logging.getLogger("PerformanceGovernor")
+
+        self.interval = config.get("interval", 5.0)
+        self.temp_high = config.get("temp_high", 75.0)
+        self.temp_low = config.get("temp_low", 65.0)
+        self.cpu_high = config.get("cpu_high", 90.0)
+        self.cpu_low = config.get("cpu_low", 60.0)
+        self.lag_high = config.get("lag_high", 0.02)
+        self.lag_low = config.get("lag_low", 0.002)
+        self.recover_samples = config.get("recover_samples", 3)
+
+        self.levels = build_levels(config)
+        self.level = 0
+        self.calm = 0
+        self.lag = 0.0
+        self.next_sample = None
+        self.readings = {"cpu_percent": None, "temperature_c": None, "lag_seconds": 0.0}
+        self.adjustments = 0
+        self.history = deque(maxlen=20)
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def start(self):
+        self.next_sample = self.clock() + self.interval
+        self.cpu()  # psutil's first cpu_percent() call only sets the baseline
+        self.apply(dict(self.settings))
+
+    def record_frame(self, processing_seconds):
+        budget = 1.0 / self.settings["fps"]
+        self.lag += 0.1 * (max(processing_seconds - budget, 0.0) - self.lag)
+
+    def tick(self):
+        # Call from the processing loop; samples when the interval has passed
+        now = self.clock()
+        if self.next_sample is None:
+            self.next_sample = now + self.interval
+            return None
+        if now < self.next_sample:
+            return None
+        self.next_sample = now + self.interval
+        return self.sample()
+
+    def sample(self):
+        cpu = self.cpu()
+        temp = self.thermal.read()
+        lag = self.lag
+        self.readings = {
+            "cpu_percent": cpu,
+            "temperature_c": round(temp, 1) if temp is not None else None,
+            "lag_seconds": round(lag, 4),
+        }
+
+        reasons = []
+        if temp is not None and temp >= self.temp_high:
+            reasons.append(f"temperature {temp:.1f}C >= {self.temp_high}C")
+        if cpu is not None and cpu >= self.cpu_high:
+            reasons.append(f"cpu {cpu:.0f}% >= {self.cpu_high}%")
+        if lag >= self.lag_high:
+            reasons.append(f"lag {lag * 1000:.1f}ms >= {self.lag_high * 1000:.1f}ms")
+
+        if reasons:
+            self.calm = 0
+            if self.level < len(self.levels) - 1:
+                return self._change(self.level + 1, ", ".join(reasons))
+            return None
+
+        calm = (temp is None or temp <= self.temp_low) and (cpu is None or cpu <= self.cpu_low) and lag <= self.lag_low
+        self.calm = self.calm + 1 if calm else 0
+        if self.calm >= self.recover_samples and self.level > 0:
+            self.calm = 0
+            return self._change(self.level - 1, "load back to normal")
+        return None
+
+    def _change(self, level, reason):
+        before, after = self.settings, self.levels[level]
+        changes = {k: (before[k], after[k]) for k in after if before[k] != after[k]}
+        self.level = level
+        self.adjustments += 1
+        # A new level has a new budget; the old lag no longer says anything
+        self.lag = 0.0
+        summary = ", ".join(f"{k} {old} -> {new}" for k, (old, new) in changes.items())
+        self.logger.warning(f"Performance level {level}/{len(self.levels) - 1} ({reason}): {summary}")
+        self.history.append({
+            "time": time.time(),
+            "level": level,
+            "reason": reason,
+            "changes": {k: list(v) for k, v in changes.items()},
+        })
+        self.apply(dict(after))
+        return changes
+
+    def stats(self):
+        return {
+            "level": self.level,
+            "max_level": len(self.levels) - 1,
+            "settings": dict(self.settings),
+            "readings": dict(self.readings),
+            "adjustments": self.adjustments,
+            "history": list(self.history),
+        }
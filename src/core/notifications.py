@@ -1,5 +1,61 @@
 import requests
 import logging
+import cv2
+
+# Attachment settings per channel, overridable in each channel's config
+# (max_attachment_kb, attachment_max_dim, attachment_quality). Channels share
+# size and quality by default so one encode serves all of them; only the
+# provider upload limits differ.
+CHANNEL_DEFAULTS = {
+    "telegram": {"max_attachment_kb": 10000, "attachment_max_dim": 1920, "attachment_quality": 85},
+    "pushover": {"max_attachment_kb": 2500, "attachment_max_dim": 1920, "attachment_quality": 85},
+}
+
+
+class AttachmentCache:
+    # Notification images for one event, encoded from the in-memory frame.
+    # The first request encodes; channels asking for the same size/quality
+    # share the bytes. Lives only as long as the notify() call, so the frame
+    # is never needed afterwards.
+    def __init__(self, frame):
+        self.frame = frame
+        self.variants = {}  # (max_dim, quality, max_bytes) -> bytes
+        self.encodes = 0
+
+    def get(self, max_dim=1920, quality=85, max_bytes=None):
+        key = (max_dim, quality, max_bytes)
+        if key in self.variants:
+            return self.variants[key]
+
+        # Shrink quality, then size, until the image fits the limit
+        data = self._encode(max_dim, quality)
+        while data is not None and max_bytes and len(data) > max_bytes and max_dim > 320:
+            if quality > 50:
+                quality -= 15
+            else:
+                max_dim = int(max_dim * 0.75)
+            data = self._encode(max_dim, quality)
+
+        self.variants[key] = data
+        return data
+
+    def _encode(self, max_dim, quality):
+        key = (max_dim, quality, None)
+        if key in self.variants:
+            return self.variants[key]
+        frame = self.frame
+        if frame is None:
+            return None
+        h, w = frame.shape[:2]
+        if max_dim and max(h, w) > max_dim:
+            scale = max_dim / float(max(h, w))
+            frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+        ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        self.encodes += 1
+        data = jpeg.tobytes() if ret else None
+        self.variants[key] = data
+        return data
+
 
 class NotificationManager:
     def __init__(self, config):
@@ -9,18 +65,31 @@ class NotificationManager:
     def update_config(self, config):
         self.config = config
 
-    def notify(self, message, image_path=None):
+    def notify(self, message, frame=None):
+        # frame: the event image in memory; encoded here, never read from disk
         if not self.config.get("enabled", False):
             return
 
+        attachments = AttachmentCache(frame) if frame is not None else None
         if self.config.get("telegram", {}).get("enabled"):
-            self.send_telegram(message, image_path)
+            self.send_telegram(message, attachments)
         if self.config.get("pushover", {}).get("enabled"):
-            self.send_pushover(message, image_path)
+            self.send_pushover(message, attachments)
         if self.config.get("webhook", {}).get("enabled"):
-            self.send_webhook(message, image_path)
+            self.send_webhook(message, attachments)
+
+    def _attachment(self, channel, attachments):
+        if attachments is None:
+            return None
+        settings = dict(CHANNEL_DEFAULTS[channel])
+        settings.update({k: v for k, v in self.config.get(channel, {}).items() if k in settings})
+        return attachments.get(
+            max_dim=settings["attachment_max_dim"],
+            quality=settings["attachment_quality"],
+            max_bytes=settings["max_attachment_kb"] * 1024
+        )
 
-    def send_telegram(self, message, image_path=None):
+    def send_telegram(self, message, attachments=None):
         try:
             token = self.config["telegram"]["bot_token"]
             chat_id = self.config["telegram"]["chat_id"]
@@ -31,15 +100,15 @@ class NotificationManager:
             data = {"chat_id": chat_id, "text": message}
             requests.post(url, data=data, timeout=10)
             
-            if image_path:
+            image = self._attachment("telegram", attachments)
+            if image:
                 url_photo = f"https://api.telegram.org/bot{token}/sendPhoto"
-                with open(image_path, "rb") as f:
-                    files = {"photo": f}
-                    requests.post(url_photo, data={"chat_id": chat_id}, files=files, timeout=30)
+                files = {"photo": ("event.jpg", image, "image/jpeg")}
+                requests.post(url_photo, data={"chat_id": chat_id}, files=files, timeout=30)
         except Exception as e:
             self.logger.error(f"Telegram error: {e}")
 
-    def send_pushover(self, message, image_path=None):
+    def send_pushover(self, message, attachments=None):
         try:
             user_key = self.config["pushover"]["user_key"]
             api_token = self.config["pushover"]["api_token"]
@@ -50,14 +119,15 @@ class NotificationManager:
             data = {"token": api_token, "user": user_key, "message": message}
             
             files = None
-            if image_path:
-                files = {"attachment": ("image.jpg", open(image_path, "rb"), "image/jpeg")}
+            image = self._attachment("pushover", attachments)
+            if image:
+                files = {"attachment": ("image.jpg", image, "image/jpeg")}
             
             requests.post(url, data=data, files=files, timeout=30)
         except Exception as e:
             self.logger.error(f"Pushover error: {e}")
 
-    def send_webhook(self, message, image_path=None):
+    def send_webhook(self, message, attachments=None):
         try:
             url = self.config["webhook"]["url"]
             method = self.config["webhook"].get("method", "POST")
@@ -65,7 +135,7 @@ class NotificationManager:
                 return
             
             # Simple webhook payload
-            data = {"message": message, "has_image": bool(image_path)}
+            data = {"message": message, "has_image": attachments is not None}
             # Typically webhooks might not support direct file upload easily unless specified
             # For now just send metadata
             
@@ -0,0 +1,437 @@
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from .speed_detector import SpeedDetector
+
+# Wire format, both directions: a fixed header with the lengths of a JSON
+# header and a binary payload, followed by both.
+#
+#   camera -> worker:  {"type": "hello", "config": {...detection...}}
+#                      {"type": "config", "config": {...}}
+#                      {"type": "frame", "seq": n, "timestamp": t} + JPEG
+#   worker -> camera:  {"type": "result", "seq": n, "events": [...], "detect_ms": ms}
+#
+# Every frame gets exactly one result, which is what the camera side uses
+# for back-pressure: at most `max_in_flight` frames are unanswered at a time.
+PREFIX = struct.Struct("!II")
+MAX_HEADER = 1 << 20
+MAX_PAYLOAD = 64 << 20
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def parse_address(address):
+    # "tcp://host:port", "host:port" or "unix:///path/to.sock"
+    # -> (socket family, address for connect/bind)
+    if address.startswith("unix://"):
+        return socket.AF_UNIX, address[len("unix://"):]
+    if address.startswith("tcp://"):
+        address = address[len("tcp://"):]
+    host, sep, port = address.rpartition(":")
+    if not sep or not port.isdigit():
+        raise ValueError(f"Invalid address {address!r}, expected tcp://host:port or unix:///path")
+    return socket.AF_INET, (host or "0.0.0.0", int(port))
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def send_message(sock, header, payload=b""):
+    data = json.dumps(header, default=_json_default).encode()
+    sock.sendall(PREFIX.pack(len(data), len(payload)) + data + payload)
+
+
+def _recv_exact(sock, size, running=None):
+    # Socket timeouts only mean "nothing yet": keep what was read and retry
+    # until `running` says stop
+    chunks = []
+    remaining = size
+    while remaining:
+        try:
+            chunk = sock.recv(min(remaining, 1 << 20))
+        except socket.timeout:
+            if running is not None and not running():
+                raise ConnectionError("Stopped")
+            continue
+        if not chunk:
+            raise ConnectionError("Connection closed by peer")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock, running=None):
+    header_len, payload_len = PREFIX.unpack(_recv_exact(sock, PREFIX.size, running))
+    if header_len > MAX_HEADER or payload_len > MAX_PAYLOAD:
+        raise ProtocolError(f"Message too large ({header_len} + {payload_len} bytes)")
+    header = json.loads(_recv_exact(sock, header_len, running))
+    payload = _recv_exact(sock, payload_len, running) if payload_len else b""
+    return header, payload
+
+
+class OffloadClient:
+    # Camera side. submit() JPEG-encodes a captured frame and sends it to the
+    # worker without waiting for the answer; results come back on a reader
+    # thread and are collected with poll().
+    #
+    # Back-pressure: when `max_in_flight` frames are unanswered, submit()
+    # drops the frame instead of queueing it, so a slow worker lowers the
+    # analysed frame rate rather than adding latency. Capture timestamps
+    # travel with the frames, so speeds stay correct at any rate.
+    #
+    # The connection is (re)established in the background with exponential
+    # backoff; while disconnected every frame is dropped. A worker that stops
+    # answering for `reply_timeout` seconds is treated as disconnected.
+    def __init__(self, address, detection_config=None, max_in_flight=4, jpeg_quality=85,
+                 reply_timeout=5.0, retry_min=0.5, retry_max=10.0):
+        self.address = address
+        self.family, self.sockaddr = parse_address(address)
+        self.detection_config = detection_config or {}
+        self.max_in_flight = max(int(max_in_flight), 1)
+        self.jpeg_quality = jpeg_quality
+        self.reply_timeout = reply_timeout
+        self.retry_min = retry_min
+        self.retry_max = retry_max
+        self.logger = logging.getLogger("OffloadClient")
+
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.sock = None
+        self.connected = threading.Event()
+        self.running = False
+        self.thread = None
+        self.seq = 0
+        self.in_flight = OrderedDict()  # seq -> (sent_at, buffer or None)
+        self.results = []  # [(events, buffer or None)]
+
+        # Counters
+        self.sent = 0
+        self.dropped = 0  # not sent: window full or disconnected
+        self.lost = 0  # sent, but the connection went away before the result
+        self.completed = 0
+        self.connects = 0
+        self.bytes_sent = 0
+        self.latencies = []  # seconds, last 100 round trips
+        self.detect_ms = []  # worker detection time, last 100
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name="offload-client")
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._disconnect()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+
+    def wait_connected(self, timeout=None):
+        return self.connected.wait(timeout)
+
+    def update_config(self, detection_config):
+        self.detection_config = detection_config
+        if self.connected.is_set():
+            try:
+                with self.send_lock:
+                    send_message(self.sock, {"type": "config", "config": detection_config})
+            except (OSError, AttributeError) as e:
+                self.logger.warning(f"Failed to send config to worker: {e}")
+
+    def submit(self, frame, timestamp, buffer=None):
+        # Returns True if the frame was sent. `buffer` (a pooled FrameBuffer
+        # holding `frame`) is retained until the result is back, so events
+        # can reference the original full-quality frame.
+        if not self.connected.is_set():
+            self.dropped += 1
+            return False
+
+        stalled = False
+        with self.lock:
+            if len(self.in_flight) >= self.max_in_flight:
+                oldest = next(iter(self.in_flight.values()))[0]
+                stalled = time.monotonic() - oldest > self.reply_timeout
+                if not stalled:
+                    self.dropped += 1
+                    return False
+        if stalled:
+            self.logger.warning(f"No reply from worker for {self.reply_timeout}s, reconnecting")
+            self._disconnect()
+            self.dropped += 1
+            return False
+
+        ok, jpeg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+        if not ok:
+            self.dropped += 1
+            return False
+
+        with self.lock:
+            self.seq += 1
+            seq = self.seq
+            self.in_flight[seq] = (time.monotonic(), buffer.retain() if buffer is not None else None)
+        try:
+            with self.send_lock:
+                send_message(self.sock, {"type": "frame", "seq": seq, "timestamp": timestamp}, jpeg.tobytes())
+        except (OSError, AttributeError) as e:
+            self.logger.warning(f"Send to worker failed: {e}")
+            self._disconnect()
+            return False
+
+        self.sent += 1
+        self.bytes_sent += len(jpeg)
+        return True
+
+    def poll(self):
+        # [(events, buffer)] for results that carry events, oldest first. The
+        # caller releases each buffer after handling its events.
+        with self.lock:
+            results, self.results = self.results, []
+        return results
+
+    def _run(self):
+        delay = self.retry_min
+        while self.running:
+            try:
+                sock = socket.socket(self.family, socket.SOCK_STREAM)
+                sock.settimeout(2.0)
+                sock.connect(self.sockaddr)
+                if self.family == socket.AF_INET:
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                send_message(sock, {"type": "hello", "config": self.detection_config})
+            except OSError as e:
+                self.logger.debug(f"Connect to {self.address} failed: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+                continue
+
+            delay = self.retry_min
+            self.sock = sock
+            self.connects += 1
+            self.connected.set()
+            self.logger.info(f"Connected to detection worker at {self.address}")
+            try:
+                self._read_results(sock)
+            except (OSError, ConnectionError, ProtocolError, ValueError) as e:
+                if self.running:
+                    self.logger.warning(f"Detection worker connection lost: {e}")
+            finally:
+                self._disconnect(sock)
+
+    def _read_results(self, sock):
+        while self.running:
+            header, _ = recv_message(sock, lambda: self.running and self.sock is sock)
+            if header.get("type") != "result":
+                continue
+            with self.lock:
+                entry = self.in_flight.pop(header["seq"], None)
+                if entry is None:
+                    continue
+                sent_at, buffer = entry
+                self.completed += 1
+                self.latencies = self.latencies[-99:] + [time.monotonic() - sent_at]
+                self.detect_ms = self.detect_ms[-99:] + [header.get("detect_ms", 0.0)]
+                events = header.get("events") or []
+                if events:
+                    self.results.append((events, buffer))
+                    buffer = None
+            if buffer is not None:
+                buffer.release()
+
+    def _disconnect(self, sock=None):
+        # Closes the current socket (only if it is still `sock`, when given)
+        # and gives back the buffers of frames that will never be answered
+        with self.lock:
+            if sock is not None and self.sock is not sock:
+                return
+            current, self.sock = self.sock, None
+            self.connected.clear()
+            pending = [buffer for (_, buffer) in self.in_flight.values() if buffer is not None]
+            self.lost += len(self.in_flight)
+            self.in_flight.clear()
+        if current is not None:
+            try:
+                current.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            current.close()
+        for buffer in pending:
+            buffer.release()
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            detect_ms = list(self.detect_ms)
+            in_flight = len(self.in_flight)
+        return {
+            "address": self.address,
+            "connected": self.connected.is_set(),
+            "connects": self.connects,
+            "sent": self.sent,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "lost": self.lost,
+            "in_flight": in_flight,
+            "bytes_sent": self.bytes_sent,
+            "latency_ms_p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+            "detect_ms_avg": round(sum(detect_ms) / len(detect_ms), 1) if detect_ms else None,
+        }
+
+
+class MessageServer:
+    # Listens on a tcp:// or unix:// address and serves each connection on
+    # its own thread with _serve(conn, peer). Connections have a 1 s timeout
+    # so they notice stop(); pass `lambda: self.running` to recv_message.
+    name = "message-server"
+
+    def __init__(self, address):
+        self.address = address
+        self.family, self.sockaddr = parse_address(address)
+        self.logger = logging.getLogger(type(self).__name__)
+        self.server = None
+        self.running = False
+        self.thread = None
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.family == socket.AF_UNIX and os.path.exists(self.sockaddr):
+            os.unlink(self.sockaddr)  # stale socket from a previous run
+        server = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(self.sockaddr)
+        server.listen()
+        server.settimeout(0.5)
+        self.server = server
+        self.running = True
+        self.thread = threading.Thread(target=self._accept_loop, daemon=True, name=self.name)
+        self.thread.start()
+        self.logger.info(f"Listening on {self.bound_address}")
+
+    @property
+    def bound_address(self):
+        # The actual address (resolves port 0 to the port picked by the OS)
+        if self.family == socket.AF_UNIX:
+            return f"unix://{self.sockaddr}"
+        host, port = self.server.getsockname()[:2]
+        return f"tcp://{host}:{port}"
+
+    def serve_forever(self):
+        self.start()
+        try:
+            while self.running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        # Stop listening before connections notice `running`: a client whose
+        # connection closes must not get a new one from the backlog meanwhile
+        server, self.server = self.server, None
+        if server is not None:
+            try:
+                # close() alone leaves it listening while accept() blocks
+                server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server.close()
+        self.running = False
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2.0)
+        with self.lock:
+            connections = list(self.connections)
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.sockaddr):
+            os.unlink(self.sockaddr)
+
+    def _accept_loop(self):
+        server = self.server
+        while self.running:
+            try:
+                conn, peer = server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            conn.settimeout(1.0)
+            if self.family == socket.AF_INET:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.lock:
+                self.connections.add(conn)
+            threading.Thread(target=self._serve_connection, args=(conn, peer), daemon=True).start()
+
+    def _serve_connection(self, conn, peer):
+        try:
+            self._serve(conn, peer)
+        finally:
+            with self.lock:
+                self.connections.discard(conn)
+            conn.close()
+
+    def _serve(self, conn, peer):
+        raise NotImplementedError
+
+
+class DetectionWorker(MessageServer):
+    # Worker side: accepts camera connections and runs a SpeedDetector per
+    # connection (each camera has its own background model and tracks), with
+    # the detection config the camera sends in its hello.
+    name = "offload-worker"
+
+    def __init__(self, address):
+        super().__init__(address)
+        self.frames = 0
+
+    def _serve(self, conn, peer):
+        self.logger.info(f"Camera connected: {peer or 'local socket'}")
+        detector = None
+        try:
+            while self.running:
+                header, payload = recv_message(conn, lambda: self.running)
+                kind = header.get("type")
+                # Evidence frames never leave the worker, so no best-shot history
+                if kind == "hello":
+                    detector = SpeedDetector(dict(header.get("config") or {}, best_shot=None))
+                elif kind == "config" and detector is not None:
+                    detector.update_config(dict(header.get("config") or {}, best_shot=None))
+                elif kind == "frame":
+                    send_message(conn, self._detect(detector, header, payload))
+        except (OSError, ConnectionError, ProtocolError, ValueError) as e:
+            if self.running:
+                self.logger.info(f"Camera disconnected: {e}")
+
+    def _detect(self, detector, header, payload):
+        result = {"type": "result", "seq": header["seq"], "events": []}
+        if detector is None:
+            return result  # frame before hello: answer so the window keeps moving
+        t0 = time.perf_counter()
+        frame = cv2.imdecode(np.frombuffer(payload, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is not None:
+            _, events = detector.process_frame(frame, header.get("timestamp"))
+            # The camera keeps the original frame; only the measurements go back
+            result["events"] = [{k: v for k, v in e.items() if k != "frame"} for e in events]
+        result["detect_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        self.frames += 1
+        return result
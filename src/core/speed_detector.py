@@ -2,40 +2,106 @@ import cv2
 import time
 import math
 import numpy as np
+from .blobs import BlobExtractor, contour_blobs
+from .buffer_pool import ScratchBuffers
+from .zones import ZoneIndex, zones_from_config
+from .evidence import EvidenceHistory
+
+# Background subtraction engines, most accurate first
+BACKGROUND_ENGINES = ("mog2", "running_average")
+MOG2_HISTORY = 500
+# A seed that differs from the first frame by more than SEED_DIFF_LEVEL grey
+# levels on more than SEED_MAX_CHANGED of the pixels is stale (camera moved,
+# day turned to night) and is dropped in favour of a cold start
+SEED_DIFF_LEVEL = 30
+SEED_MAX_CHANGED = 0.1
+
+
+class RunningAverageSubtractor:
+    # Single running-average background with a fixed difference threshold.
+    # An order of magnitude cheaper than MOG2, but no per-pixel variance:
+    # swaying trees and lighting changes show up as foreground more easily.
+    # Same apply() interface as the OpenCV subtractors; no shadow marking.
+    def __init__(self, learning_rate=0.01, threshold=25):
+        self.learning_rate = learning_rate
+        self.threshold = threshold
+        self.background = None
+        self.background_u8 = None
+
+    def apply(self, image, fgmask=None, learningRate=-1):
+        rate = self.learning_rate if learningRate < 0 else learningRate
+        if self.background is None or self.background.shape != image.shape:
+            self.background = image.astype("float32")
+            self.background_u8 = image.copy()
+        else:
+            cv2.accumulateWeighted(image, self.background, rate)
+            cv2.convertScaleAbs(self.background, dst=self.background_u8)
+        if fgmask is None or fgmask.shape != image.shape:
+            fgmask = np.empty_like(image)
+        cv2.absdiff(image, self.background_u8, dst=fgmask)
+        cv2.threshold(fgmask, self.threshold, 255, cv2.THRESH_BINARY, dst=fgmask)
+        return fgmask
+
+    def getBackgroundImage(self):
+        return self.background_u8
+
+    def set_background(self, background):
+        # Full model state: the float background (or a uint8 image)
+        self.background = background.astype("float32")
+        self.background_u8 = cv2.convertScaleAbs(self.background)
+
+
+def create_background_model(engine="mog2"):
+    if engine == "mog2":
+        return cv2.createBackgroundSubtractorMOG2(history=MOG2_HISTORY, varThreshold=50, detectShadows=True)
+    if engine == "running_average":
+        return RunningAverageSubtractor()
+    raise ValueError(f"Unknown background engine {engine!r}, expected one of {', '.join(BACKGROUND_ENGINES)}")
 
 class CentroidTracker:
     def __init__(self, max_disappeared=50):
         self.next_object_id = 0
         self.objects = {}  # ID -> centroid
+        self.rects = {}  # ID -> last matched (x1, y1, x2, y2)
         self.disappeared = {}  # ID -> frames_disappeared
         self.max_disappeared = max_disappeared
 
-    def register(self, centroid):
+    def register(self, centroid, rect=None):
         self.objects[self.next_object_id] = centroid
+        self.rects[self.next_object_id] = rect
         self.disappeared[self.next_object_id] = 0
         self.next_object_id += 1
 
     def deregister(self, object_id):
         del self.objects[object_id]
         del self.disappeared[object_id]
+        del self.rects[object_id]
+
+    def mark_disappeared(self, frames=1):
+        # Same as `frames` updates without any detections
+        for object_id in list(self.disappeared.keys()):
+            self.disappeared[object_id] += frames
+            if self.disappeared[object_id] > self.max_disappeared:
+                self.deregister(object_id)
+        return self.objects
 
-    def update(self, rects):
+    def update(self, rects, centroids=None):
+        # centroids: optional (N, 2) array matching rects; rect centres otherwise
         if len(rects) == 0:
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister(object_id)
-            return self.objects
-
-        input_centroids = np.zeros((len(rects), 2), dtype="int")
-        for (i, (startX, startY, endX, endY)) in enumerate(rects):
-            cX = int((startX + endX) / 2.0)
-            cY = int((startY + endY) / 2.0)
-            input_centroids[i] = (cX, cY)
+            return self.mark_disappeared(1)
+
+        if centroids is not None:
+            input_centroids = np.asarray(centroids, dtype="int")
+        else:
+            input_centroids = np.zeros((len(rects), 2), dtype="int")
+            for (i, (startX, startY, endX, endY)) in enumerate(rects):
+                cX = int((startX + endX) / 2.0)
+                cY = int((startY + endY) / 2.0)
+                input_centroids[i] = (cX, cY)
 
         if len(self.objects) == 0:
             for i in range(0, len(input_centroids)):
-                self.register(input_centroids[i])
+                self.register(input_centroids[i], rects[i])
         else:
             object_ids = list(self.objects.keys())
             object_centroids = list(self.objects.values())
@@ -55,6 +121,7 @@ class CentroidTracker:
 
                 object_id = object_ids[row]
                 self.objects[object_id] = input_centroids[col]
+                self.rects[object_id] = rects[col]
                 self.disappeared[object_id] = 0
                 used_rows.add(row)
                 used_cols.add(col)
@@ -70,11 +137,24 @@ class CentroidTracker:
                         self.deregister(object_id)
             else:
                 for col in unused_cols:
-                    self.register(input_centroids[col])
+                    self.register(input_centroids[col], rects[col])
 
         return self.objects
 
 
+def create_evidence_history(config):
+    # detection.best_shot config -> EvidenceHistory, or None when disabled
+    config = config or {}
+    if not config.get("enabled", False):
+        return None
+    return EvidenceHistory(
+        max_bytes=int(config.get("max_memory_mb", 64) * 1024 * 1024),
+        per_track=config.get("frames_per_track", 12),
+        interval=config.get("interval", 0.04),
+        crop_margin=config.get("crop_margin", 0.1),
+    )
+
+
 class SpeedDetector:
     def __init__(self, config=None):
         # Config is a dict or object with line settings
@@ -85,11 +165,49 @@ class SpeedDetector:
         self.real_distance = self.config.get("real_distance_meters", 5.0)
         self.min_area = self.config.get("min_area", 5000)
         self.direction = self.config.get("direction", "both")
-        
-        self.fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=50, detectShadows=True)
+        # Measurement zones (one per lane); the top-level line pair is the
+        # single "default" zone when no `zones` list is configured
+        self.zone_cell_size = self.config.get("zone_cell_size", 64)
+        self.zones = zones_from_config(self.config)
+        self.zone_index = ZoneIndex(self.zones, self.zone_cell_size)
+        # "components" (connectedComponentsWithStats + fragment merging) or "contours" (legacy)
+        self.blob_method = self.config.get("blob_method", "components")
+        # Per-stage output arrays reused across frames (dst=...)
+        self.scratch = ScratchBuffers(enabled=self.config.get("reuse_buffers", True))
+        self.merge_distance = self.config.get("merge_distance", 20)
+        self.min_fragment_area = self.config.get("min_fragment_area")
+        self.blobs = BlobExtractor(
+            min_area=self.min_area,
+            merge_distance=self.merge_distance,
+            min_fragment_area=self.min_fragment_area,
+            scratch=self.scratch
+        )
+        # Background subtraction runs on the frame shrunk by detection_scale;
+        # blobs are mapped back, so lines and zones stay in frame pixels
+        self.detection_scale = 1.0
+        self.set_detection_scale(self.config.get("detection_scale", 1.0))
+
+        self.background_engine = self.config.get("background_engine", "mog2")
+        self.fgbg = create_background_model(self.background_engine)
+        # Warm start: a background image (or running-average state) to seed
+        # the model with on the next frame instead of learning from scratch.
+        # Set from a snapshot at startup, or from the old model when the
+        # engine or detection size changes.
+        self.background_seed = None
+        self.model_shape = None  # input size the model has learned
+        self.model_frames = 0  # frames the model has learned from
+        self.warm_frames = 0  # MOG2 frames left at the steady-state learning rate
+        self.warm_starts = 0
+        self.rejected_seeds = 0
         self.tracker = CentroidTracker(max_disappeared=40)
         
-        # Track entry/exit times: {object_id: {"entry": timestamp, "exit": timestamp, "speed": speed, "start_line": 1 or 2}}
+        # Optional TraceWriter: records the blobs of every frame for replay
+        self.trace = None
+
+        # Optional best-shot evidence: frame history for tracks inside a zone
+        self.evidence = create_evidence_history(self.config.get("best_shot"))
+
+        # Track entry/exit times per zone: {(object_id, zone_id): {"entry": timestamp, "exit": timestamp, "speed": speed, "start_line": 1 or 2}}
         self.tracked_data = {} 
         self.previous_centroids = {} # Store previous positions for line crossing logic
 
@@ -99,26 +217,149 @@ class SpeedDetector:
         self.real_distance = config.get("real_distance_meters", self.real_distance)
         self.min_area = config.get("min_area", self.min_area)
         self.direction = config.get("direction", self.direction)
-
-    def process_frame(self, frame):
+        self.zone_cell_size = config.get("zone_cell_size", self.zone_cell_size)
+        self.zones = zones_from_config({
+            "line1": self.line1, "line2": self.line2, "real_distance_meters": self.real_distance,
+            "direction": self.direction, "zones": config.get("zones"),
+        })
+        self.zone_index = ZoneIndex(self.zones, self.zone_cell_size)
+        self.tracked_data = {}
+        if "best_shot" in config:
+            self.evidence = create_evidence_history(config["best_shot"])
+        elif self.evidence is not None:
+            self.evidence.clear()
+        self.blob_method = config.get("blob_method", self.blob_method)
+        self.merge_distance = config.get("merge_distance", self.merge_distance)
+        self.min_fragment_area = config.get("min_fragment_area", self.min_fragment_area)
+        self.blobs.update_config(config)
+        self.set_detection_scale(config.get("detection_scale", self.detection_scale))
+        self.set_background_engine(config.get("background_engine", self.background_engine))
+
+    def set_detection_scale(self, scale):
+        # Blob size limits are in frame pixels; scale them to the detection size
+        self.detection_scale = min(max(float(scale), 0.1), 1.0)
+        s = self.detection_scale
+        self.blobs.min_area = self.min_area * s * s
+        self.blobs.merge_distance = self.merge_distance * s
+        if self.min_fragment_area is not None:
+            self.blobs.min_fragment_area = self.min_fragment_area * s * s
+
+    def set_background_engine(self, engine):
+        # Switching engines starts a fresh model, seeded with the old one's background
+        if engine == self.background_engine:
+            return
+        fgbg = create_background_model(engine)
+        if self.background_seed is None:
+            self.background_seed = self.background_image()
+        self.fgbg = fgbg
+        self.background_engine = engine
+        self.model_shape = None
+        self.model_frames = 0
+        self.warm_frames = 0
+
+    def background_image(self):
+        # What the model currently takes as background (grey, detection size), or None
+        if self.model_frames == 0:
+            return None
+        image = self.fgbg.getBackgroundImage()
+        return image if image is not None and image.size else None
+
+    def background_state(self):
+        # Snapshot for a later warm start: {engine, image[, state]}
+        image = self.background_image()
+        if image is None:
+            return None
+        snapshot = {"engine": self.background_engine, "image": image.copy()}
+        if isinstance(self.fgbg, RunningAverageSubtractor):
+            snapshot["state"] = self.fgbg.background.copy()
+        return snapshot
+
+    def _seed_model(self, gray):
+        # Applies background_seed (image array or background_state() dict)
+        # to the model before it sees `gray`, the first frame at this size
+        seed, self.background_seed = self.background_seed, None
+        if isinstance(seed, dict):
+            state = seed.get("state") if seed.get("engine") == self.background_engine else None
+            seed = state if state is not None else seed["image"]
+        if seed.ndim != 2:
+            return
+        if seed.shape != gray.shape:
+            seed = cv2.resize(seed, (gray.shape[1], gray.shape[0]), interpolation=cv2.INTER_AREA)
+
+        changed = np.count_nonzero(cv2.absdiff(cv2.convertScaleAbs(seed), gray) > SEED_DIFF_LEVEL)
+        if changed > SEED_MAX_CHANGED * gray.size:
+            self.rejected_seeds += 1
+            return
+
+        if isinstance(self.fgbg, RunningAverageSubtractor):
+            self.fgbg.set_background(seed)
+        else:
+            # learningRate=1 replaces the model with this image. MOG2 would
+            # then learn fast, as after a cold start, and absorb the vehicles
+            # in view; keep it at the steady-state rate instead.
+            self.fgbg.apply(cv2.convertScaleAbs(seed), learningRate=1.0)
+            self.warm_frames = MOG2_HISTORY // 2
+        self.model_frames += 1
+        self.warm_starts += 1
+
+    def process_frame(self, frame, timestamp=None):
+        # timestamp: capture time of the frame; defaults to now
         if frame is None:
             return None, []
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        fgmask = self.fgbg.apply(gray)
-        _, fgmask = cv2.threshold(fgmask, 200, 255, cv2.THRESH_BINARY)
-        fgmask = cv2.dilate(fgmask, None, iterations=2)
-
-        contours, _ = cv2.findContours(fgmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        rects = []
-        for c in contours:
-            if cv2.contourArea(c) < self.min_area:
-                continue
-            (x, y, w, h) = cv2.boundingRect(c)
-            rects.append((x, y, x + w, y + h))
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-        objects = self.tracker.update(rects)
+        now = timestamp if timestamp is not None else time.time()
+
+        sc = self.scratch
+        gray = sc.keep("gray", cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY, dst=sc.get("gray")))
+        scale = self.detection_scale
+        if scale < 1.0:
+            size = (max(int(gray.shape[1] * scale), 1), max(int(gray.shape[0] * scale), 1))
+            gray = sc.keep("detect_small", cv2.resize(gray, size, dst=sc.get("detect_small"), interpolation=cv2.INTER_AREA))
+        if gray.shape != self.model_shape:
+            # New model, or a new detection size: start from the old background
+            if self.background_seed is None:
+                self.background_seed = self.background_image()
+            self.model_shape = gray.shape
+            self.model_frames = 0
+            self.warm_frames = 0
+            if self.background_seed is not None:
+                self._seed_model(gray)
+        rate = -1
+        if self.warm_frames:
+            self.warm_frames -= 1
+            rate = 1.0 / MOG2_HISTORY
+        fgmask = sc.keep("fgmask", self.fgbg.apply(gray, fgmask=sc.get("fgmask"), learningRate=rate))
+        self.model_frames += 1
+        fgmask = self.blobs.clean_mask(fgmask)
+
+        if self.blob_method == "contours":
+            rects, centroids = contour_blobs(fgmask, self.blobs.min_area)
+        else:
+            rects, centroids = self.blobs.extract(fgmask)
+        if scale < 1.0 and len(rects):
+            rects = (rects / scale).astype(np.int32)
+            centroids = (centroids / scale).astype(np.int32)
+
+        if self.trace is not None:
+            self.trace.append(now, rects, centroids)
+
+        return frame, self.track(rects, centroids, now, frame)
+
+    def track(self, rects, centroids, now, frame=None):
+        # Tracking, line crossing and speed for one frame's blobs (in frame
+        # pixels). Annotations are drawn into `frame` when given; replaying a
+        # trace passes None.
+        objects = self.tracker.update(rects, centroids)
+        self._forget_dropped_tracks(objects)
+
+        if frame is not None:
+            if self.evidence is not None:
+                # Before drawing: the history keeps clean copies. Only tracks
+                # matched in this frame; a missed track's box is stale.
+                tracker = self.tracker
+                self.evidence.sample(frame, now, {oid: tracker.rects[oid] for oid in self._active_tracks()
+                                                  if tracker.disappeared.get(oid) == 0 and oid in tracker.rects})
+            for (x1, y1, x2, y2) in rects.tolist():
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
         
         new_events = []
 
@@ -127,27 +368,12 @@ class SpeedDetector:
             prev_centroid = self.previous_centroids.get(object_id)
             
             if prev_centroid is not None:
-                crossed_l1 = self.check_line_crossing(prev_centroid, centroid, self.line1)
-                crossed_l2 = self.check_line_crossing(prev_centroid, centroid, self.line2)
-
-                if crossed_l1 and crossed_l2:
-                    # Rare edge case: crossed both lines in 1 frame, ignore
-                    pass
-                elif crossed_l1:
-                    if object_id not in self.tracked_data:
-                        if self.direction in ["both", "approaching"]:
-                            self.tracked_data[object_id] = {"entry": time.time(), "exit": None, "speed": None, "start_line": 1}
-                    elif self.tracked_data[object_id].get("start_line") == 2 and self.tracked_data[object_id]["exit"] is None:
-                        # Entered L2, now crossing L1 -> Exit
-                        self._record_exit(object_id, frame, new_events)
-
-                elif crossed_l2:
-                    if object_id not in self.tracked_data:
-                        if self.direction in ["both", "receding"]:
-                            self.tracked_data[object_id] = {"entry": time.time(), "exit": None, "speed": None, "start_line": 2}
-                    elif self.tracked_data[object_id].get("start_line") == 1 and self.tracked_data[object_id]["exit"] is None:
-                        # Entered L1, now crossing L2 -> Exit
-                        self._record_exit(object_id, frame, new_events)
+                # Only zones under the track (its box and this frame's movement) can be crossed
+                for zone in self.zone_index.query(self._track_box(object_id, prev_centroid, centroid)):
+                    self._check_zone(zone, object_id, prev_centroid, centroid, frame, new_events, now)
+
+            if frame is None:
+                continue
 
             # Draw centroid
             cv2.circle(frame, (centroid[0], centroid[1]), 4, (0, 0, 255), -1)
@@ -155,41 +381,144 @@ class SpeedDetector:
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
 
             # Draw speed if available
-            if object_id in self.tracked_data and self.tracked_data[object_id]["speed"]:
-                 speed = self.tracked_data[object_id]["speed"]
+            speed = self._track_speed(object_id)
+            if speed:
                  cv2.putText(frame, f"{speed:.1f} km/h", (centroid[0], centroid[1] - 30),
                                     cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3)
 
         # Update previous centroids
         self.previous_centroids = objects.copy()
 
+        if frame is None:
+            return new_events
+
         # Draw lines
-        cv2.line(frame, (int(self.line1[0]), int(self.line1[1])), (int(self.line1[2]), int(self.line1[3])), (255, 0, 0), 2)
-        cv2.line(frame, (int(self.line2[0]), int(self.line2[1])), (int(self.line2[2]), int(self.line2[3])), (0, 0, 255), 2)
+        for zone in self.zones:
+            l1, l2 = zone.line1, zone.line2
+            cv2.line(frame, (int(l1[0]), int(l1[1])), (int(l1[2]), int(l1[3])), (255, 0, 0), 2)
+            cv2.line(frame, (int(l2[0]), int(l2[1])), (int(l2[2]), int(l2[3])), (0, 0, 255), 2)
+            if len(self.zones) > 1:
+                cv2.putText(frame, zone.id, (int(l1[0]) + 5, int(l1[1]) - 8),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
         
-        return frame, new_events
+        return new_events
 
-    def _record_exit(self, object_id, frame, new_events):
-        exit_time = time.time()
-        entry_time = self.tracked_data[object_id]["entry"]
+    def skip_empty(self, frames):
+        # `frames` frames without blobs, in one step (nothing moves, so
+        # nothing can cross a line)
+        objects = self.tracker.mark_disappeared(frames)
+        self._forget_dropped_tracks(objects)
+        self.previous_centroids = objects.copy()
+
+    def _forget_dropped_tracks(self, objects):
+        # Forget zone state of tracks the tracker has dropped (ids are never reused)
+        for key in [k for k in self.tracked_data if k[0] not in objects]:
+            del self.tracked_data[key]
+        if self.evidence is not None:
+            for object_id in [oid for oid in self.evidence.tracks if oid not in objects]:
+                self.evidence.forget(object_id)
+
+    def _active_tracks(self):
+        # Tracks that entered a zone and haven't left it yet
+        return {oid for (oid, _), data in self.tracked_data.items() if data["exit"] is None}
+
+    def _track_box(self, object_id, prev_centroid, centroid):
+        # Bounding box of the object and the segment it moved along this frame
+        x1 = min(prev_centroid[0], centroid[0])
+        y1 = min(prev_centroid[1], centroid[1])
+        x2 = max(prev_centroid[0], centroid[0])
+        y2 = max(prev_centroid[1], centroid[1])
+        rect = self.tracker.rects.get(object_id)
+        if rect is not None:
+            x1, y1 = min(x1, rect[0]), min(y1, rect[1])
+            x2, y2 = max(x2, rect[2]), max(y2, rect[3])
+        return (x1, y1, x2, y2)
+
+    def _check_zone(self, zone, object_id, prev_centroid, centroid, frame, new_events, now):
+        crossed_l1 = self.check_line_crossing(prev_centroid, centroid, zone.line1)
+        crossed_l2 = self.check_line_crossing(prev_centroid, centroid, zone.line2)
+        if crossed_l1 == crossed_l2:
+            # Neither, or the rare edge case of both lines in 1 frame: ignore
+            return
+
+        key = (object_id, zone.id)
+        start_line = 1 if crossed_l1 else 2
+        data = self.tracked_data.get(key)
+        if data is None:
+            if zone.accepts(start_line):
+                self.tracked_data[key] = {"entry": now, "exit": None, "speed": None, "start_line": start_line}
+        elif data["start_line"] != start_line and data["exit"] is None:
+            # Entered on one line, now crossing the other -> Exit
+            line = zone.line1 if crossed_l1 else zone.line2
+            self._record_exit(object_id, frame, new_events, centroid, line, now, zone)
+
+    def _track_speed(self, object_id):
+        for (oid, _), data in self.tracked_data.items():
+            if oid == object_id and data["speed"]:
+                return data["speed"]
+        return None
+
+    def _record_exit(self, object_id, frame, new_events, centroid=None, line=None, timestamp=None, zone=None):
+        zone = zone if zone is not None else self.zones[0]
+        key = (object_id, zone.id)
+        exit_time = timestamp if timestamp is not None else time.time()
+        entry_time = self.tracked_data[key]["entry"]
         time_diff = exit_time - entry_time
 
         if time_diff > 0.1: # Min time threshold
-            speed_mps = self.real_distance / time_diff
+            speed_mps = zone.real_distance / time_diff
             speed_kmh = speed_mps * 3.6
 
-            self.tracked_data[object_id]["exit"] = exit_time
-            self.tracked_data[object_id]["speed"] = speed_kmh
+            self.tracked_data[key]["exit"] = exit_time
+            self.tracked_data[key]["speed"] = speed_kmh
 
+            start_line = self.tracked_data[key]["start_line"]
+            evidence = None
+            if frame is not None and self.evidence is not None:
+                evidence = self._best_shot(object_id, speed_kmh)
+                if object_id not in self._active_tracks():
+                    self.evidence.forget(object_id)
             event = {
                 "speed": round(speed_kmh, 2),
                 "time_diff": time_diff,
+                "distance_m": zone.real_distance,
                 "timestamp": exit_time,
                 "object_id": object_id,
-                "frame": frame.copy() # Save the frame of the event
+                "zone_id": zone.id,
+                "direction": "approaching" if start_line == 1 else "receding",
+                "position": self.line_position(centroid, line) if centroid is not None else None,
+                # No copy: the caller owns the frame and keeps it alive until
+                # the event is handled (the service holds the pooled buffer)
+                "frame": frame
             }
+            if evidence is not None:
+                event["frame"], event["crop"], event["evidence"] = evidence
             new_events.append(event)
 
+    def _best_shot(self, object_id, speed_kmh):
+        # (frame, crop, info) for the track's best sample, with the box and
+        # speed drawn on a copy of the frame; None without samples
+        best = self.evidence.select(object_id)
+        if best is None:
+            return None
+        frame, crop, info = best
+        frame = frame.copy()  # the history's copy may be shared with other tracks
+        x1, y1, x2, y2 = info["rect"]
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(frame, f"{speed_kmh:.1f} km/h", (x1, max(y1 - 10, 20)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3)
+        return frame, crop, info
+
+    def line_position(self, point, line):
+        # Where the point projects onto the line: 0.0 at (x1, y1), 1.0 at (x2, y2)
+        dx = line[2] - line[0]
+        dy = line[3] - line[1]
+        length_sq = dx * dx + dy * dy
+        if length_sq == 0:
+            return 0.0
+        t = ((point[0] - line[0]) * dx + (point[1] - line[1]) * dy) / length_sq
+        return round(min(max(float(t), 0.0), 1.0), 3)
+
     def check_line_crossing(self, p1, p2, line):
         # line: [x1, y1, x2, y2]
         # p1: (x, y) previous
@@ -1,3 +1,4 @@
+import json
 import sqlite3
 import os
 import shutil
@@ -21,45 +22,228 @@ class StorageManager:
 
     def init_db(self):
         conn = sqlite3.connect(self.db_path)
+        # WAL: API processes read while the capture daemon writes (stored in the file)
+        conn.execute("PRAGMA journal_mode=WAL")
         c = conn.cursor()
         c.execute('''CREATE TABLE IF NOT EXISTS events
                      (id INTEGER PRIMARY KEY AUTOINCREMENT, 
                       timestamp REAL, 
                       speed REAL, 
                       image_path TEXT, 
-                      object_id INTEGER)''')
+                      object_id INTEGER,
+                      zone_id TEXT,
+                      time_diff REAL,
+                      distance_m REAL,
+                      calibration_version INTEGER,
+                      crop_path TEXT)''')
+        # Databases from older versions: zones, the raw timing, crops. Their
+        # events keep NULL time_diff and can't be recomputed.
+        columns = [row[1] for row in c.execute("PRAGMA table_info(events)")]
+        for name, decl in (("zone_id", "TEXT"), ("time_diff", "REAL"), ("distance_m", "REAL"),
+                           ("calibration_version", "INTEGER"), ("crop_path", "TEXT")):
+            if name not in columns:
+                c.execute(f"ALTER TABLE events ADD COLUMN {name} {decl}")
+        # Every distinct set of measurement settings gets a version number;
+        # events record the version they were measured (or recomputed) with
+        c.execute('''CREATE TABLE IF NOT EXISTS calibrations
+                     (version INTEGER PRIMARY KEY AUTOINCREMENT,
+                      created REAL,
+                      settings TEXT UNIQUE)''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_events_zone ON events (zone_id, timestamp)")
         conn.commit()
         conn.close()
 
+    def image_relpath(self, event_id, timestamp, speed):
+        # YYYY/MM/DD/<id>_HH-MM-SS_<speed>kmh.jpg - the event id makes it unique,
+        # the date directories keep each directory small
+        dt = datetime.fromtimestamp(timestamp)
+        return f"{dt.strftime('%Y/%m/%d')}/{event_id}_{dt.strftime('%H-%M-%S')}_{int(speed)}kmh.jpg"
+
     def save_event(self, event):
-        # event: {speed, timestamp, object_id, frame}
+        # event: {speed, timestamp, object_id, frame, and optionally zone_id,
+        # time_diff, distance_m, calibration_version, crop (the vehicle only)}
         ts = event["timestamp"]
-        dt = datetime.fromtimestamp(ts)
-        filename = f"{dt.strftime('%Y-%m-%d_%H-%M-%S')}_{int(event['speed'])}kmh.jpg"
-        filepath = os.path.join(self.images_dir, filename)
-        
-        # Save image with maximum JPEG quality to reduce compression artifacts
-        cv2.imwrite(filepath, event["frame"], [int(cv2.IMWRITE_JPEG_QUALITY), 100])
-        
+
+        # The row is inserted first to get the id the filename is built from;
+        # it only becomes visible once the image is on disk
         conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
-        c.execute("INSERT INTO events (timestamp, speed, image_path, object_id) VALUES (?, ?, ?, ?)",
-                  (ts, event["speed"], filename, event["object_id"]))
-        conn.commit()
-        conn.close()
-        
-        self.check_disk_usage()
+        written = []
+        try:
+            c = conn.cursor()
+            c.execute("INSERT INTO events (timestamp, speed, image_path, object_id, zone_id, time_diff, distance_m, "
+                      "calibration_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                      (ts, event["speed"], None, event["object_id"], event.get("zone_id"), event.get("time_diff"),
+                       event.get("distance_m"), event.get("calibration_version")))
+            event_id = c.lastrowid
+            relpath = self.image_relpath(event_id, ts, event["speed"])
+            filepath = os.path.join(self.images_dir, relpath)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+            # Save image with maximum JPEG quality to reduce compression artifacts
+            if not cv2.imwrite(filepath, event["frame"], [int(cv2.IMWRITE_JPEG_QUALITY), 100]):
+                raise IOError(f"Failed to write image {filepath}")
+            written.append(filepath)
+
+            # The crop is a convenience: without it the event is still complete
+            crop_relpath = None
+            if event.get("crop") is not None:
+                crop_relpath = relpath[:-len(".jpg")] + "_crop.jpg"
+                crop_path = os.path.join(self.images_dir, crop_relpath)
+                if cv2.imwrite(crop_path, event["crop"], [int(cv2.IMWRITE_JPEG_QUALITY), 100]):
+                    written.append(crop_path)
+                else:
+                    self.logger.warning(f"Failed to write crop {crop_relpath}")
+                    crop_relpath = None
+
+            c.execute("UPDATE events SET image_path=?, crop_path=? WHERE id=?", (relpath, crop_relpath, event_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # No row refers to them now
+            for path in written:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise
+        finally:
+            conn.close()
+            # Also after a failed write: a full disk is the usual cause
+            self.check_disk_usage()
         return filepath
 
-    def get_events(self, limit=50, offset=0):
+    def get_events(self, limit=50, offset=0, zone_id=None):
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
         c = conn.cursor()
-        c.execute("SELECT * FROM events ORDER BY timestamp DESC LIMIT ? OFFSET ?", (limit, offset))
+        if zone_id is not None:
+            c.execute("SELECT * FROM events WHERE zone_id=? ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+                      (zone_id, limit, offset))
+        else:
+            c.execute("SELECT * FROM events ORDER BY timestamp DESC LIMIT ? OFFSET ?", (limit, offset))
         rows = c.fetchall()
         conn.close()
         return [dict(row) for row in rows]
 
+    def zone_stats(self, start=None, end=None):
+        # Per zone: number of events, average and maximum speed.
+        # Events stored before zones existed have zone_id NULL.
+        query = "SELECT zone_id, COUNT(*) AS count, AVG(speed) AS avg_speed, MAX(speed) AS max_speed FROM events"
+        clauses, params = self._range_clauses(start, end)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " GROUP BY zone_id ORDER BY zone_id"
+
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(query, params).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def _range_clauses(self, start, end):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        return clauses, params
+
+    def register_calibration(self, settings):
+        # Version number for a set of measurement settings (a JSON-able dict,
+        # e.g. the zones); the same settings always get the same version
+        key = json.dumps(settings, sort_keys=True)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("INSERT OR IGNORE INTO calibrations (created, settings) VALUES (?, ?)", (time.time(), key))
+            conn.commit()
+            return conn.execute("SELECT version FROM calibrations WHERE settings=?", (key,)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def get_calibrations(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT version, created, settings FROM calibrations ORDER BY version").fetchall()
+        conn.close()
+        return [dict(row, settings=json.loads(row["settings"])) for row in rows]
+
+    def recompute_speeds(self, distance, version=None, start=None, end=None, zone_id=None, from_version=None):
+        # Recomputes speed = distance / time_diff for the selected events in
+        # a single UPDATE, from the stored timing; images are left alone.
+        # `distance` is meters for every selected event, or {zone_id: meters}
+        # (events in other zones are not selected). `version` is recorded as
+        # the events' calibration_version. Returns {updated, skipped}; events
+        # without timing (stored by older versions) are skipped.
+        clauses, params = self._range_clauses(start, end)
+        if zone_id is not None:
+            clauses.append("zone_id = ?")
+            params.append(zone_id)
+        if from_version is not None:
+            clauses.append("calibration_version = ?")
+            params.append(from_version)
+
+        if isinstance(distance, dict):
+            if not distance:
+                return {"updated": 0, "skipped": 0}
+            expr = "CASE zone_id" + " WHEN ? THEN ?" * len(distance) + " END"
+            expr_params = [value for item in distance.items() for value in item]
+            clauses.append(f"zone_id IN ({', '.join('?' * len(distance))})")
+            params.extend(distance)
+        else:
+            expr, expr_params = "?", [distance]
+        where = " AND ".join(clauses) if clauses else "1"
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            updated = conn.execute(
+                f"UPDATE events SET distance_m = {expr}, speed = ROUND({expr} / time_diff * 3.6, 2), "
+                f"calibration_version = COALESCE(?, calibration_version) WHERE time_diff > 0 AND {where}",
+                expr_params + expr_params + [version] + params
+            ).rowcount
+            skipped = conn.execute(
+                f"SELECT COUNT(*) FROM events WHERE (time_diff IS NULL OR time_diff <= 0) AND {where}", params
+            ).fetchone()[0]
+            conn.commit()
+        finally:
+            conn.close()
+
+        self.logger.info(f"Recomputed {updated} event speeds ({skipped} without timing skipped).")
+        return {"updated": updated, "skipped": skipped}
+
+    def event_columns(self):
+        # [(name, declared type)] in table order
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("PRAGMA table_info(events)").fetchall()
+        conn.close()
+        return [(row[1], row[2]) for row in rows]
+
+    def iter_event_batches(self, start=None, end=None, batch_size=500):
+        # Streams events oldest-first from a single cursor, one batch at a time,
+        # so memory use doesn't depend on the size of the range.
+        # check_same_thread is off because streaming responses may resume the
+        # generator on a different worker thread.
+        query = "SELECT * FROM events"
+        clauses, params = self._range_clauses(start, end)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY timestamp ASC"
+
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        try:
+            c = conn.cursor()
+            c.execute(query, params)
+            while True:
+                rows = c.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+        finally:
+            conn.close()
+
     def check_disk_usage(self):
         try:
             total, used, free = shutil.disk_usage(self.data_dir)
@@ -77,19 +261,77 @@ class StorageManager:
         c = conn.cursor()
         
         # Get oldest events
-        c.execute("SELECT id, image_path FROM events ORDER BY timestamp ASC LIMIT 50")
+        c.execute("SELECT id, image_path, crop_path FROM events ORDER BY timestamp ASC LIMIT 50")
         rows = c.fetchall()
         
         for row in rows:
-            try:
-                full_path = os.path.join(self.images_dir, row["image_path"])
-                if os.path.exists(full_path):
-                    os.remove(full_path)
-            except OSError as e:
-                self.logger.error(f"Error deleting file {row['image_path']}: {e}")
-                pass
-            c.execute("DELETE FROM events WHERE id=?", (row["id"],))
+            for relpath in (row["crop_path"], row["image_path"]):
+                if not relpath:
+                    continue
+                try:
+                    full_path = os.path.join(self.images_dir, relpath)
+                    if os.path.exists(full_path):
+                        os.remove(full_path)
+                    self._prune_empty_dirs(relpath)
+                except OSError as e:
+                    self.logger.error(f"Error deleting file {relpath}: {e}")
+        c.executemany("DELETE FROM events WHERE id=?", [(row["id"],) for row in rows])
             
         conn.commit()
         conn.close()
         self.logger.info(f"Deleted {len(rows)} old events.")
+
+    def _prune_empty_dirs(self, relpath):
+        # Remove the day/month/year directories of relpath once empty,
+        # never images_dir itself
+        parent = os.path.dirname(relpath)
+        while parent:
+            full = os.path.join(self.images_dir, parent)
+            try:
+                os.rmdir(full)
+            except OSError:
+                return  # not empty (or already gone)
+            parent = os.path.dirname(parent)
+
+    def migrate_flat_images(self, batch_size=500):
+        # Moves images saved by older versions (flat files in images_dir)
+        # into the date directories and rewrites image_path, one transaction
+        # per batch. Safe to interrupt and re-run: rows are only rewritten
+        # after their file is in place, and a file already moved is detected.
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        migrated, missing = 0, 0
+        last_id = -1
+        try:
+            while True:
+                rows = conn.execute(
+                    "SELECT id, timestamp, speed, image_path FROM events "
+                    "WHERE id > ? AND image_path IS NOT NULL AND image_path NOT LIKE '%/%' "
+                    "ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+
+                updates = []
+                for row in rows:
+                    old = os.path.join(self.images_dir, row["image_path"])
+                    relpath = self.image_relpath(row["id"], row["timestamp"], row["speed"])
+                    new = os.path.join(self.images_dir, relpath)
+                    if os.path.exists(old):
+                        os.makedirs(os.path.dirname(new), exist_ok=True)
+                        os.replace(old, new)
+                    elif not os.path.exists(new):
+                        missing += 1
+                        continue
+                    updates.append((relpath, row["id"]))
+
+                conn.executemany("UPDATE events SET image_path=? WHERE id=?", updates)
+                conn.commit()
+                migrated += len(updates)
+                self.logger.info(f"Migrated {migrated} images...")
+        finally:
+            conn.close()
+
+        self.logger.info(f"Image migration done: {migrated} moved, {missing} missing on disk.")
+        return {"migrated": migrated, "missing": missing}
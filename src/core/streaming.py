@@ -0,0 +1,281 @@
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+import cv2
+
+# Requested widths/qualities are snapped to these so that clients asking for
+# similar settings share one encoded frame instead of each getting their own.
+TIER_WIDTHS = [320, 480, 640, 800, 960, 1280, 1920]
+TIER_QUALITIES = [30, 40, 50, 60, 70, 80, 90, 95]
+DEFAULT_QUALITY = 95  # cv2.imencode default
+RATE_WINDOW = 5.0  # seconds, for bandwidth/CPU rates in metrics
+
+
+def snap_tier(width=None, quality=None, source_width=None):
+    if width is not None:
+        width = min(TIER_WIDTHS, key=lambda w: abs(w - width))
+        # Never upscale; full resolution is the "None" tier
+        if source_width is not None and width >= source_width:
+            width = None
+    if quality is None:
+        quality = DEFAULT_QUALITY
+    else:
+        quality = min(TIER_QUALITIES, key=lambda q: abs(q - quality))
+    return width, quality
+
+
+class StreamTier:
+    def __init__(self, width, quality):
+        self.width = width
+        self.quality = quality
+        self.lock = threading.Lock()
+        self.seq = -1
+        self.jpeg = None
+
+        # Metrics
+        self.clients = 0
+        self.frames_encoded = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+        self.encode_cpu_seconds = 0.0
+        self._recent = deque()  # (time, bytes_sent, encode_cpu)
+        self._stats_lock = threading.Lock()
+
+    def encode(self, frame, seq):
+        # Encodes at most once per source frame, whoever asks first does the work
+        with self.lock:
+            if self.seq == seq:
+                return self.jpeg
+
+            cpu0 = time.thread_time()
+            if self.width is not None and frame.shape[1] > self.width:
+                height = int(round(frame.shape[0] * self.width / frame.shape[1]))
+                frame = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+            ret, jpeg = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), self.quality])
+            cpu = time.thread_time() - cpu0
+
+            self.seq = seq
+            self.jpeg = jpeg.tobytes() if ret else None
+            self.frames_encoded += 1
+            self.encode_cpu_seconds += cpu
+            self._record(0, cpu)
+            return self.jpeg
+
+    def add_client(self, delta):
+        with self._stats_lock:
+            self.clients += delta
+
+    def record_sent(self, nbytes):
+        with self._stats_lock:
+            self.frames_sent += 1
+            self.bytes_sent += nbytes
+        self._record(nbytes, 0.0)
+
+    def _record(self, nbytes, cpu):
+        now = time.monotonic()
+        with self._stats_lock:
+            self._recent.append((now, nbytes, cpu))
+            while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+                self._recent.popleft()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._stats_lock:
+            recent = [r for r in self._recent if r[0] >= now - RATE_WINDOW]
+            return {
+                "width": self.width,
+                "quality": self.quality,
+                "clients": self.clients,
+                "frames_encoded": self.frames_encoded,
+                "frames_sent": self.frames_sent,
+                "bytes_sent": self.bytes_sent,
+                "encode_cpu_seconds": round(self.encode_cpu_seconds, 3),
+                "bandwidth_bps": int(sum(r[1] for r in recent) * 8 / RATE_WINDOW),
+                "encode_cpu_percent": round(sum(r[2] for r in recent) / RATE_WINDOW * 100, 1),
+            }
+
+
+class FrameBroadcaster:
+    # Holds the latest processed frame with a sequence number and hands out
+    # JPEG encodings of it per tier (width, quality).
+    #
+    # Published frames may be pooled FrameBuffers: the broadcaster keeps a
+    # reference until the next frame replaces it, and readers take their own
+    # reference while they encode, so the pool can't recycle it under them.
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.frame = None
+        self.buffer = None
+        self.seq = 0
+        self.timestamp = None
+        # Sequence numbers restart with the process; the epoch keeps ETags unique
+        self.epoch = int(time.time())
+        self.tiers = {}
+        self.tiers_lock = threading.Lock()
+        # Upper bound on JPEG quality for every client (set by the governor);
+        # streams move to the capped tier on their next frame
+        self.max_quality = None
+        self.logger = logging.getLogger("FrameBroadcaster")
+
+    def publish(self, frame, buffer=None):
+        # frame: ndarray, or the read-only view of `buffer` (a FrameBuffer)
+        if buffer is not None:
+            buffer.retain()
+        with self.cond:
+            previous = self.buffer
+            self.frame = frame
+            self.buffer = buffer
+            self.seq += 1
+            self.timestamp = time.time()
+            self.cond.notify_all()
+        if previous is not None:
+            previous.release()
+
+    def latest(self):
+        with self.cond:
+            return self.frame, self.seq
+
+    @contextmanager
+    def borrow(self):
+        # Yields (frame, seq, timestamp) with the frame guaranteed not to be
+        # recycled until the block exits. frame is None before the first publish.
+        with self.cond:
+            frame, seq, timestamp, buffer = self.frame, self.seq, self.timestamp, self.buffer
+            if buffer is not None:
+                buffer.retain()
+        try:
+            yield frame, seq, timestamp
+        finally:
+            if buffer is not None:
+                buffer.release()
+
+    def clear(self):
+        with self.cond:
+            previous = self.buffer
+            self.frame = None
+            self.buffer = None
+        if previous is not None:
+            previous.release()
+
+    def wait_for_frame(self, after_seq, timeout=1.0, tier=None):
+        # Returns the newest sequence number, or None if nothing newer arrived.
+        # `tier` is for broadcasters that receive each tier separately
+        # (RemoteBroadcaster); here every tier encodes the same frame.
+        with self.cond:
+            if self.seq <= after_seq:
+                self.cond.wait(timeout)
+            if self.seq <= after_seq:
+                return None
+            return self.seq
+
+    def get_tier(self, width=None, quality=None):
+        frame, _ = self.latest()
+        source_width = frame.shape[1] if frame is not None else None
+        if self.max_quality is not None:
+            quality = min(quality if quality is not None else DEFAULT_QUALITY, self.max_quality)
+        key = snap_tier(width, quality, source_width)
+        with self.tiers_lock:
+            tier = self.tiers.get(key)
+            if tier is None:
+                tier = self.tiers[key] = StreamTier(*key)
+            return tier
+
+    def get_jpeg(self, tier):
+        # Returns (seq, jpeg bytes) for the latest frame, or (seq, None)
+        with self.borrow() as (frame, seq, _):
+            if frame is None:
+                return seq, None
+            return seq, tier.encode(frame, seq)
+
+    def get_encoded(self, tier):
+        # Returns (seq, timestamp, etag, jpeg bytes) for the latest frame, or None
+        with self.borrow() as (frame, seq, timestamp):
+            if frame is None:
+                return None
+            jpeg = tier.encode(frame, seq)
+        if jpeg is None:
+            return None
+        etag = f'"{self.epoch}-{seq}-{tier.width or "full"}-q{tier.quality}"'
+        return seq, timestamp, etag, jpeg
+
+    def get_snapshot(self, tier):
+        # Returns (etag, timestamp, jpeg bytes) for the latest frame, or None
+        encoded = self.get_encoded(tier)
+        if encoded is None:
+            return None
+        _, timestamp, etag, jpeg = encoded
+        return etag, timestamp, jpeg
+
+    def stats(self):
+        with self.tiers_lock:
+            tiers = list(self.tiers.values())
+        return {
+            "seq": self.seq,
+            "tiers": [t.stats() for t in tiers],
+        }
+
+
+def retier(broadcaster, tier, width=None, quality=None):
+    # The tier a connected client should use now, after the broadcaster's
+    # quality cap changed; moves the client over if it differs
+    new_tier = broadcaster.get_tier(width, quality)
+    if new_tier is not tier:
+        tier.add_client(-1)
+        new_tier.add_client(1)
+    return new_tier
+
+
+def mjpeg_stream(broadcaster, width=None, quality=None, max_fps=None, min_fps=1.0):
+    # Generator of multipart MJPEG chunks for one client. The time a yield
+    # takes to resume is the time the server spent writing to the socket, so
+    # a blocked write lowers this client's frame rate; it recovers slowly
+    # while writes are fast again.
+    width, quality = width or None, quality or None
+    tier = broadcaster.get_tier(width, quality)
+    cap = getattr(broadcaster, "max_quality", None)
+    target_fps = max_fps if max_fps and max_fps > 0 else None
+    fps = target_fps
+    seq = 0
+    last_sent = 0.0
+
+    tier.add_client(1)
+    try:
+        while True:
+            new_seq = broadcaster.wait_for_frame(seq, timeout=1.0, tier=tier)
+            if new_seq is None:
+                continue
+            # The governor lowers (and restores) the quality cap while
+            # clients are connected
+            if getattr(broadcaster, "max_quality", None) != cap:
+                cap = broadcaster.max_quality
+                tier = retier(broadcaster, tier, width, quality)
+
+            if fps:
+                wait = (1.0 / fps) - (time.monotonic() - last_sent)
+                if wait > 0:
+                    time.sleep(wait)
+
+            seq, jpeg = broadcaster.get_jpeg(tier)
+            if jpeg is None:
+                continue
+
+            last_sent = time.monotonic()
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+            write_time = time.monotonic() - last_sent
+            tier.record_sent(len(jpeg))
+
+            # Adapt: the budget per frame is 1/fps (or 1/30s when unlimited)
+            budget = 1.0 / (fps or 30.0)
+            if write_time > budget * 0.5:
+                fps = max(min_fps, (fps or 30.0) * 0.7)
+            elif fps and write_time < budget * 0.1:
+                fps = fps * 1.1
+                if target_fps is not None:
+                    fps = min(fps, target_fps)
+                elif fps >= 30.0:
+                    fps = None  # back to unthrottled
+    finally:
+        tier.add_client(-1)
@@ -0,0 +1,221 @@
+import glob
+import logging
+import os
+import struct
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Detection trace: the blobs SpeedDetector found in every frame, so tracking,
+# line crossing and speed can be re-run later with other lines, distances or
+# zones, without the video.
+#
+# A trace is a directory of append-only segment files:
+#
+#   file header   b"SCTR", version (u16), reserved (u16)
+#   frame record  timestamp (f64), n (i32)
+#                 n > 0: n blobs follow, each x1 y1 x2 y2 cx cy as i16
+#                 n < 0: -n frames without blobs, the last one at timestamp
+#
+# Runs of empty frames collapse into one record, so an empty road costs
+# almost nothing; a frame with one vehicle is 24 bytes.
+MAGIC = b"SCTR"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sHH")
+RECORD = struct.Struct("<di")
+BLOB_DTYPE = np.dtype("<i2")
+BLOB_FIELDS = 6
+SEGMENT_GLOB = "trace_*.sctr"
+
+
+class TraceWriter:
+    # Appends frames to the current segment, buffering up to `flush_bytes` or
+    # `flush_seconds`. A new segment starts when the current one reaches
+    # `segment_bytes` or the day changes; the oldest segments are deleted
+    # while the directory holds more than `max_bytes`.
+    def __init__(self, directory, max_bytes=500 << 20, segment_bytes=16 << 20, flush_bytes=64 << 10,
+                 flush_seconds=5.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = min(segment_bytes, max_bytes)
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self.logger = logging.getLogger("TraceWriter")
+        os.makedirs(directory, exist_ok=True)
+
+        self.file = None
+        self.path = None
+        self.segment_day = None
+        self.written = 0  # bytes in the current segment, including the buffer
+        self.buffer = bytearray()
+        self.last_flush = time.monotonic()
+        self.empty_run = 0
+        self.empty_timestamp = None
+
+        # Counters
+        self.frames = 0
+        self.segments = 0
+        self.deleted = 0
+
+    def append(self, timestamp, rects, centroids):
+        self.frames += 1
+        if len(rects) == 0:
+            self.empty_run += 1
+            self.empty_timestamp = timestamp
+            # Long quiet periods are written in pieces, so little is lost on a crash
+            if self.empty_run >= 1 << 30 or time.monotonic() - self.last_flush >= self.flush_seconds:
+                self._flush_empty_run()
+                self.flush()
+            return
+        self._flush_empty_run()
+
+        blobs = np.hstack((rects, centroids)).clip(-32768, 32767).astype(BLOB_DTYPE)
+        self._write(timestamp, RECORD.pack(timestamp, len(blobs)) + blobs.tobytes())
+
+    def _flush_empty_run(self):
+        if self.empty_run:
+            run, ts = self.empty_run, self.empty_timestamp
+            self.empty_run = 0
+            self._write(ts, RECORD.pack(ts, -run))
+
+    def _write(self, timestamp, record):
+        day = datetime.fromtimestamp(timestamp).date()
+        if self.file is None or self.written + len(record) > self.segment_bytes or day != self.segment_day:
+            self._rotate(timestamp, day)
+        self.buffer += record
+        self.written += len(record)
+        if len(self.buffer) >= self.flush_bytes or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def _rotate(self, timestamp, day):
+        self._close_file()
+        stamp = datetime.fromtimestamp(timestamp).strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"trace_{stamp}.sctr")
+        n = 1
+        while os.path.exists(path):
+            n += 1
+            path = os.path.join(self.directory, f"trace_{stamp}_{n:02d}.sctr")
+        self.file = open(path, "ab")
+        self.path = path
+        self.segment_day = day
+        self.buffer += FILE_HEADER.pack(MAGIC, VERSION, 0)
+        self.written = FILE_HEADER.size
+        self.segments += 1
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        # Oldest first; never the segment being written
+        paths = sorted(glob.glob(os.path.join(self.directory, SEGMENT_GLOB)))
+        sizes = {p: os.path.getsize(p) for p in paths}
+        total = sum(sizes.values()) + self.segment_bytes
+        for path in paths:
+            if total <= self.max_bytes or path == self.path:
+                break
+            try:
+                os.remove(path)
+                self.deleted += 1
+                total -= sizes[path]
+                self.logger.info(f"Trace budget: deleted {os.path.basename(path)}")
+            except OSError as e:
+                self.logger.error(f"Error deleting trace {path}: {e}")
+
+    def flush(self):
+        if self.file is not None and self.buffer:
+            self.file.write(self.buffer)
+            self.file.flush()
+            self.buffer = bytearray()
+        self.last_flush = time.monotonic()
+
+    def _close_file(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        self._flush_empty_run()
+        self._close_file()
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "frames": self.frames,
+            "segments": self.segments,
+            "deleted": self.deleted,
+            "segment_bytes": self.written,
+        }
+
+
+def trace_segments(directory, start=None, end=None):
+    # Segment paths in time order. Names carry the first timestamp, so a
+    # segment can only hold frames from its name up to the next segment's.
+    paths = sorted(glob.glob(os.path.join(directory, SEGMENT_GLOB)))
+    if start is None and end is None:
+        return paths
+    starts = [_segment_start(p) for p in paths]
+    selected = []
+    for i, path in enumerate(paths):
+        next_start = starts[i + 1] if i + 1 < len(paths) else None
+        if end is not None and starts[i] is not None and starts[i] >= end:
+            continue
+        if start is not None and next_start is not None and next_start < start:
+            continue
+        selected.append(path)
+    return selected
+
+
+def _segment_start(path):
+    stamp = os.path.basename(path)[len("trace_"):].split(".")[0][:15]
+    try:
+        return datetime.strptime(stamp, "%Y%m%d-%H%M%S").timestamp()
+    except ValueError:
+        return None
+
+
+def read_trace(path):
+    # Yields (timestamp, blobs, empty_frames): blobs an (n, 6) int array of
+    # x1 y1 x2 y2 cx cy, or None for a run of empty_frames frames
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        return
+    magic, version, _ = FILE_HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a detection trace (version {VERSION})")
+
+    offset = FILE_HEADER.size
+    size = len(data)
+    blob_bytes = BLOB_FIELDS * BLOB_DTYPE.itemsize
+    while offset + RECORD.size <= size:
+        timestamp, n = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if n < 0:
+            yield timestamp, None, -n
+            continue
+        end = offset + n * blob_bytes
+        if end > size:
+            break  # last record cut short (the writer was killed mid-flush)
+        blobs = np.frombuffer(data, dtype=BLOB_DTYPE, count=n * BLOB_FIELDS, offset=offset)
+        yield timestamp, blobs.reshape(n, BLOB_FIELDS).astype(np.int32), 0
+        offset = end
+
+
+def replay(detector, paths, start=None, end=None):
+    # Runs tracking, line crossing and speed over recorded frames with the
+    # detector's current settings. Returns (events, frames replayed).
+    events = []
+    frames = 0
+    for path in paths:
+        for timestamp, blobs, empty in read_trace(path):
+            if end is not None and timestamp >= end:
+                return events, frames
+            if start is not None and timestamp < start:
+                continue
+            if blobs is None:
+                detector.skip_empty(empty)
+                frames += empty
+            else:
+                events.extend(detector.track(blobs[:, :4], blobs[:, 4:], timestamp))
+                frames += 1
+    return events, frames
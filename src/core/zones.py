@@ -0,0 +1,101 @@
+DEFAULT_ZONE_ID = "default"
+
+
+class Zone:
+    # One measurement zone: an entry/exit line pair with its own real
+    # distance and direction filter. "approaching" means line1 -> line2.
+    def __init__(self, zone_id, line1, line2, real_distance=5.0, direction="both"):
+        self.id = str(zone_id)
+        self.line1 = list(line1)
+        self.line2 = list(line2)
+        self.real_distance = float(real_distance)
+        self.direction = direction
+
+        # Everything a crossing track can touch lies within the bounding box
+        # of both lines
+        xs = (self.line1[0], self.line1[2], self.line2[0], self.line2[2])
+        ys = (self.line1[1], self.line1[3], self.line2[1], self.line2[3])
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+
+    def accepts(self, start_line):
+        if self.direction == "approaching":
+            return start_line == 1
+        if self.direction == "receding":
+            return start_line == 2
+        return True
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "line1": self.line1,
+            "line2": self.line2,
+            "real_distance_meters": self.real_distance,
+            "direction": self.direction,
+        }
+
+    def __repr__(self):
+        return f"Zone({self.id!r}, {self.direction}, {self.real_distance} m)"
+
+
+def zones_from_config(config):
+    # `zones` is a list of {id, line1, line2, real_distance_meters, direction};
+    # missing keys fall back to the top-level detection settings. Without a
+    # `zones` list the top-level line pair is the single "default" zone.
+    line1 = config.get("line1", [0, 0, 0, 0])
+    line2 = config.get("line2", [0, 0, 0, 0])
+    distance = config.get("real_distance_meters", 5.0)
+    direction = config.get("direction", "both")
+
+    entries = config.get("zones") or []
+    if not entries:
+        return [Zone(DEFAULT_ZONE_ID, line1, line2, distance, direction)]
+
+    zones = []
+    seen = set()
+    for i, entry in enumerate(entries):
+        zone_id = str(entry.get("id", f"zone{i + 1}"))
+        if zone_id in seen:
+            raise ValueError(f"Duplicate zone id {zone_id!r}")
+        seen.add(zone_id)
+        zones.append(Zone(
+            zone_id,
+            entry.get("line1", line1),
+            entry.get("line2", line2),
+            entry.get("real_distance_meters", distance),
+            entry.get("direction", direction),
+        ))
+    return zones
+
+
+class ZoneIndex:
+    # Uniform grid over the frame: each cell lists the zones whose bounding
+    # box covers it. A lookup only visits the cells under the query box, so
+    # the per-track cost depends on how many zones are nearby, not on how
+    # many are configured.
+    def __init__(self, zones, cell_size=64):
+        self.zones = list(zones)
+        self.cell_size = max(int(cell_size), 1)
+        self.cells = {}  # (cx, cy) -> [zone index]
+        for i, zone in enumerate(self.zones):
+            x1, y1, x2, y2 = self._cell_range(zone.bbox)
+            for cx in range(x1, x2 + 1):
+                for cy in range(y1, y2 + 1):
+                    self.cells.setdefault((cx, cy), []).append(i)
+
+    def _cell_range(self, box):
+        s = self.cell_size
+        return (int(box[0] // s), int(box[1] // s), int(box[2] // s), int(box[3] // s))
+
+    def query(self, box):
+        # Zones whose bounding box overlaps box (x1, y1, x2, y2), in config order
+        x1, y1, x2, y2 = self._cell_range(box)
+        hits = set()
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                hits.update(self.cells.get((cx, cy), ()))
+        result = []
+        for i in sorted(hits):
+            zx1, zy1, zx2, zy2 = self.zones[i].bbox
+            if zx1 <= box[2] and box[0] <= zx2 and zy1 <= box[3] and box[1] <= zy2:
+                result.append(self.zones[i])
+        return result
@@ -6,6 +6,7 @@ let areaDragStart = null;
 let scaleX = 1, scaleY = 1;
 
 document.addEventListener("DOMContentLoaded", () => {
+    selectStreamTier();
     fetchConfig().then(() => {
         setupCanvas();
         populateConfigForm();
@@ -22,6 +23,15 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 });
 
+// Small screens get a downscaled, lower quality stream (see docs/MOBILE_ACCESS.md)
+function selectStreamTier() {
+    const img = document.getElementById("stream-img");
+    if(!img) return;
+    if (window.innerWidth < 768) {
+        img.src = "/stream?width=640&quality=60&fps=10";
+    }
+}
+
 function showTab(tabName) {
     document.querySelectorAll(".tab-content").forEach(el => el.classList.add("d-none"));
     const target = document.getElementById("tab-" + tabName);
@@ -111,6 +121,13 @@ function drawOverlay() {
 
     drawLine(l1, "blue", l1Label);
     drawLine(l2, "red", l2Label);
+
+    // Extra measurement zones (one per lane) are configured in config.yaml
+    // and only shown here, not edited
+    (config.detection.zones || []).forEach(zone => {
+        if (zone.line1) drawLine(zone.line1, "deepskyblue", `${zone.id}: Line 1`);
+        if (zone.line2) drawLine(zone.line2, "orange", `${zone.id}: Line 2`);
+    });
     
     if (editMode === 'lines') {
         drawHandles(l1, 1);
@@ -375,7 +392,9 @@ async function loadHistory() {
         const item = document.createElement("div");
         item.className = "alert alert-secondary py-1 mb-1 d-flex justify-content-between";
         const time = new Date(ev.timestamp*1000).toLocaleTimeString();
-        item.innerHTML = `<span><b>${ev.speed} km/h</b></span> <span class="text-muted small">${time}</span>`;
+        const zone = ev.zone_id && ev.zone_id !== "default" ? ` <span class="badge bg-info">${ev.zone_id}</span>` : "";
+        const thumb = ev.crop_path ? `<img src="/images/${ev.crop_path}" class="me-2 rounded" style="height: 32px">` : "";
+        item.innerHTML = `<span>${thumb}<b>${ev.speed} km/h</b>${zone}</span> <span class="text-muted small">${time}</span>`;
         item.onclick = () => window.open("/images/" + ev.image_path, "_blank");
         item.style.cursor = "pointer";
         list.appendChild(item);
@@ -504,9 +523,20 @@ window.calculateCalibration = async function() {
     const distance = speedMps * duration;
 
     if(confirm(`Calculated distance: ${distance.toFixed(2)} meters. Apply this setting?`)) {
+        // Only passages measured with the lines as they are now get the new
+        // distance; older calibration versions had other line positions
+        const versions = await (await fetch("/api/calibration/versions")).json();
         document.getElementById("conf-distance").value = distance.toFixed(2);
         config.detection.real_distance_meters = distance;
         await saveConfig({preventDefault: ()=>{}});
+        if (versions.current != null &&
+                confirm("Recompute the speeds of the passages measured with the previous distance?")) {
+            const res = await fetch(`/api/calibration/recompute?from_version=${versions.current}`, {method: "POST"});
+            const result = await res.json();
+            alert(`Updated ${result.updated} passages (${result.skipped} too old to recompute).`);
+            loadHistory();
+            fetchCalibrationEvents();
+        }
     }
 };
 
@@ -0,0 +1,65 @@
+import unittest
+import importlib
+import os
+import sys
+import tempfile
+import numpy as np
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+class TestSnapshotEndpoint(unittest.TestCase):
+    # src.app.main creates its service and data directories at import, so it
+    # is imported in a temporary working directory; the camera is not started
+    @classmethod
+    def setUpClass(cls):
+        cls.cwd = os.getcwd()
+        cls.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(ROOT, "config", "config.yaml")) as f:
+            config = yaml.safe_load(f)
+        config["camera"]["device_id"] = os.path.join(ROOT, "dummy.mp4")
+        config["web"]["snapshot_token"] = "secret"
+        os.makedirs(os.path.join(cls.tmp.name, "config"))
+        with open(os.path.join(cls.tmp.name, "config", "config.yaml"), "w") as f:
+            yaml.dump(config, f)
+        os.chdir(cls.tmp.name)
+        cls.main = importlib.import_module("src.app.main")
+        cls.client = TestClient(cls.main.app)
+
+    @classmethod
+    def tearDownClass(cls):
+        os.chdir(cls.cwd)
+        cls.tmp.cleanup()
+
+    def get(self, **headers):
+        return self.client.get("/api/snapshot.jpg?token=secret&width=320", headers=headers)
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get("/api/snapshot.jpg").status_code, 401)
+        self.assertEqual(self.client.get("/api/snapshot.jpg?token=wrong").status_code, 401)
+
+    def test_conditional_get(self):
+        frames = self.main.service.frames
+        frames.publish(np.full((360, 640, 3), 100, np.uint8))
+        first = self.get()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers["content-type"], "image/jpeg")
+        etag, modified = first.headers["etag"], first.headers["last-modified"]
+
+        self.assertEqual(self.get(**{"If-None-Match": etag}).status_code, 304)
+        self.assertEqual(self.get(**{"If-None-Match": f'"other", {etag}'}).status_code, 304)
+        self.assertEqual(self.get(**{"If-Modified-Since": modified}).status_code, 304)
+        # If-None-Match wins over If-Modified-Since
+        self.assertEqual(self.get(**{"If-None-Match": '"other"', "If-Modified-Since": modified}).status_code, 200)
+
+        frames.publish(np.full((360, 640, 3), 150, np.uint8))
+        second = self.get(**{"If-None-Match": etag})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second.headers["etag"], etag)
+
+if __name__ == '__main__':
+    unittest.main()
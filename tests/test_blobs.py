@@ -0,0 +1,76 @@
+import unittest
+import os
+import sys
+import numpy as np
+import cv2
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.blobs import BlobExtractor, contour_blobs
+
+class TestBlobExtractor(unittest.TestCase):
+    def test_empty_mask(self):
+        mask = np.zeros((200, 200), dtype=np.uint8)
+        rects, centroids = BlobExtractor(min_area=100).extract(mask)
+        self.assertEqual(rects.shape, (0, 4))
+        self.assertEqual(centroids.shape, (0, 2))
+
+    def test_matches_contour_path_for_solid_blobs(self):
+        mask = np.zeros((300, 400), dtype=np.uint8)
+        cv2.rectangle(mask, (20, 30), (99, 89), 255, -1)
+        cv2.rectangle(mask, (250, 150), (349, 249), 255, -1)
+
+        rects, centroids = BlobExtractor(min_area=1000, merge_distance=0, label_scale=1.0).extract(mask)
+        legacy_rects, _ = contour_blobs(mask, 1000)
+
+        self.assertEqual(sorted(rects.tolist()), sorted(legacy_rects.tolist()))
+        self.assertIn([60, 60], centroids.tolist())
+
+    def test_downscaled_labelling_stays_close(self):
+        mask = np.zeros((300, 400), dtype=np.uint8)
+        cv2.rectangle(mask, (21, 31), (100, 90), 255, -1)
+
+        rects, centroids = BlobExtractor(min_area=1000, merge_distance=0, label_scale=0.5).extract(mask)
+        self.assertEqual(len(rects), 1)
+        np.testing.assert_allclose(rects[0], [21, 31, 101, 91], atol=2)
+        np.testing.assert_allclose(centroids[0], [60, 60], atol=1)
+
+    def test_merges_fragments_of_one_vehicle(self):
+        # A truck split into cab and trailer by a 10px gap, plus a separate car
+        mask = np.zeros((300, 600), dtype=np.uint8)
+        cv2.rectangle(mask, (50, 100), (109, 159), 255, -1)
+        cv2.rectangle(mask, (120, 100), (259, 159), 255, -1)
+        cv2.rectangle(mask, (450, 100), (529, 159), 255, -1)
+
+        rects, centroids = BlobExtractor(min_area=2000, merge_distance=20).extract(mask)
+        self.assertEqual(sorted(rects.tolist()), [[50, 100, 260, 160], [450, 100, 530, 160]])
+
+        # Without merging the cab and trailer are separate blobs
+        rects, _ = BlobExtractor(min_area=2000, merge_distance=0).extract(mask)
+        self.assertEqual(len(rects), 3)
+
+    def test_merge_is_transitive(self):
+        mask = np.zeros((100, 400), dtype=np.uint8)
+        for x in (10, 80, 150, 220):
+            cv2.rectangle(mask, (x, 20), (x + 59, 79), 255, -1)
+
+        rects, _ = BlobExtractor(min_area=1000, merge_distance=15).extract(mask)
+        self.assertEqual(rects.tolist(), [[10, 20, 280, 80]])
+
+    def test_small_fragments_add_up(self):
+        # Neither piece is big enough alone, together they are a vehicle
+        mask = np.zeros((100, 200), dtype=np.uint8)
+        cv2.rectangle(mask, (10, 10), (49, 49), 255, -1)
+        cv2.rectangle(mask, (55, 10), (94, 49), 255, -1)
+
+        rects, _ = BlobExtractor(min_area=3000, merge_distance=10).extract(mask)
+        self.assertEqual(len(rects), 1)
+
+    def test_drops_specks(self):
+        mask = np.zeros((100, 100), dtype=np.uint8)
+        mask[5, 5] = 255
+        rects, _ = BlobExtractor(min_area=100, merge_distance=50, min_fragment_area=10).extract(mask)
+        self.assertEqual(len(rects), 0)
+
+if __name__ == '__main__':
+    unittest.main()
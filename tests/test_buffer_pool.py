@@ -0,0 +1,89 @@
+import unittest
+import os
+import sys
+import numpy as np
+from unittest.mock import MagicMock
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.buffer_pool import BufferPool, ScratchBuffers
+from src.core.camera import Camera
+from src.core.streaming import FrameBroadcaster
+
+class TestBufferPool(unittest.TestCase):
+    def test_buffers_are_recycled(self):
+        pool = BufferPool()
+        buf = pool.acquire((4, 4, 3))
+        array = buf.array
+        buf.release()
+
+        again = pool.acquire((4, 4, 3))
+        self.assertIs(again.array, array)
+        self.assertEqual(pool.stats()["allocated"], 1)
+        self.assertEqual(pool.stats()["reused"], 1)
+
+    def test_retained_buffer_is_not_recycled(self):
+        pool = BufferPool()
+        buf = pool.acquire((4, 4, 3))
+        buf.retain()
+        buf.release()
+
+        other = pool.acquire((4, 4, 3))
+        self.assertIsNot(other.array, buf.array)
+        self.assertEqual(pool.stats()["in_use"], 2)
+
+    def test_shape_change_drops_old_buffers(self):
+        pool = BufferPool()
+        pool.acquire((4, 4, 3)).release()
+        buf = pool.acquire((8, 8, 3))
+        self.assertEqual(buf.array.shape, (8, 8, 3))
+        self.assertEqual(pool.stats()["allocated"], 2)
+
+    def test_view_is_read_only(self):
+        buf = BufferPool().acquire((4, 4, 3))
+        with self.assertRaises(ValueError):
+            buf.view()[0, 0, 0] = 1
+
+    def test_scratch_buffers_count_allocations(self):
+        scratch = ScratchBuffers()
+        a = np.zeros(3)
+        scratch.keep("x", a)
+        self.assertIs(scratch.get("x"), a)
+        scratch.keep("x", a)
+        self.assertEqual(scratch.allocations, 1)
+
+class TestPooledCapture(unittest.TestCase):
+    def test_read_buffer_reads_into_pool(self):
+        cam = Camera(width=4, height=2)
+        cam.cap = MagicMock()
+        cam.cap.isOpened.return_value = True
+        cam.cap.read.side_effect = lambda image: (True, image)
+        pool = BufferPool()
+
+        for _ in range(5):
+            cam.read_buffer(pool).release()
+
+        self.assertEqual(pool.stats()["allocated"], 1)
+        self.assertEqual(pool.stats()["reused"], 4)
+
+    def test_broadcaster_keeps_published_buffer_alive(self):
+        pool = BufferPool()
+        broadcaster = FrameBroadcaster()
+
+        first = pool.acquire((2, 2, 3))
+        broadcaster.publish(first.view(), buffer=first)
+        first.release()
+
+        # Still referenced by the broadcaster: the next acquire gets a new array
+        second = pool.acquire((2, 2, 3))
+        self.assertIsNot(second.array, first.array)
+
+        with broadcaster.borrow() as (frame, seq, _):
+            broadcaster.publish(second.view(), buffer=second)
+            second.release()
+            # The borrower still holds the first frame
+            self.assertEqual(pool.stats()["in_use"], 2)
+        self.assertEqual(pool.stats()["in_use"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import unittest
+import os
+import tempfile
 from unittest.mock import patch, MagicMock, call
 import cv2
 from src.core.camera import Camera
@@ -65,5 +67,59 @@ class TestCameraPipeline(unittest.TestCase):
         ]
         mock_video_capture.assert_has_calls(calls)
 
+    @patch('src.core.camera.cv2.VideoCapture')
+    @patch('src.core.camera.Camera._check_gstreamer_plugin')
+    def test_start_uses_cached_configuration(self, mock_check_plugin, mock_video_capture):
+        # Setup
+        mock_check_plugin.return_value = True
+        cache_path = os.path.join(tempfile.mkdtemp(), "camera_cache.json")
+
+        mock_cap_fail = MagicMock()
+        mock_cap_fail.isOpened.return_value = False
+
+        mock_cap_success = MagicMock()
+        mock_cap_success.isOpened.return_value = True
+        mock_cap_success.read.return_value = (True, MagicMock(size=100))
+        mock_cap_success.get.return_value = 100
+
+        # Cold start: both GStreamer pipelines fail, configured V4L2 source works
+        mock_video_capture.side_effect = [mock_cap_fail, mock_cap_fail, mock_cap_success]
+        cold = Camera(source=0, width=1536, height=864, fps=30, cache_path=cache_path)
+        cold.start()
+        self.assertFalse(cold.cache_hit)
+        self.assertTrue(os.path.exists(cache_path))
+
+        # Warm start: the cached source is opened directly
+        mock_video_capture.reset_mock()
+        mock_video_capture.side_effect = [mock_cap_success]
+        warm = Camera(source=0, width=1536, height=864, fps=30, cache_path=cache_path)
+        warm.start()
+
+        # Assert
+        self.assertTrue(warm.cache_hit)
+        mock_video_capture.assert_called_once_with(0)
+
+    @patch('src.core.camera.cv2.VideoCapture')
+    @patch('src.core.camera.Camera._check_gstreamer_plugin')
+    def test_cache_ignored_when_config_changes(self, mock_check_plugin, mock_video_capture):
+        # Setup
+        mock_check_plugin.return_value = True
+        cache_path = os.path.join(tempfile.mkdtemp(), "camera_cache.json")
+
+        mock_cap = MagicMock()
+        mock_cap.isOpened.return_value = True
+        mock_cap.read.return_value = (True, MagicMock(size=100))
+        mock_cap.get.return_value = 100
+        mock_video_capture.return_value = mock_cap
+
+        Camera(width=1536, height=864, fps=30, cache_path=cache_path).start()
+
+        # Action
+        cam = Camera(width=1280, height=720, fps=30, cache_path=cache_path)
+        cam.start()
+
+        # Assert
+        self.assertFalse(cam.cache_hit)
+
 if __name__ == '__main__':
     unittest.main()
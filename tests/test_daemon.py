@@ -0,0 +1,190 @@
+import unittest
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.app.daemon import ControlServer, DaemonUnavailable, RemoteBroadcaster, RemoteService
+from src.core.streaming import FrameBroadcaster, mjpeg_stream
+
+class StubService:
+    # The parts of SpeedCameraService the control server uses
+    def __init__(self):
+        self.frames = FrameBroadcaster()
+        self.config = {"web": {"username": "admin"}}
+        self.calibration_version = 3
+
+    def status(self):
+        return {"state": "ready", "ready": True, "error": None}
+
+    def save_config(self, config):
+        self.config = config
+        return True
+
+    def get_metrics(self):
+        return {"stream": self.frames.stats()}
+
+    def get_zones(self):
+        return [{"id": "main", "real_distance": 5.0}]
+
+    def get_calibration_events(self):
+        return []
+
+    def recompute_speeds(self, start=None, end=None, zone_id=None, from_version=None):
+        if zone_id is not None:
+            raise ValueError(f"Unknown zone {zone_id!r}")
+        return {"updated": 2, "skipped": 0}
+
+def frame(value):
+    return np.full((360, 640, 3), value, np.uint8)
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = StubService()
+        self.server = ControlServer(self.service, f"unix://{self.tmp.name}/daemon.sock")
+        self.server.start()
+        self.remote = RemoteService(self.server.bound_address, data_dir=self.tmp.name, timeout=1.0)
+
+    def tearDown(self):
+        self.remote.stop()
+        self.server.stop()
+        self.tmp.cleanup()
+
+    def test_calls(self):
+        self.assertTrue(self.remote.status()["ready"])
+        self.assertEqual(self.remote.calibration_version, 3)
+        self.assertEqual(self.remote.get_zones()[0]["id"], "main")
+        self.assertTrue(self.remote.save_config({"web": {"username": "other"}}))
+        self.assertEqual(self.service.config["web"]["username"], "other")
+        self.assertEqual(self.remote.recompute_speeds(start=1.0)["updated"], 2)
+        self.assertIn("api", self.remote.get_metrics())
+        with self.assertRaises(ValueError):
+            self.remote.recompute_speeds(zone_id="nope")
+        with self.assertRaises(ValueError):
+            self.remote.call("stop")  # not exposed
+
+    def test_daemon_unavailable(self):
+        self.server.stop()
+        self.assertEqual(self.remote.status()["state"], "unreachable")
+        with self.assertRaises(DaemonUnavailable):
+            self.remote.get_zones()
+
+    def test_silent_daemon_times_out(self):
+        # Accepts connections but never answers
+        address = os.path.join(self.tmp.name, "silent.sock")
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(address)
+        listener.listen()
+        self.addCleanup(listener.close)
+        remote = RemoteService(f"unix://{address}", data_dir=self.tmp.name, timeout=0.5)
+        self.addCleanup(remote.stop)
+        start = time.monotonic()
+        self.assertEqual(remote.status()["state"], "unreachable")
+        with self.assertRaises(DaemonUnavailable):
+            remote.get_zones()
+        self.assertLess(time.monotonic() - start, 3.0)
+
+    def test_idle_tier_is_replaced(self):
+        frames = RemoteBroadcaster(self.server.bound_address, idle_timeout=0.1)
+        self.addCleanup(frames.stop)
+        self.service.frames.publish(frame(100))
+        tier = frames.get_tier(320, 60)
+        self.assertIsNotNone(frames.get_snapshot(tier))
+        tier.thread.join(5.0)
+        self.assertTrue(tier.closed)
+        self.assertEqual(frames.stats()["tiers"], [])
+        # A later request gets a new subscription, not the ended one
+        again = frames.get_tier(320, 60)
+        self.assertIsNot(again, tier)
+        self.assertIsNotNone(frames.get_snapshot(again))
+
+    def test_snapshot_matches_daemon(self):
+        self.service.frames.publish(frame(100))
+        tier = self.remote.frames.get_tier(320, 60)
+        etag, timestamp, jpeg = self.remote.frames.get_snapshot(tier)
+        local = self.service.frames.get_snapshot(self.service.frames.get_tier(320, 60))
+        self.assertEqual((etag, timestamp, jpeg), local)
+        # One encode in the daemon, however many readers
+        self.remote.frames.get_snapshot(tier)
+        self.assertEqual(self.service.frames.get_tier(320, 60).stats()["frames_encoded"], 1)
+
+    def test_mjpeg_stream(self):
+        running = True
+
+        def publish():
+            value = 0
+            while running:
+                self.service.frames.publish(frame(value % 256))
+                value += 10
+                time.sleep(0.02)
+
+        publisher = threading.Thread(target=publish, daemon=True)
+        publisher.start()
+        try:
+            stream = mjpeg_stream(self.remote.frames, width=320, quality=60)
+            chunks = [next(stream) for _ in range(3)]
+            stream.close()
+        finally:
+            running = False
+            publisher.join()
+        for chunk in chunks:
+            self.assertTrue(chunk.startswith(b"--frame\r\nContent-Type: image/jpeg\r\n\r\n\xff\xd8"))
+        self.assertEqual(len(self.remote.frames.stats()["tiers"]), 1)
+
+    def test_config_is_cached(self):
+        self.remote.config
+        calls = self.server.calls
+        for _ in range(5):
+            self.assertEqual(self.remote.config["web"]["username"], "admin")
+        self.assertEqual(self.server.calls, calls)
+        self.remote.save_config({"web": {"username": "other"}})
+        self.assertEqual(self.remote.config["web"]["username"], "other")
+
+class TestDaemonOverTcp(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.service = StubService()
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+        self.tmp.cleanup()
+
+    def start(self, secret):
+        server = ControlServer(self.service, "tcp://127.0.0.1:0", secret=secret)
+        server.start()
+        self.servers.append(server)
+        return server.bound_address
+
+    def remote(self, address, secret):
+        remote = RemoteService(address, data_dir=self.tmp.name, timeout=1.0, secret=secret)
+        self.addCleanup(remote.stop)
+        return remote
+
+    def test_tcp_requires_secret(self):
+        with self.assertRaises(ValueError):
+            ControlServer(self.service, "tcp://127.0.0.1:0")
+
+    def test_secret_is_checked(self):
+        address = self.start("s3cret")
+        with self.assertRaises(RuntimeError):
+            self.remote(address, None).get_zones()
+        with self.assertRaises(RuntimeError):
+            self.remote(address, "wrong").config
+        remote = self.remote(address, "s3cret")
+        self.assertEqual(remote.get_zones()[0]["id"], "main")
+
+        self.service.frames.publish(frame(100))
+        self.assertIsNotNone(remote.frames.get_snapshot(remote.frames.get_tier(320, 60)))
+        wrong = self.remote(address, "wrong").frames
+        self.assertIsNone(wrong.get_snapshot(wrong.get_tier(320, 60), timeout=0.3))
+
+if __name__ == '__main__':
+    unittest.main()
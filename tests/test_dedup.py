@@ -0,0 +1,66 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.dedup import EventDeduplicator
+from src.core.speed_detector import SpeedDetector
+
+def make_event(ts, position, direction="approaching", object_id=1, speed=50.0):
+    return {"timestamp": ts, "position": position, "direction": direction, "object_id": object_id, "speed": speed}
+
+class TestEventDeduplicator(unittest.TestCase):
+    def test_merges_near_identical_events(self):
+        dedup = EventDeduplicator(window_seconds=1.0, position_tolerance=0.1)
+
+        # Same car re-registered under a new ID, 0.3s later at nearly the same spot
+        events = dedup.filter([make_event(100.0, 0.50, object_id=1), make_event(100.3, 0.55, object_id=2)])
+
+        self.assertEqual([e["object_id"] for e in events], [1])
+        self.assertEqual(dedup.stats()["hits"], 1)
+        self.assertEqual(dedup.stats()["misses"], 1)
+
+    def test_keeps_distinct_events(self):
+        dedup = EventDeduplicator(window_seconds=1.0, position_tolerance=0.1)
+
+        # Other lane, other direction, and same spot but later
+        self.assertFalse(dedup.is_duplicate(make_event(100.0, 0.2)))
+        self.assertFalse(dedup.is_duplicate(make_event(100.1, 0.8)))
+        self.assertFalse(dedup.is_duplicate(make_event(100.1, 0.2, direction="receding")))
+        self.assertFalse(dedup.is_duplicate(make_event(102.0, 0.2)))
+
+        self.assertEqual(dedup.stats()["hits"], 0)
+
+    def test_keeps_close_cars_at_different_speeds(self):
+        dedup = EventDeduplicator(window_seconds=1.5, position_tolerance=0.15, speed_tolerance=3.0)
+
+        # Busy lane: a second car exits 0.8s behind the first at the same spot
+        events = dedup.filter([make_event(100.0, 0.50, object_id=1, speed=48.0),
+                               make_event(100.8, 0.52, object_id=2, speed=63.0),
+                               make_event(101.0, 0.51, object_id=3, speed=62.0)])
+
+        # The third is a fragment of the second
+        self.assertEqual([e["object_id"] for e in events], [1, 2])
+
+    def test_window_crosses_slot_boundary(self):
+        dedup = EventDeduplicator(window_seconds=1.0, position_tolerance=0.1)
+        self.assertFalse(dedup.is_duplicate(make_event(100.95, 0.5)))
+        self.assertTrue(dedup.is_duplicate(make_event(101.05, 0.5)))
+
+    def test_old_entries_expire(self):
+        dedup = EventDeduplicator(window_seconds=1.0)
+        for i in range(100):
+            dedup.is_duplicate(make_event(100.0 + i * 5, 0.5))
+        self.assertLessEqual(dedup.stats()["indexed"], 2)
+
+class TestLinePosition(unittest.TestCase):
+    def test_line_position(self):
+        detector = SpeedDetector()
+        line = [100, 200, 300, 200]
+        self.assertEqual(detector.line_position((100, 210), line), 0.0)
+        self.assertEqual(detector.line_position((200, 190), line), 0.5)
+        self.assertEqual(detector.line_position((500, 200), line), 1.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import os
+import sys
+import numpy as np
+import cv2
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.evidence import EvidenceHistory
+from src.core.speed_detector import SpeedDetector
+from benchmarks.synthetic import SyntheticScene, SyntheticCamera, Vehicle
+
+def textured_frame(rect, blur=0, seed=0):
+    # Grey frame with a checkered "vehicle" in rect, optionally motion blurred
+    frame = np.full((120, 160, 3), 90, np.uint8)
+    x1, y1, x2, y2 = rect
+    pattern = (np.indices((y2 - y1, x2 - x1)).sum(axis=0) // 3 % 2 * 200 + 20).astype(np.uint8)
+    frame[y1:y2, x1:x2] = pattern[:, :, None]
+    if blur:
+        frame = cv2.blur(frame, (blur, 1))
+    return frame
+
+class TestEvidenceHistory(unittest.TestCase):
+    def test_selects_sharp_complete_frame(self):
+        history = EvidenceHistory(interval=0.0)
+        history.sample(textured_frame((0, 40, 50, 80)), 0.0, {1: (0, 40, 50, 80)})  # cut off by the edge
+        history.sample(textured_frame((60, 40, 110, 80)), 0.1, {1: (60, 40, 110, 80)})  # sharp
+        history.sample(textured_frame((100, 40, 150, 80), blur=15), 0.2, {1: (100, 40, 150, 80)})  # blurred
+
+        frame, crop, info = history.select(1)
+        self.assertEqual(info["rect"], [60, 40, 110, 80])
+        self.assertEqual(info["candidates"], 3)
+        self.assertEqual(crop.shape, (48, 60, 3))  # box plus 10% margin
+        self.assertEqual(frame.shape, (120, 160, 3))
+        self.assertIsNone(history.select(2))
+
+    def test_memory_cap_and_sharing(self):
+        frame = textured_frame((60, 40, 110, 80))
+        history = EvidenceHistory(max_bytes=3 * frame.nbytes, per_track=5, interval=0.0)
+        for i in range(10):
+            # Two tracks share each copy
+            history.sample(frame, float(i), {1: (60, 40, 110, 80), 2: (10, 10, 40, 40)})
+            self.assertLessEqual(history.bytes, history.max_bytes)
+        stats = history.stats()
+        self.assertEqual((stats["frames"], stats["samples"], stats["evicted"]), (3, 10, 7))
+        self.assertEqual(len(history.tracks[1]), 3)
+
+        history.forget(1)
+        self.assertEqual(len(history.frames), 3)  # still used by track 2
+        history.forget(2)
+        self.assertEqual((len(history.frames), history.bytes), (0, 0))
+
+    def test_interval(self):
+        history = EvidenceHistory(interval=0.1)
+        frame = textured_frame((60, 40, 110, 80))
+        for i in range(10):
+            history.sample(frame, i * 0.033, {1: (60, 40, 110, 80)})
+        self.assertEqual(history.samples, 3)
+
+class TestBestShotDetection(unittest.TestCase):
+    def run_scene(self, vehicles, **best_shot):
+        scene = SyntheticScene(640, 360, fps=30, duration=9.0, vehicles=vehicles, seed=2)
+        detector = SpeedDetector(scene.detector_config(best_shot=dict({"enabled": True}, **best_shot)))
+        camera = SyntheticCamera(scene)
+        events = []
+        camera.start()
+        while True:
+            frame = camera.get_frame()
+            if frame is None:
+                break
+            events.extend(detector.process_frame(frame, camera.timestamp)[1])
+        return detector, events
+
+    def test_event_uses_best_shot(self):
+        vehicles = [
+            Vehicle(0, 50.0, 4.5, 1.8, enter_time=1.0, direction="approaching"),
+            Vehicle(1, 80.0, 4.5, 1.8, enter_time=5.0, direction="receding"),
+        ]
+        detector, events = self.run_scene(vehicles, max_memory_mb=8)
+        self.assertEqual(len(events), 2)
+        stats = detector.evidence.stats()
+        # Scored only for the two events, and only their own samples
+        self.assertEqual(stats["selections"], 2)
+        self.assertEqual(stats["scored"], sum(e["evidence"]["candidates"] for e in events))
+        self.assertLessEqual(stats["peak_bytes"], 8 * 1024 * 1024)
+        # Nothing left once the tracks are done
+        self.assertEqual((stats["frames"], stats["tracks"]), (0, 0))
+        for event in events:
+            self.assertEqual(event["frame"].shape, (360, 640, 3))
+            self.assertLess(event["crop"].shape[0] * event["crop"].shape[1], 640 * 360)
+
+    def test_no_samples_without_traffic(self):
+        detector, events = self.run_scene([])
+        self.assertEqual(events, [])
+        self.assertEqual(detector.evidence.stats()["samples"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import shutil
+import os
+import io
+import csv
+import json
+import zipfile
+import numpy as np
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.storage_manager import StorageManager
+from src.core.export import export_events, export_images_zip, parse_time
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "tests/data_temp_export"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.sm = StorageManager(data_dir=self.test_dir, max_disk_usage=100)
+        frame = np.zeros((50, 50, 3), dtype=np.uint8)
+        # Ten events, one minute apart, with distinct speeds
+        self.base_ts = 1700000000.0
+        for i in range(10):
+            self.sm.save_event({
+                "speed": 30.0 + i,
+                "timestamp": self.base_ts + i * 60,
+                "object_id": i,
+                "frame": frame
+            })
+
+    def tearDown(self):
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_csv_time_range(self):
+        start = self.base_ts + 2 * 60
+        end = self.base_ts + 5 * 60
+        body = b"".join(export_events(self.sm, "csv", start, end, batch_size=2))
+
+        rows = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+        self.assertEqual([float(r["speed"]) for r in rows], [32.0, 33.0, 34.0])
+
+    def test_csv_empty_range_has_header(self):
+        body = b"".join(export_events(self.sm, "csv", start=0, end=1))
+        self.assertTrue(body.decode("utf-8").startswith("id,timestamp,speed"))
+
+    def test_ndjson_streams_in_batches(self):
+        chunks = list(export_events(self.sm, "ndjson", batch_size=3))
+        self.assertEqual(len(chunks), 4)
+
+        events = [json.loads(line) for line in b"".join(chunks).decode("utf-8").splitlines()]
+        self.assertEqual(len(events), 10)
+        self.assertEqual(events[0]["object_id"], 0)
+
+    @unittest.skipIf(pq is None, "pyarrow not installed")
+    def test_parquet(self):
+        body = b"".join(export_events(self.sm, "parquet", batch_size=4))
+        table = pq.read_table(io.BytesIO(body))
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(str(table.schema.field("speed").type), "double")
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export_events(self.sm, "xlsx")
+
+    def test_images_zip(self):
+        batches = self.sm.iter_event_batches(end=self.base_ts + 3 * 60, batch_size=2)
+        body = b"".join(export_images_zip(batches, self.sm.images_dir))
+
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            self.assertEqual(len(zf.namelist()), 3)
+            self.assertIsNone(zf.testzip())
+
+    def test_parse_time(self):
+        self.assertEqual(parse_time("1700000000"), 1700000000.0)
+        self.assertIsNone(parse_time(None))
+        self.assertIsInstance(parse_time("2024-01-01"), float)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import unittest
+import os
+import sys
+import numpy as np
+import cv2
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.governor import PerformanceGovernor, ThermalSource, SysfsThermal, build_levels
+from src.core.speed_detector import SpeedDetector, RunningAverageSubtractor
+from src.core.streaming import FrameBroadcaster, mjpeg_stream
+
+class FakeThermal(ThermalSource):
+    def __init__(self, value=None):
+        self.value = value
+
+    def read(self):
+        return self.value
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestGovernor(unittest.TestCase):
+    def make(self, **config):
+        self.thermal = FakeThermal(50.0)
+        self.cpu = 20.0
+        self.clock = FakeClock()
+        self.applied = []
+        config.setdefault("interval", 5.0)
+        governor = PerformanceGovernor(config, self.applied.append, thermal=self.thermal,
+                                       cpu=lambda: self.cpu, clock=self.clock)
+        governor.start()
+        return governor
+
+    def advance(self, governor, seconds=5.0):
+        self.clock.now += seconds
+        return governor.tick()
+
+    def test_levels_stay_within_bounds(self):
+        levels = build_levels({"max_fps": 30, "min_fps": 12, "min_stream_quality": 60, "min_detection_scale": 0.6})
+        self.assertEqual(levels[0], {"stream_quality": 95, "fps": 30, "engine": "mog2", "detection_scale": 1.0})
+        self.assertEqual(levels[-1], {"stream_quality": 60, "fps": 12, "engine": "running_average", "detection_scale": 0.6})
+        # One setting changes per level
+        for a, b in zip(levels, levels[1:]):
+            self.assertEqual(sum(a[k] != b[k] for k in a), 1)
+
+    def test_steps_down_when_hot_and_back_up_with_hysteresis(self):
+        governor = self.make(temp_high=75, temp_low=65, recover_samples=2)
+        self.assertEqual(self.applied, [governor.levels[0]])
+
+        # Nothing happens between samples
+        self.thermal.value = 80.0
+        self.assertIsNone(self.advance(governor, 1.0))
+        changes = self.advance(governor, 4.0)
+        self.assertEqual(changes, {"stream_quality": (95, 80)})
+        self.advance(governor)
+        self.assertEqual(governor.level, 2)
+
+        # Between the thresholds: hold
+        self.thermal.value = 70.0
+        for _ in range(3):
+            self.assertIsNone(self.advance(governor))
+        self.assertEqual(governor.level, 2)
+
+        # Cool: one level up per recover_samples calm samples
+        self.thermal.value = 60.0
+        self.assertIsNone(self.advance(governor))
+        self.assertIsNotNone(self.advance(governor))
+        self.assertEqual(governor.level, 1)
+
+        stats = governor.stats()
+        self.assertEqual(stats["adjustments"], 3)
+        self.assertEqual(stats["readings"]["temperature_c"], 60.0)
+        self.assertEqual([h["level"] for h in stats["history"]], [1, 2, 1])
+        self.assertEqual(self.applied[-1], governor.levels[1])
+
+    def test_cpu_and_lag_pressure(self):
+        governor = self.make(cpu_high=90, lag_high=0.02)
+        self.thermal.value = None  # no sensor
+
+        self.cpu = 95.0
+        self.advance(governor)
+        self.assertEqual(governor.level, 1)
+
+        self.cpu = 50.0
+        for _ in range(50):
+            governor.record_frame(0.1)  # 100ms per frame against a 33ms budget
+        self.assertIsNotNone(self.advance(governor))
+        self.assertEqual(governor.level, 2)
+        self.assertIn("lag", governor.history[-1]["reason"])
+
+    def test_stays_at_the_bottom(self):
+        governor = self.make()
+        self.thermal.value = 90.0
+        for _ in range(len(governor.levels) + 5):
+            self.advance(governor)
+        self.assertEqual(governor.level, len(governor.levels) - 1)
+        self.assertEqual(governor.stats()["adjustments"], len(governor.levels) - 1)
+
+    def test_sysfs_thermal(self):
+        path = "tests/thermal_temp"
+        try:
+            with open(path, "w") as f:
+                f.write("61234\n")
+            self.assertEqual(SysfsThermal(path).read(), 61.234)
+        finally:
+            os.remove(path)
+        self.assertIsNone(SysfsThermal("tests/does_not_exist").read())
+
+class TestPerformanceSettings(unittest.TestCase):
+    def test_detection_scale_maps_blobs_back_to_frame(self):
+        config = {"line1": [0, 100, 400, 100], "line2": [0, 300, 400, 300], "min_area": 1000}
+        results = {}
+        for scale in (1.0, 0.5):
+            detector = SpeedDetector(dict(config, detection_scale=scale))
+            detector.process_frame(np.zeros((400, 400, 3), np.uint8), 0.0)
+            frame = np.zeros((400, 400, 3), np.uint8)
+            cv2.rectangle(frame, (100, 150), (179, 249), (255, 255, 255), -1)
+            detector.process_frame(frame, 0.1)
+            results[scale] = list(detector.tracker.objects.values())
+        self.assertEqual(len(results[0.5]), 1)
+        np.testing.assert_allclose(results[0.5][0], results[1.0][0], atol=3)
+
+    def test_detection_scale_reuses_buffers(self):
+        detector = SpeedDetector({"line1": [0, 100, 400, 100], "line2": [0, 300, 400, 300], "detection_scale": 0.5})
+        frame = np.zeros((400, 400, 3), np.uint8)
+        for i in range(5):
+            detector.process_frame(frame, i * 0.1)
+        allocations = detector.scratch.allocations
+        for i in range(5, 50):
+            detector.process_frame(frame, i * 0.1)
+        self.assertEqual(detector.scratch.allocations, allocations)
+
+    def test_background_engine_switch(self):
+        detector = SpeedDetector({"min_area": 100})
+        detector.set_background_engine("running_average")
+        self.assertIsInstance(detector.fgbg, RunningAverageSubtractor)
+        with self.assertRaises(ValueError):
+            detector.set_background_engine("nope")
+
+    def test_running_average_foreground(self):
+        subtractor = RunningAverageSubtractor()
+        background = np.full((50, 50), 100, np.uint8)
+        self.assertFalse(subtractor.apply(background).any())
+        frame = background.copy()
+        frame[10:20, 10:20] = 200
+        mask = subtractor.apply(frame)
+        self.assertEqual(int(mask[15, 15]), 255)
+        self.assertEqual(int(mask[40, 40]), 0)
+
+    def test_stream_quality_cap(self):
+        broadcaster = FrameBroadcaster()
+        broadcaster.publish(np.zeros((100, 200, 3), np.uint8))
+        broadcaster.max_quality = 50
+        self.assertEqual(broadcaster.get_tier(None, 90).quality, 50)
+        self.assertEqual(broadcaster.get_tier(None, 30).quality, 30)
+        self.assertEqual(broadcaster.get_tier().quality, 50)
+
+    def test_quality_cap_applies_to_connected_streams(self):
+        broadcaster = FrameBroadcaster()
+        broadcaster.publish(np.zeros((100, 200, 3), np.uint8))
+        stream = mjpeg_stream(broadcaster, quality=90)
+        next(stream)
+        self.assertEqual(broadcaster.get_tier(None, 90).clients, 1)
+
+        broadcaster.max_quality = 50
+        broadcaster.publish(np.zeros((100, 200, 3), np.uint8))
+        next(stream)
+        capped = broadcaster.tiers[(None, 50)]
+        self.assertEqual((capped.clients, capped.frames_encoded), (1, 1))
+        self.assertEqual(broadcaster.tiers[(None, 90)].clients, 0)
+
+        # Restored when the governor lifts the cap
+        broadcaster.max_quality = None
+        broadcaster.publish(np.zeros((100, 200, 3), np.uint8))
+        next(stream)
+        self.assertEqual((broadcaster.tiers[(None, 90)].clients, capped.clients), (1, 0))
+        stream.close()
+        self.assertEqual(broadcaster.tiers[(None, 90)].clients, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import os
+import sys
+import numpy as np
+from unittest.mock import patch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.notifications import NotificationManager, AttachmentCache
+
+CONFIG = {
+    "enabled": True,
+    "telegram": {"enabled": True, "bot_token": "token", "chat_id": "chat"},
+    "pushover": {"enabled": True, "user_key": "user", "api_token": "api"},
+    "webhook": {"enabled": False, "url": ""},
+}
+
+class TestAttachmentCache(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frame = rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+
+    def test_variants_are_cached(self):
+        cache = AttachmentCache(self.frame)
+        a = cache.get(max_dim=1280, quality=80)
+        b = cache.get(max_dim=1280, quality=80)
+        self.assertIs(a, b)
+        self.assertEqual(cache.encodes, 1)
+
+    def test_size_cap(self):
+        cache = AttachmentCache(self.frame)
+        data = cache.get(max_dim=1920, quality=95, max_bytes=200 * 1024)
+        self.assertLessEqual(len(data), 200 * 1024)
+
+class TestNotificationManager(unittest.TestCase):
+    @patch('builtins.open')
+    @patch('src.core.notifications.requests.post')
+    def test_channels_share_one_encode_without_disk_reads(self, mock_post, mock_open):
+        frame = np.zeros((720, 1280, 3), dtype=np.uint8)
+        manager = NotificationManager(CONFIG)
+
+        with patch('src.core.notifications.cv2.imencode', wraps=__import__('cv2').imencode) as mock_encode:
+            manager.notify("Speed Violation!", frame=frame)
+            self.assertEqual(mock_encode.call_count, 1)
+
+        mock_open.assert_not_called()
+        uploads = [c for c in mock_post.call_args_list if c.kwargs.get("files")]
+        self.assertEqual(len(uploads), 2)
+        photo = uploads[0].kwargs["files"]["photo"][1]
+        attachment = uploads[1].kwargs["files"]["attachment"][1]
+        self.assertIs(photo, attachment)
+
+    @patch('src.core.notifications.requests.post')
+    def test_notify_without_frame(self, mock_post):
+        NotificationManager(CONFIG).notify("Speed Violation!")
+        self.assertTrue(all(not c.kwargs.get("files") for c in mock_post.call_args_list))
+
+if __name__ == '__main__':
+    unittest.main()
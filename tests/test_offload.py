@@ -0,0 +1,171 @@
+import unittest
+import os
+import sys
+import socket
+import tempfile
+import threading
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.offload import OffloadClient, DetectionWorker, parse_address, send_message, recv_message
+from src.core.buffer_pool import BufferPool
+from benchmarks.synthetic import SyntheticScene, SyntheticCamera, Vehicle
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def two_car_scene():
+    vehicles = [
+        Vehicle(0, 50.0, 4.5, 1.8, enter_time=1.0, direction="approaching"),
+        Vehicle(1, 80.0, 4.5, 1.8, enter_time=5.0, direction="receding"),
+    ]
+    return SyntheticScene(640, 360, fps=30, duration=9.0, vehicles=vehicles, seed=2)
+
+class TestOffload(unittest.TestCase):
+    def setUp(self):
+        self.workers = []
+        self.clients = []
+
+    def tearDown(self):
+        for client in self.clients:
+            client.stop()
+        for worker in self.workers:
+            worker.stop()
+
+    def start_worker(self, address="tcp://127.0.0.1:0"):
+        worker = DetectionWorker(address)
+        worker.start()
+        self.workers.append(worker)
+        return worker
+
+    def start_client(self, address, **kwargs):
+        kwargs.setdefault("retry_min", 0.05)
+        kwargs.setdefault("retry_max", 0.2)
+        client = OffloadClient(address, **kwargs)
+        client.start()
+        self.clients.append(client)
+        self.assertTrue(client.wait_connected(5.0))
+        return client
+
+    def run_scene(self, client, scene):
+        # Feeds every frame, waiting for room in the window, and collects events
+        camera = SyntheticCamera(scene)
+        pool = BufferPool()
+        events = []
+        camera.start()
+        while True:
+            frame = camera.get_frame()
+            if frame is None:
+                break
+            buf = pool.acquire(frame.shape)
+            buf.array[...] = frame
+            self.assertTrue(wait_for(lambda: len(client.in_flight) < client.max_in_flight))
+            self.assertTrue(client.submit(buf.array, camera.timestamp, buffer=buf))
+            buf.release()
+            for evs, event_buf in client.poll():
+                self.assertIsNotNone(event_buf.array)
+                events.extend(evs)
+                event_buf.release()
+        self.assertTrue(wait_for(lambda: not client.in_flight))
+        for evs, event_buf in client.poll():
+            events.extend(evs)
+            event_buf.release()
+        self.assertEqual(pool.stats()["in_use"], 0)
+        return events
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("tcp://10.0.0.2:7070"), (socket.AF_INET, ("10.0.0.2", 7070)))
+        self.assertEqual(parse_address("localhost:7070"), (socket.AF_INET, ("localhost", 7070)))
+        self.assertEqual(parse_address("unix:///tmp/w.sock"), (socket.AF_UNIX, "/tmp/w.sock"))
+        with self.assertRaises(ValueError):
+            parse_address("tcp://nohost")
+
+    def test_events_over_tcp(self):
+        scene = two_car_scene()
+        worker = self.start_worker()
+        client = self.start_client(worker.bound_address, detection_config=scene.detector_config(), max_in_flight=2)
+
+        events = self.run_scene(client, scene)
+        self.assertEqual(sorted(e["direction"] for e in events), ["approaching", "receding"])
+        speeds = sorted(e["speed"] for e in events)
+        self.assertAlmostEqual(speeds[0], 50.0, delta=5.0)
+        self.assertAlmostEqual(speeds[1], 80.0, delta=8.0)
+        self.assertEqual(client.stats()["completed"], scene.frame_count)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "no unix sockets")
+    def test_events_over_unix_socket(self):
+        scene = two_car_scene()
+        with tempfile.TemporaryDirectory() as tmp:
+            address = f"unix://{os.path.join(tmp, 'worker.sock')}"
+            self.start_worker(address)
+            client = self.start_client(address, detection_config=scene.detector_config())
+            events = self.run_scene(client, scene)
+        self.assertEqual(len(events), 2)
+
+    def test_back_pressure_drops_instead_of_queueing(self):
+        # A worker that accepts but never answers
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        accepted = []
+        threading.Thread(target=lambda: accepted.append(server.accept()), daemon=True).start()
+        try:
+            client = self.start_client("tcp://127.0.0.1:%d" % server.getsockname()[1], max_in_flight=3)
+            pool = BufferPool()
+            frame = np.zeros((90, 160, 3), np.uint8)
+            results = []
+            for i in range(10):
+                buf = pool.acquire(frame.shape)
+                results.append(client.submit(frame, float(i), buffer=buf))
+                buf.release()
+
+            self.assertEqual(results, [True] * 3 + [False] * 7)
+            stats = client.stats()
+            self.assertEqual((stats["sent"], stats["dropped"], stats["in_flight"]), (3, 7, 3))
+            # Only the unanswered frames hold buffers
+            self.assertEqual(pool.stats()["in_use"], 3)
+
+            client.stop()
+            self.assertEqual(pool.stats()["in_use"], 0)
+        finally:
+            for conn, _ in accepted:
+                conn.close()
+            server.close()
+
+    def test_reconnects_after_worker_restart(self):
+        scene = two_car_scene()
+        worker = self.start_worker()
+        address = worker.bound_address
+        client = self.start_client(address, detection_config=scene.detector_config())
+
+        worker.stop()
+        self.assertTrue(wait_for(lambda: not client.connected.is_set()))
+        self.assertFalse(client.submit(np.zeros((10, 10, 3), np.uint8), 0.0))
+
+        # Same port again; the client finds it and sends its config again
+        self.start_worker(address)
+        self.assertTrue(client.wait_connected(5.0))
+        self.assertEqual(client.stats()["connects"], 2)
+        events = self.run_scene(client, scene)
+        self.assertEqual(len(events), 2)
+
+    def test_frame_before_hello_is_answered(self):
+        worker = self.start_worker()
+        family, addr = parse_address(worker.bound_address)
+        sock = socket.create_connection(addr, timeout=5.0)
+        try:
+            send_message(sock, {"type": "frame", "seq": 7, "timestamp": 1.0}, b"not a jpeg")
+            header, _ = recv_message(sock)
+            self.assertEqual((header["type"], header["seq"], header["events"]), ("result", 7, []))
+        finally:
+            sock.close()
+
+if __name__ == '__main__':
+    unittest.main()
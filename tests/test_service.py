@@ -0,0 +1,112 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import yaml
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.app.service import SpeedCameraService
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+class TestService(unittest.TestCase):
+    # The real service on the sample video, in a temporary working directory
+    # (data/ is relative)
+    def setUp(self):
+        self.make_service()
+
+    def make_service(self, **overrides):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        with open(os.path.join(ROOT, "config", "config.yaml")) as f:
+            config = yaml.safe_load(f)
+        config["camera"]["device_id"] = os.path.join(ROOT, "dummy.mp4")
+        config["camera"]["stale_seconds"] = 0.3
+        config["governor"]["enabled"] = False
+        config["detection"]["warm_start"]["enabled"] = False
+        config["notifications"]["enabled"] = False
+        for section, values in overrides.items():
+            config[section].update(values)
+        config_path = os.path.join(self.tmp.name, "config.yaml")
+        with open(config_path, "w") as f:
+            yaml.dump(config, f)
+        os.chdir(self.tmp.name)
+        self.service = SpeedCameraService(config_path)
+
+    def tearDown(self):
+        self.service.stop()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_ready_once_frames_flow(self):
+        self.assertEqual(self.service.status()["state"], "stopped")
+        self.service.start()
+        self.assertTrue(wait_for(lambda: self.service.status()["ready"]))
+        self.assertIsNotNone(self.service.status()["frame_age_seconds"])
+
+    def test_stalled_camera(self):
+        self.service.start()
+        self.assertTrue(wait_for(lambda: self.service.status()["ready"]))
+        self.service.camera.read_buffer = lambda pool: None
+        self.assertTrue(wait_for(lambda: self.service.status()["state"] == "stalled"))
+        self.assertFalse(self.service.status()["ready"])
+
+    def test_dead_loop_is_not_ready(self):
+        def broken_loop():
+            raise RuntimeError("boom")
+        self.service.run_loop = broken_loop
+        self.service.start()
+        self.assertTrue(wait_for(lambda: self.service.status()["state"] == "failed"))
+        self.assertIn("boom", self.service.status()["error"])
+
+    def test_failed_event_does_not_stop_capture(self):
+        self.service.start()
+        self.assertTrue(wait_for(lambda: self.service.status()["ready"]))
+
+        def disk_full(event):
+            raise IOError("No space left on device")
+        self.service.storage.save_event = disk_full
+        stored = len(self.service.calibration_events)
+        event = {"speed": 60.0, "timestamp": time.time(), "object_id": 1, "zone_id": "default",
+                 "frame": np.zeros((10, 10, 3), np.uint8)}
+        self.service.handle_event(event)  # logged, not raised
+        self.assertEqual(len(self.service.calibration_events), stored)
+
+        process_frame = self.service.detector.process_frame
+        calls = []
+        def fails_once(frame, timestamp):
+            calls.append(timestamp)
+            if len(calls) == 1:
+                raise RuntimeError("bad frame")
+            return process_frame(frame, timestamp)
+        self.service.detector.process_frame = fails_once
+        self.assertTrue(wait_for(lambda: len(calls) > 5))
+        self.assertTrue(self.service.thread.is_alive())
+        self.assertTrue(self.service.status()["ready"])
+
+    def test_governor_keeps_configured_engine_and_rate(self):
+        self.service.stop()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+        self.make_service(governor={"enabled": True, "engines": ["mog2", "running_average"]},
+                          detection={"background_engine": "running_average"})
+        self.service.start()
+        self.assertTrue(wait_for(lambda: self.service.status()["ready"]))
+        self.assertEqual(self.service.detector.background_engine, "running_average")
+        self.assertEqual({level["engine"] for level in self.service.governor.levels}, {"running_average"})
+        # Level 0 processes every frame
+        self.assertIsNone(self.service.detect_fps)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import cv2
 import numpy as np
 import time
 import sys
+from unittest import mock
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -42,5 +43,154 @@ class TestStorageManager(unittest.TestCase):
         self.assertEqual(len(events), 1)
         self.assertEqual(events[0]["speed"], 50.5)
 
+    def test_same_second_same_speed_do_not_collide(self):
+        sm = StorageManager(data_dir=self.test_dir, max_disk_usage=90)
+        ts = time.mktime((2024, 5, 17, 14, 3, 9, 0, 0, -1))
+        frame = np.zeros((50, 50, 3), dtype=np.uint8)
+
+        paths = [sm.save_event({"speed": 50.0, "timestamp": ts, "object_id": i, "frame": frame}) for i in range(3)]
+        self.assertEqual(len(set(paths)), 3)
+        for path in paths:
+            self.assertTrue(os.path.exists(path))
+            rel = os.path.relpath(path, sm.images_dir).replace(os.sep, "/")
+            self.assertTrue(rel.startswith("2024/05/17/"), rel)
+            self.assertTrue(rel.endswith("_14-03-09_50kmh.jpg"), rel)
+
+        stored = sorted(e["image_path"] for e in sm.get_events())
+        self.assertEqual(stored, sorted(os.path.relpath(p, sm.images_dir).replace(os.sep, "/") for p in paths))
+
+    def test_migrate_flat_images(self):
+        import sqlite3
+        sm = StorageManager(data_dir=self.test_dir, max_disk_usage=90)
+        ts = time.mktime((2023, 12, 31, 23, 59, 58, 0, 0, -1))
+
+        # Two rows in the old flat layout, one of them without a file
+        conn = sqlite3.connect(sm.db_path)
+        for name in ("2023-12-31_23-59-58_42kmh.jpg", "gone.jpg"):
+            conn.execute("INSERT INTO events (timestamp, speed, image_path, object_id) VALUES (?, ?, ?, ?)",
+                         (ts, 42.0, name, 1))
+        conn.commit()
+        conn.close()
+        cv2.imwrite(os.path.join(sm.images_dir, "2023-12-31_23-59-58_42kmh.jpg"), np.zeros((10, 10, 3), np.uint8))
+
+        result = sm.migrate_flat_images(batch_size=1)
+        self.assertEqual(result, {"migrated": 1, "missing": 1})
+
+        paths = {e["image_path"] for e in sm.get_events()}
+        self.assertIn("gone.jpg", paths)
+        moved = [p for p in paths if p != "gone.jpg"][0]
+        self.assertTrue(moved.startswith("2023/12/31/"))
+        self.assertTrue(os.path.exists(os.path.join(sm.images_dir, moved)))
+        self.assertFalse(os.path.exists(os.path.join(sm.images_dir, "2023-12-31_23-59-58_42kmh.jpg")))
+
+        # Re-running is a no-op
+        self.assertEqual(sm.migrate_flat_images()["migrated"], 0)
+
+    def test_cleanup_prunes_empty_date_dirs(self):
+        sm = StorageManager(data_dir=self.test_dir, max_disk_usage=90)
+        ts = time.mktime((2022, 1, 2, 3, 4, 5, 0, 0, -1))
+        path = sm.save_event({"speed": 30.0, "timestamp": ts, "object_id": 1,
+                              "frame": np.zeros((10, 10, 3), np.uint8), "crop": np.zeros((4, 4, 3), np.uint8)})
+        crop = os.path.join(sm.images_dir, sm.get_events()[0]["crop_path"])
+        self.assertEqual(crop, path[:-len(".jpg")] + "_crop.jpg")
+        self.assertTrue(os.path.exists(crop))
+        sm.cleanup_old_events()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(crop))
+        self.assertFalse(os.path.exists(os.path.join(sm.images_dir, "2022")))
+        self.assertTrue(os.path.isdir(sm.images_dir))
+
+    def test_zone_id_and_stats(self):
+        import sqlite3
+        # Database from before zones: no zone_id column yet
+        conn = sqlite3.connect(os.path.join(self.test_dir, "speed_cam.db"))
+        conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL, speed REAL, image_path TEXT, object_id INTEGER)")
+        conn.execute("INSERT INTO events (timestamp, speed, image_path, object_id) VALUES (1.0, 30.0, NULL, 1)")
+        conn.commit()
+        conn.close()
+
+        sm = StorageManager(data_dir=self.test_dir, max_disk_usage=90)
+        frame = np.zeros((10, 10, 3), np.uint8)
+        for zone, speed in (("lane1", 40.0), ("lane1", 60.0), ("lane2", 80.0)):
+            sm.save_event({"speed": speed, "timestamp": time.time(), "object_id": 1, "frame": frame, "zone_id": zone})
+
+        self.assertEqual([e["speed"] for e in sm.get_events(zone_id="lane1")], [60.0, 40.0])
+        stats = {row["zone_id"]: row for row in sm.zone_stats()}
+        self.assertEqual(stats[None]["count"], 1)
+        self.assertEqual(stats["lane1"]["count"], 2)
+        self.assertEqual(stats["lane1"]["avg_speed"], 50.0)
+        self.assertEqual(stats["lane2"]["max_speed"], 80.0)
+        self.assertEqual(len(sm.zone_stats(start=2.0)), 2)
+
+    def test_recompute_speeds(self):
+        sm = StorageManager(data_dir=self.test_dir, max_disk_usage=90)
+        v1 = sm.register_calibration({"zones": [{"id": "lane1", "real_distance_meters": 5.0}]})
+        self.assertEqual(sm.register_calibration({"zones": [{"real_distance_meters": 5.0, "id": "lane1"}]}), v1)
+        v2 = sm.register_calibration({"zones": [{"id": "lane1", "real_distance_meters": 6.0}]})
+        self.assertNotEqual(v1, v2)
+
+        frame = np.zeros((10, 10, 3), np.uint8)
+        paths = []
+        for i, (zone, time_diff) in enumerate((("lane1", 0.5), ("lane1", 0.25), ("lane2", 0.5))):
+            paths.append(sm.save_event({"speed": round(5.0 / time_diff * 3.6, 2), "timestamp": 100.0 + i,
+                                        "object_id": i, "frame": frame, "zone_id": zone, "time_diff": time_diff,
+                                        "distance_m": 5.0, "calibration_version": v1}))
+        # Stored before timing was kept
+        sm.save_event({"speed": 50.0, "timestamp": 99.0, "object_id": 9, "frame": frame, "zone_id": "lane1"})
+
+        result = sm.recompute_speeds({"lane1": 6.0}, v2)
+        self.assertEqual(result, {"updated": 2, "skipped": 1})
+        events = {e["object_id"]: e for e in sm.get_events()}
+        self.assertEqual(events[0]["speed"], 43.2)
+        self.assertEqual(events[1]["speed"], 86.4)
+        self.assertEqual((events[0]["distance_m"], events[0]["calibration_version"]), (6.0, v2))
+        self.assertEqual((events[2]["speed"], events[2]["calibration_version"]), (36.0, v1))
+        self.assertEqual(events[9]["speed"], 50.0)
+        self.assertEqual({row["zone_id"]: row["max_speed"] for row in sm.zone_stats()}["lane1"], 86.4)
+        # Images and their paths are untouched
+        self.assertTrue(all(os.path.exists(p) for p in paths))
+
+        # Filters: time range and version
+        self.assertEqual(sm.recompute_speeds(5.0, start=101.0)["updated"], 2)
+        self.assertEqual(sm.recompute_speeds(4.0, from_version=v1)["updated"], 1)
+        self.assertEqual([c["version"] for c in sm.get_calibrations()], [v1, v2])
+
+    def test_failed_write_rolls_back_and_runs_cleanup(self):
+        sm = StorageManager(data_dir=self.test_dir, max_disk_usage=90)
+        event = {"speed": 50.0, "timestamp": time.time(), "object_id": 1, "frame": np.zeros((100, 100, 3), np.uint8)}
+        with mock.patch("src.core.storage_manager.cv2.imwrite", return_value=False), \
+                mock.patch.object(sm, "check_disk_usage") as check_disk_usage:
+            with self.assertRaises(IOError):
+                sm.save_event(event)
+        check_disk_usage.assert_called_once()
+        self.assertEqual(sm.get_events(), [])
+
+    def test_failed_crop_write_is_not_fatal(self):
+        sm = StorageManager(data_dir=self.test_dir, max_disk_usage=90)
+        event = {"speed": 50.0, "timestamp": time.time(), "object_id": 1,
+                 "frame": np.zeros((100, 100, 3), np.uint8), "crop": np.zeros((20, 20, 3), np.uint8)}
+        imwrite = cv2.imwrite
+        with mock.patch("src.core.storage_manager.cv2.imwrite",
+                        side_effect=lambda path, *args: not path.endswith("_crop.jpg") and imwrite(path, *args)):
+            path = sm.save_event(event)
+        self.assertTrue(os.path.exists(path))
+        self.assertIsNone(sm.get_events()[0]["crop_path"])
+
+    def test_failed_save_leaves_no_images(self):
+        sm = StorageManager(data_dir=self.test_dir, max_disk_usage=90)
+        event = {"speed": 50.0, "timestamp": time.time(), "object_id": 1,
+                 "frame": np.zeros((100, 100, 3), np.uint8), "crop": np.zeros((20, 20, 3), np.uint8)}
+        imwrite = cv2.imwrite
+        def crop_raises(path, *args):
+            if path.endswith("_crop.jpg"):
+                raise OSError("disk gone")
+            return imwrite(path, *args)
+        with mock.patch("src.core.storage_manager.cv2.imwrite", side_effect=crop_raises):
+            with self.assertRaises(OSError):
+                sm.save_event(event)
+        self.assertEqual(sm.get_events(), [])
+        images = [f for _, _, files in os.walk(sm.images_dir) for f in files]
+        self.assertEqual(images, [])
+
 if __name__ == '__main__':
     unittest.main()
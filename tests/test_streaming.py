@@ -0,0 +1,87 @@
+import unittest
+import threading
+import time
+import os
+import sys
+import numpy as np
+import cv2
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.streaming import FrameBroadcaster, mjpeg_stream, snap_tier
+
+class TestFrameBroadcaster(unittest.TestCase):
+    def setUp(self):
+        self.broadcaster = FrameBroadcaster()
+        self.frame = np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+        self.broadcaster.publish(self.frame)
+
+    def test_snap_tier(self):
+        self.assertEqual(snap_tier(650, 58, source_width=1280), (640, 60))
+        self.assertEqual(snap_tier(1920, None, source_width=1280), (None, 95))
+        self.assertEqual(snap_tier(), (None, 95))
+
+    def test_tier_encodes_once_per_frame(self):
+        tier = self.broadcaster.get_tier(width=640, quality=60)
+        self.assertIs(tier, self.broadcaster.get_tier(width=600, quality=62))
+
+        _, jpeg1 = self.broadcaster.get_jpeg(tier)
+        _, jpeg2 = self.broadcaster.get_jpeg(tier)
+        self.assertIs(jpeg1, jpeg2)
+        self.assertEqual(tier.frames_encoded, 1)
+
+        decoded = cv2.imdecode(np.frombuffer(jpeg1, np.uint8), cv2.IMREAD_COLOR)
+        self.assertEqual(decoded.shape[:2], (360, 640))
+
+        self.broadcaster.publish(self.frame)
+        self.broadcaster.get_jpeg(tier)
+        self.assertEqual(tier.frames_encoded, 2)
+
+    def test_snapshot_etag_changes_with_frame(self):
+        tier = self.broadcaster.get_tier(width=320)
+        etag1, ts1, jpeg1 = self.broadcaster.get_snapshot(tier)
+        etag2, _, jpeg2 = self.broadcaster.get_snapshot(tier)
+        self.assertEqual(etag1, etag2)
+        self.assertIs(jpeg1, jpeg2)
+
+        self.broadcaster.publish(self.frame)
+        etag3, ts3, _ = self.broadcaster.get_snapshot(tier)
+        self.assertNotEqual(etag1, etag3)
+        self.assertGreaterEqual(ts3, ts1)
+        self.assertEqual(tier.frames_encoded, 2)
+
+        # Other variants of the same frame get their own ETag
+        etag4, _, _ = self.broadcaster.get_snapshot(self.broadcaster.get_tier(quality=50))
+        self.assertNotEqual(etag3, etag4)
+
+    def test_snapshot_without_frame(self):
+        empty = FrameBroadcaster()
+        self.assertIsNone(empty.get_snapshot(empty.get_tier()))
+
+    def test_wait_for_frame(self):
+        self.assertIsNone(self.broadcaster.wait_for_frame(1, timeout=0.01))
+        threading.Timer(0.05, self.broadcaster.publish, [self.frame]).start()
+        self.assertEqual(self.broadcaster.wait_for_frame(1, timeout=1.0), 2)
+
+    def test_stream_slows_down_when_writes_block(self):
+        stream = mjpeg_stream(self.broadcaster, width=320, quality=50, max_fps=20)
+        tier = self.broadcaster.get_tier(width=320, quality=50)
+
+        next(stream)
+        self.assertEqual(tier.stats()["clients"], 1)
+
+        # Simulate a slow socket: the consumer takes a long time between pulls
+        publisher = threading.Thread(target=lambda: [self.broadcaster.publish(self.frame) or time.sleep(0.01) for _ in range(60)])
+        publisher.start()
+        time.sleep(0.2)
+        next(stream)
+        frame_locals = stream.gi_frame.f_locals
+        self.assertLess(frame_locals["fps"], 20)
+        publisher.join()
+
+        stream.close()
+        self.assertEqual(tier.stats()["clients"], 0)
+        self.assertGreater(tier.stats()["bytes_sent"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import sys
+import shutil
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.speed_detector import SpeedDetector
+from src.core.trace import TraceWriter, read_trace, replay, trace_segments
+from benchmarks.synthetic import SyntheticScene, SyntheticCamera, Vehicle
+
+def record_scene(scene, directory, **writer_args):
+    # Live detection with tracing on; returns the live events
+    detector = SpeedDetector(scene.detector_config())
+    detector.trace = TraceWriter(directory, **writer_args)
+    camera = SyntheticCamera(scene, start_time=1700000000.0)
+    events = []
+    camera.start()
+    while True:
+        frame = camera.get_frame()
+        if frame is None:
+            break
+        events.extend(detector.process_frame(frame, camera.timestamp)[1])
+    detector.trace.close()
+    return events
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "tests/trace_temp"
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_round_trip_and_empty_runs(self):
+        writer = TraceWriter(self.test_dir)
+        empty = np.zeros((0, 4), np.int32)
+        for i in range(100):
+            writer.append(1000.0 + i, empty, np.zeros((0, 2), np.int32))
+        writer.append(1100.0, np.array([[1, 2, 30, 40], [-5, 0, 10, 10]], np.int32), np.array([[15, 20], [2, 5]], np.int32))
+        writer.append(1101.0, empty, np.zeros((0, 2), np.int32))
+        writer.close()
+
+        paths = trace_segments(self.test_dir)
+        self.assertEqual(len(paths), 1)
+        records = list(read_trace(paths[0]))
+        self.assertEqual([(ts, n) for ts, _, n in records], [(1099.0, 100), (1100.0, 0), (1101.0, 1)])
+        self.assertEqual(records[1][1].tolist(), [[1, 2, 30, 40, 15, 20], [-5, 0, 10, 10, 2, 5]])
+        # 100 empty frames cost one record
+        self.assertEqual(os.path.getsize(paths[0]), 8 + 12 + (12 + 24) + 12)
+
+    def test_replay_matches_live_and_recalibrates(self):
+        vehicles = [
+            Vehicle(0, 50.0, 4.5, 1.8, enter_time=1.0, direction="approaching"),
+            Vehicle(1, 80.0, 4.5, 1.8, enter_time=5.0, direction="receding"),
+        ]
+        scene = SyntheticScene(640, 360, fps=30, duration=9.0, vehicles=vehicles, seed=2)
+        live = record_scene(scene, self.test_dir)
+        self.assertEqual(len(live), 2)
+
+        paths = trace_segments(self.test_dir)
+        events, frames = replay(SpeedDetector(scene.detector_config()), paths)
+        self.assertEqual(frames, scene.frame_count)
+        self.assertEqual([(e["speed"], e["direction"], e["timestamp"]) for e in events],
+                         [(e["speed"], e["direction"], e["timestamp"]) for e in live])
+
+        # Corrected distance: same crossings, scaled speeds
+        events, _ = replay(SpeedDetector(scene.detector_config(real_distance_meters=scene.distance_m * 1.1)), paths)
+        for new, old in zip(events, live):
+            self.assertAlmostEqual(new["speed"], old["speed"] * 1.1, delta=0.05)
+
+        # Time range: only the second car
+        events, _ = replay(SpeedDetector(scene.detector_config()), paths, start=1700000004.0)
+        self.assertEqual([e["direction"] for e in events], ["receding"])
+
+    def test_rotation_stays_within_budget(self):
+        writer = TraceWriter(self.test_dir, max_bytes=4000, segment_bytes=1000, flush_bytes=1)
+        rects = np.array([[0, 0, 10, 10]], np.int32)
+        centroids = np.array([[5, 5]], np.int32)
+        for i in range(1000):
+            writer.append(1700000000.0 + i, rects, centroids)
+        writer.close()
+
+        paths = trace_segments(self.test_dir)
+        total = sum(os.path.getsize(p) for p in paths)
+        self.assertLessEqual(total, 4000)
+        self.assertGreater(writer.deleted, 0)
+        # What is left is the most recent part, in order
+        timestamps = [ts for p in paths for ts, _, _ in read_trace(p)]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(timestamps[-1], 1700000999.0)
+
+if __name__ == '__main__':
+    unittest.main()
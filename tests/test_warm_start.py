@@ -0,0 +1,96 @@
+import unittest
+import os
+import sys
+import shutil
+import cv2
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.background import load_background, save_background
+from src.core.speed_detector import SpeedDetector, RunningAverageSubtractor
+from benchmarks.synthetic import SyntheticScene, Vehicle
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "tests/warm_start_temp"
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+        # One vehicle early (learned around), one in view at the restart
+        vehicles = [
+            Vehicle(0, 50.0, 4.5, 1.8, enter_time=1.0, direction="approaching"),
+            Vehicle(1, 40.0, 4.5, 1.8, enter_time=11.0, direction="receding"),
+        ]
+        self.scene = SyntheticScene(640, 360, fps=30, duration=16.0, vehicles=vehicles, seed=2)
+        self.restart = 13 * 30
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def learned(self, engine="mog2", frames=300):
+        detector = SpeedDetector(self.scene.detector_config(background_engine=engine))
+        for i in range(frames):
+            frame, t = self.scene.render(i)
+            detector.process_frame(frame, t)
+        return detector
+
+    def coverage(self, detector, frames=10):
+        # Foreground share of the vehicle box after `frames` frames from the restart
+        for i in range(self.restart, self.restart + frames):
+            frame, t = self.scene.render(i)
+            detector.process_frame(frame, t)
+        x1, y1, x2, y2 = self.scene.vehicle_box(self.scene.vehicles[1], t)
+        return (detector.scratch.get("mask")[max(y1, 0):y2, x1:x2] > 0).mean()
+
+    def test_snapshot_round_trip(self):
+        path = os.path.join(self.test_dir, "background.npz")
+        self.assertIsNone(load_background(path))
+        save_background(path, self.learned("running_average", 30).background_state())
+        snapshot = load_background(path)
+        self.assertEqual(snapshot["engine"], "running_average")
+        self.assertEqual(snapshot["image"].shape, (360, 640))
+        self.assertEqual(snapshot["state"].dtype, np.float32)
+        self.assertIsNone(load_background(path, max_age=-1))
+
+        with open(path, "wb") as f:
+            f.write(b"not a snapshot")
+        self.assertIsNone(load_background(path))
+
+    def test_warm_start_detects_vehicles_in_view(self):
+        snapshot = self.learned().background_state()
+
+        cold = SpeedDetector(self.scene.detector_config())
+        # A cold MOG2 takes the vehicle in the first frame for background
+        self.assertLess(self.coverage(cold), 0.5)
+
+        warm = SpeedDetector(self.scene.detector_config())
+        warm.background_seed = snapshot
+        self.assertGreater(self.coverage(warm), 0.8)
+        self.assertEqual(warm.warm_starts, 1)
+
+    def test_stale_seed_is_rejected(self):
+        snapshot = self.learned(frames=30).background_state()
+        snapshot["image"] = cv2.add(snapshot["image"], 60)  # e.g. taken in daylight, now dusk
+        detector = SpeedDetector(self.scene.detector_config())
+        detector.background_seed = snapshot
+        frame, t = self.scene.render(0)
+        detector.process_frame(frame, t)
+        self.assertEqual((detector.warm_starts, detector.rejected_seeds), (0, 1))
+
+    def test_engine_and_scale_changes_keep_the_background(self):
+        detector = self.learned(frames=60)
+        background = detector.background_image().copy()
+
+        detector.set_background_engine("running_average")
+        frame, t = self.scene.render(60)
+        detector.process_frame(frame, t)
+        self.assertIsInstance(detector.fgbg, RunningAverageSubtractor)
+        self.assertEqual(detector.warm_starts, 1)
+        self.assertLess(cv2.absdiff(detector.background_image(), background).mean(), 2.0)
+
+        detector.set_detection_scale(0.5)
+        detector.process_frame(self.scene.render(61)[0], t + 1 / 30)
+        self.assertEqual(detector.warm_starts, 2)
+        self.assertEqual(detector.background_image().shape, (180, 320))
+
+if __name__ == '__main__':
+    unittest.main()
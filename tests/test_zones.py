@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.zones import Zone, ZoneIndex, zones_from_config
+from src.core.speed_detector import SpeedDetector
+from src.core.dedup import EventDeduplicator
+from benchmarks.synthetic import SyntheticScene, SyntheticCamera, Vehicle
+
+class TestZones(unittest.TestCase):
+    def test_top_level_lines_are_the_default_zone(self):
+        zones = zones_from_config({"line1": [0, 10, 100, 10], "line2": [0, 90, 100, 90],
+                                   "real_distance_meters": 7.0, "direction": "receding"})
+        self.assertEqual(len(zones), 1)
+        self.assertEqual(zones[0].id, "default")
+        self.assertEqual(zones[0].real_distance, 7.0)
+        self.assertFalse(zones[0].accepts(1))
+        self.assertTrue(zones[0].accepts(2))
+
+    def test_zone_entries_fall_back_to_top_level(self):
+        zones = zones_from_config({
+            "real_distance_meters": 6.0,
+            "zones": [{"id": "a", "line1": [0, 0, 10, 0], "line2": [0, 10, 10, 10]}, {"id": "b", "direction": "approaching"}],
+        })
+        self.assertEqual([z.id for z in zones], ["a", "b"])
+        self.assertEqual(zones[1].real_distance, 6.0)
+        self.assertEqual(zones[1].direction, "approaching")
+
+        with self.assertRaises(ValueError):
+            zones_from_config({"zones": [{"id": "a"}, {"id": "a"}]})
+
+    def test_index_only_returns_overlapping_zones(self):
+        # 20 lanes of 50px side by side
+        zones = [Zone(f"lane{i}", [i * 50, 100, i * 50 + 49, 100], [i * 50, 300, i * 50 + 49, 300]) for i in range(20)]
+        index = ZoneIndex(zones, cell_size=32)
+
+        self.assertEqual([z.id for z in index.query((210, 150, 230, 200))], ["lane4"])
+        self.assertEqual([z.id for z in index.query((240, 150, 260, 200))], ["lane4", "lane5"])
+        self.assertEqual(index.query((0, 400, 999, 500)), [])
+        # Same cell, but outside the zone's box
+        self.assertEqual(index.query((10, 20, 20, 60)), [])
+
+    def test_events_per_lane_zone(self):
+        # Two lanes with a different direction filter and distance each
+        vehicles = [
+            Vehicle(0, 50.0, 4.5, 1.8, enter_time=1.0, direction="approaching"),
+            Vehicle(1, 60.0, 4.5, 1.8, enter_time=1.5, direction="receding"),
+        ]
+        scene = SyntheticScene(640, 360, fps=30, duration=7.0, vehicles=vehicles, seed=3)
+        zones = scene.lane_zones(directions=["approaching", "receding"])
+        zones[1]["real_distance_meters"] = scene.distance_m * 2
+        detector = SpeedDetector(scene.detector_config(zones=zones))
+
+        camera = SyntheticCamera(scene)
+        events = []
+        camera.start()
+        while True:
+            frame = camera.get_frame()
+            if frame is None:
+                break
+            _, new_events = detector.process_frame(frame, camera.timestamp)
+            events.extend(new_events)
+
+        by_zone = {e["zone_id"]: e for e in events}
+        self.assertEqual(sorted(by_zone), ["lane1", "lane2"])
+        self.assertEqual(by_zone["lane1"]["direction"], "approaching")
+        self.assertEqual(by_zone["lane2"]["direction"], "receding")
+        self.assertAlmostEqual(by_zone["lane1"]["speed"], 50.0, delta=5.0)
+        # Twice the configured distance, twice the speed
+        self.assertAlmostEqual(by_zone["lane2"]["speed"], 120.0, delta=12.0)
+
+    def test_dedup_is_per_zone(self):
+        dedup = EventDeduplicator(window_seconds=1.0, position_tolerance=0.1)
+        event = {"timestamp": 100.0, "position": 0.5, "direction": "approaching", "object_id": 1, "speed": 50.0}
+        self.assertFalse(dedup.is_duplicate(dict(event, zone_id="lane1")))
+        self.assertFalse(dedup.is_duplicate(dict(event, zone_id="lane2")))
+        self.assertTrue(dedup.is_duplicate(dict(event, zone_id="lane1", timestamp=100.2)))
+
+if __name__ == '__main__':
+    unittest.main()